@@ -337,7 +337,7 @@ const updateRelationship = (id, field, value) => {
               <input
                 id="file-upload"
                 type="file"
-                accept=".csv,.xlsx,.xls,.json"
+                accept=".csv,.xlsx,.xls,.json,.jsonl,.ndjson"
                 multiple={analyzeType !== "ml"}
                 onChange={handleFileChange}
                 disabled={uploading}
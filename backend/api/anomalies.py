@@ -0,0 +1,40 @@
+from fastapi import APIRouter, HTTPException, Query
+from api.anomaly_store import AnomalyResultStore
+from api.serialization import FastJSONResponse
+from api.table_store import shared_catalog, open_mapping
+
+router = APIRouter()
+
+anomaly_store = AnomalyResultStore(
+    shared_frames=open_mapping("anomaly_frames") if shared_catalog is not None else None,
+    shared_tables=open_mapping("anomaly_tables") if shared_catalog is not None else None,
+)
+
+def _split(values: str | None):
+    return [v.strip() for v in values.split(",") if v.strip()] if values else None
+
+@router.get("/anomalies/{analysis_id}")
+def list_anomalies(
+    analysis_id: str,
+    limit: int = Query(100, ge=1, le=10000),
+    cursor: str | None = Query(None),
+    method: str | None = Query(None, description="Comma-separated detector methods"),
+    issue_type: str | None = Query(None, description="Comma-separated issue types"),
+    column: str | None = Query(None, description="Comma-separated column names"),
+    min_severity: float | None = Query(None),
+    max_severity: float | None = Query(None),
+    sort_by: str = Query("severity_score", enum=["severity_score", "confidence", "row_index"]),
+    order: str = Query("desc", enum=["asc", "desc"])
+):
+    """Page through the full ranked anomaly set of a previous analysis"""
+    try:
+        page = anomaly_store.page(
+            analysis_id, limit=limit, cursor=cursor, sort_by=sort_by, order=order,
+            methods=_split(method), issue_types=_split(issue_type), columns=_split(column),
+            min_severity=min_severity, max_severity=max_severity
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail=f"Analysis '{analysis_id}' not found. Please re-run the analysis.")
+    return FastJSONResponse(page)
@@ -0,0 +1,170 @@
+import base64
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+SORTABLE_FIELDS = ("severity_score", "confidence", "row_index")
+CATEGORY_FIELDS = ("method", "issue_type", "column")
+
+def compact_anomaly_frame(anomaly_results: pd.DataFrame) -> pd.DataFrame:
+    if anomaly_results is None or anomaly_results.empty:
+        return pd.DataFrame({
+            "row_index": pd.Series(dtype="int64"),
+            "method": pd.Categorical([]),
+            "issue_type": pd.Categorical([]),
+            "column": pd.Categorical([]),
+            "confidence": pd.Series(dtype="float32"),
+            "severity_score": pd.Series(dtype="float32"),
+            "value": pd.Series(dtype=object),
+            "weight": pd.Series(dtype="float32"),
+        })
+    frame = anomaly_results[anomaly_results["issue_type"] != "feature_importance"]
+    compact = pd.DataFrame(index=pd.RangeIndex(len(frame)))
+    row_index = pd.to_numeric(frame["row_index"], errors="coerce")
+    compact["row_index"] = row_index.to_numpy() if row_index.isna().any() else row_index.astype("int64").to_numpy()
+    for field in CATEGORY_FIELDS:
+        values = frame[field] if field in frame else pd.Series(None, index=frame.index, dtype=object)
+        compact[field] = pd.Categorical(values.to_numpy())
+    compact["confidence"] = frame["confidence"].astype("float32").to_numpy()
+    severity = frame["severity_score"] if "severity_score" in frame else frame["confidence"]
+    compact["severity_score"] = severity.astype("float32").to_numpy()
+    compact["value"] = frame["value"].astype(str).to_numpy() if "value" in frame else None
+    # Events kept by bounded detectors stand in for `weight` events each
+    compact["weight"] = frame["weight"].fillna(1.0).astype("float32").to_numpy() if "weight" in frame else np.float32(1.0)
+    if "suggested_value" in frame and frame["suggested_value"].notna().any():
+        compact["suggested_value"] = frame["suggested_value"].to_numpy(dtype=object)
+        compact["edit_distance"] = pd.array(frame["edit_distance"], dtype="Int32")
+    return compact
+
+def _page_items(rows: pd.DataFrame) -> List[Dict]:
+    rows = rows.copy()
+    for field in rows.columns[(rows.dtypes == np.float32).to_numpy()]:
+        # float32 storage would serialize 0.6 as 0.6000000238418579; its shortest repr is the stored value
+        rows[field] = rows[field].to_numpy().astype(str).astype(np.float64)
+    return rows.astype(object).where(rows.notna(), None).to_dict(orient="records")
+
+def _encode_cursor(position: int, sort_by: str, order: str) -> str:
+    raw = json.dumps({"p": int(position), "s": sort_by, "o": order}).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def _decode_cursor(cursor: str, sort_by: str, order: str) -> int:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        position = int(data["p"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if data.get("s") != sort_by or data.get("o") != order:
+        raise ValueError("Cursor was issued for a different sort order")
+    return position
+
+class AnomalyResultStore:
+    def __init__(self, max_analyses: int = 32, shared_frames=None, shared_tables=None):
+        self.max_analyses = max_analyses
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Optional mappings visible to every worker: analysis_id -> entry and analysis_id -> table name
+        self.shared_frames = shared_frames
+        self.shared_tables = shared_tables
+
+    def _remember(self, analysis_id: str, entry: Dict):
+        with self._lock:
+            self._entries[analysis_id] = entry
+            self._entries.move_to_end(analysis_id)
+            while len(self._entries) > self.max_analyses:
+                self._entries.popitem(last=False)
+
+    def put(self, analysis_id: str, anomaly_results: pd.DataFrame, metadata: Dict = None):
+        entry = {"frame": compact_anomaly_frame(anomaly_results), "metadata": metadata or {}, "orders": {}}
+        self._remember(analysis_id, entry)
+        if self.shared_frames is not None:
+            self.shared_frames[analysis_id] = {"frame": entry["frame"], "metadata": entry["metadata"]}
+            self.shared_tables[analysis_id] = entry["metadata"].get("table_name")
+            while len(self.shared_tables) > self.max_analyses:
+                oldest = next(iter(self.shared_tables))
+                self.shared_tables.pop(oldest, None)
+                self.shared_frames.pop(oldest, None)
+
+    def get(self, analysis_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(analysis_id)
+            if entry is not None:
+                self._entries.move_to_end(analysis_id)
+                return entry
+        if self.shared_frames is None:
+            return None
+        stored = self.shared_frames.get(analysis_id)
+        if stored is None:
+            return None
+        entry = dict(stored, orders={})
+        self._remember(analysis_id, entry)
+        return entry
+
+    def discard_table(self, table_name: str):
+        with self._lock:
+            for analysis_id in [k for k, v in self._entries.items() if v["metadata"].get("table_name") == table_name]:
+                del self._entries[analysis_id]
+        if self.shared_tables is not None:
+            for analysis_id in [k for k, v in self.shared_tables.items() if v == table_name]:
+                self.shared_tables.pop(analysis_id, None)
+                self.shared_frames.pop(analysis_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.shared_frames is not None:
+            self.shared_frames.clear()
+            self.shared_tables.clear()
+
+    def _order(self, entry: Dict, sort_by: str, order: str) -> np.ndarray:
+        # Full orderings are computed lazily, once per sort key, and reused across pages
+        key = (sort_by, order)
+        if key not in entry["orders"]:
+            values = entry["frame"][sort_by].to_numpy()
+            if order == "desc":
+                perm = np.lexsort((np.arange(len(values)), -values.astype("float64")))
+            else:
+                perm = np.lexsort((np.arange(len(values)), values))
+            entry["orders"][key] = perm
+        return entry["orders"][key]
+
+    def page(self, analysis_id: str, limit: int = 100, cursor: str = None,
+             sort_by: str = "severity_score", order: str = "desc",
+             methods: List[str] = None, issue_types: List[str] = None, columns: List[str] = None,
+             min_severity: float = None, max_severity: float = None) -> Optional[Dict]:
+        entry = self.get(analysis_id)
+        if entry is None:
+            return None
+        if sort_by not in SORTABLE_FIELDS:
+            raise ValueError(f"sort_by must be one of {', '.join(SORTABLE_FIELDS)}")
+        frame = entry["frame"]
+
+        mask = np.ones(len(frame), dtype=bool)
+        for field, allowed in (("method", methods), ("issue_type", issue_types), ("column", columns)):
+            if allowed:
+                mask &= frame[field].isin(allowed).to_numpy()
+        if min_severity is not None:
+            mask &= frame["severity_score"].to_numpy() >= min_severity
+        if max_severity is not None:
+            mask &= frame["severity_score"].to_numpy() <= max_severity
+
+        perm = self._order(entry, sort_by, order)
+        matching = np.flatnonzero(mask[perm])
+        start = 0
+        if cursor:
+            start = int(np.searchsorted(matching, _decode_cursor(cursor, sort_by, order), side="right"))
+        selected = matching[start:start + limit]
+        has_more = start + limit < len(matching)
+
+        rows = frame.iloc[perm[selected]]
+        return {
+            "analysis_id": analysis_id,
+            "metadata": entry["metadata"],
+            "total_matching": int(len(matching)),
+            "weighted_total_matching": int(round(float(frame["weight"].to_numpy()[perm[matching]].sum()))),
+            "total_anomalies": int(len(frame)),
+            "items": _page_items(rows),
+            "next_cursor": _encode_cursor(selected[-1], sort_by, order) if has_more and len(selected) else None,
+        }
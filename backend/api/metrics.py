@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ml.profiling import render_prometheus_metrics
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Per-stage timing metrics in Prometheus text exposition format"""
+    return PlainTextResponse(render_prometheus_metrics(), media_type="text/plain; version=0.0.4")
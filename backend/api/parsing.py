@@ -0,0 +1,370 @@
+import itertools
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
+JSON_EXTENSIONS = (".json", ".jsonl", ".ndjson")
+STREAM_EXTENSIONS = (".csv", ".xlsx", ".xls") + JSON_EXTENSIONS
+# Records flattened and converted per batch, which bounds the Python objects alive at once
+JSON_CHUNK_ROWS = 50000
+JSON_READ_BYTES = 1024 * 1024
+_JSON_DELIMITERS = np.zeros(256, dtype=bool)
+_JSON_DELIMITERS[np.frombuffer(b'"{}[],\\', dtype=np.uint8)] = True
+# JSON arrays below this size are decoded in one call; larger ones are decoded a read at a time
+JSON_ARRAY_STREAM_MIN_BYTES = 64 * 1024 * 1024
+
+# Files at least this large are parsed with pyarrow's multi-threaded reader when it is available
+PYARROW_MIN_BYTES = 16 * 1024 * 1024
+# Streamed formats that need random access are spooled to disk past this size
+STREAM_SPOOL_MEMORY_BYTES = 64 * 1024 * 1024
+
+# Every casing of "null" plus the tokens pandas already treats as missing
+NULL_TOKENS = sorted(
+    {"".join(chars) for chars in itertools.product(*zip("null", "NULL"))}
+    | {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+       "<NA>", "N/A", "NA", "NaN", "None", "n/a", "nan"}
+)
+
+_ARROW_TYPES = {
+    "int": "int64", "int64": "int64", "integer": "int64",
+    "float": "float64", "float64": "float64", "double": "float64", "numeric": "float64",
+    "str": "string", "string": "string", "object": "string", "text": "string",
+    "bool": "bool", "boolean": "bool",
+    "datetime": "timestamp", "datetime64[ns]": "timestamp", "timestamp": "timestamp",
+    "category": "category",
+}
+
+def file_size(fileobj) -> int:
+    position = fileobj.tell()
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(position)
+    return size
+
+def choose_csv_engine(size_bytes: int, requested: str = "auto") -> str:
+    if requested == "pyarrow" and pa_csv is None:
+        raise ValueError("pyarrow is not installed; use csv_engine=c")
+    if requested in ("c", "pyarrow"):
+        return requested
+    return "pyarrow" if pa_csv is not None and size_bytes >= PYARROW_MIN_BYTES else "c"
+
+def _arrow_type(name: str):
+    kind = _ARROW_TYPES.get(str(name).lower())
+    if kind is None:
+        raise ValueError(f"Unsupported dtype hint: {name}")
+    if kind == "timestamp":
+        return pa.timestamp("ns")
+    if kind == "category":
+        return pa.dictionary(pa.int32(), pa.string())
+    return {"int64": pa.int64(), "float64": pa.float64(), "string": pa.string(), "bool": pa.bool_()}[kind]
+
+def _pandas_dtype(name: str):
+    kind = _ARROW_TYPES.get(str(name).lower())
+    if kind is None:
+        raise ValueError(f"Unsupported dtype hint: {name}")
+    return {"int64": "Int64", "float64": "float64", "string": "object", "bool": "boolean",
+            "category": "category"}.get(kind)
+
+def read_csv_upload(fileobj, engine: str = "auto", dtype: Dict[str, str] = None, usecols: List[str] = None,
+                    size_bytes: int = None) -> pd.DataFrame:
+    if size_bytes is None:
+        size_bytes = file_size(fileobj)
+    engine = choose_csv_engine(size_bytes, engine)
+    dtype = dtype or {}
+
+    if engine == "pyarrow":
+        convert_options = pa_csv.ConvertOptions(
+            column_types={col: _arrow_type(t) for col, t in dtype.items()},
+            include_columns=usecols or [],
+            null_values=NULL_TOKENS,
+            strings_can_be_null=True,
+        )
+        table = pa_csv.read_csv(fileobj, read_options=pa_csv.ReadOptions(use_threads=True),
+                                convert_options=convert_options)
+        df = table.to_pandas()
+        df.attrs['parse_engine'] = engine
+        return df
+
+    pandas_dtypes = {col: _pandas_dtype(t) for col, t in dtype.items()}
+    datetime_columns = [col for col, t in pandas_dtypes.items() if t is None]
+    df = pd.read_csv(
+        fileobj,
+        dtype={col: t for col, t in pandas_dtypes.items() if t is not None} or None,
+        usecols=usecols or None,
+        parse_dates=datetime_columns or None,
+        na_values=NULL_TOKENS,
+        keep_default_na=True,
+    )
+    df.attrs['parse_engine'] = engine
+    return df
+
+def list_excel_sheets(fileobj, ext: str) -> List[str]:
+    fileobj.seek(0)
+    if ext == ".xlsx" and python_calamine is None:
+        import openpyxl
+        workbook = openpyxl.load_workbook(fileobj, read_only=True)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+            fileobj.seek(0)
+    names = list(pd.ExcelFile(fileobj, engine="calamine" if python_calamine is not None else None).sheet_names)
+    fileobj.seek(0)
+    return names
+
+def select_excel_sheets(fileobj, ext: str, sheets: str = None) -> List[str]:
+    """Resolve a `sheets` request ("*" or a comma-separated list) against the workbook."""
+    if not sheets:
+        return [None]
+    available = list_excel_sheets(fileobj, ext)
+    if sheets.strip() == "*":
+        return available
+    requested = [name.strip() for name in sheets.split(",") if name.strip()]
+    missing = [name for name in requested if name not in available]
+    if missing:
+        raise ValueError(f"Sheets not found: {', '.join(missing)}; available: {', '.join(available)}")
+    return requested
+
+def _unique_headers(header) -> List[str]:
+    names, seen = [], {}
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None or str(name).strip() == "" else str(name)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def _read_xlsx_streaming(fileobj, sheet: str = None, usecols: List[str] = None) -> pd.DataFrame:
+    # read_only mode iterates the sheet XML without building the workbook DOM
+    import openpyxl
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = _unique_headers(next(rows, ()))
+        wanted = [i for i, name in enumerate(header) if not usecols or name in usecols]
+        buffers = [[] for _ in wanted]
+        width = len(header)
+        for row in rows:
+            if row is None or all(value is None for value in row):
+                continue
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            for buffer, i in zip(buffers, wanted):
+                buffer.append(row[i])
+    finally:
+        workbook.close()
+    return pd.DataFrame({header[i]: pd.Series(buffer, dtype=None) for i, buffer in zip(wanted, buffers)})
+
+def read_excel_upload(fileobj, ext: str, sheet: str = None, usecols: List[str] = None) -> pd.DataFrame:
+    fileobj.seek(0)
+    if python_calamine is not None:
+        df = pd.read_excel(fileobj, sheet_name=sheet if sheet is not None else 0, engine="calamine",
+                           usecols=usecols or None)
+        df.attrs['parse_engine'] = "calamine"
+    elif ext == ".xlsx":
+        df = _read_xlsx_streaming(fileobj, sheet, usecols)
+        df.attrs['parse_engine'] = "openpyxl-read-only"
+    else:
+        df = pd.read_excel(fileobj, sheet_name=sheet if sheet is not None else 0, usecols=usecols or None)
+        df.attrs['parse_engine'] = "xlrd"
+    return df
+
+def _loads(line):
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+def detect_json_layout(fileobj, ext: str) -> str:
+    """Classify a JSON upload as "lines" (NDJSON), "array" (top-level list) or "document"."""
+    if ext in (".jsonl", ".ndjson"):
+        return "lines"
+    fileobj.seek(0)
+    head = fileobj.read(JSON_READ_BYTES)
+    fileobj.seek(0)
+    text = head.decode("utf-8", errors="ignore") if isinstance(head, bytes) else head
+    stripped = text.lstrip("\ufeff \t\r\n")
+    if stripped.startswith("["):
+        return "array"
+    first_line, _, rest = stripped.partition("\n")
+    if stripped.startswith("{") and rest.strip().startswith("{"):
+        try:
+            json.loads(first_line)
+            return "lines"
+        except ValueError:
+            pass
+    return "document"
+
+def _rewind(fileobj):
+    # Streamed request bodies are read forward only and start at their beginning
+    if fileobj.seekable():
+        fileobj.seek(0)
+
+def iter_json_lines(fileobj):
+    _rewind(fileobj)
+    for line in fileobj:
+        line = line.strip()
+        if line:
+            yield _loads(line)
+
+def _array_delimiters(data: bytes):
+    """Top-level separators of a JSON array body that starts between elements, and its closing bracket if present.
+
+    Only quotes, brackets, commas and backslashes are looked at. A quote opens or closes a string unless an
+    odd run of backslashes precedes it, and brackets and commas inside strings are ignored.
+    """
+    codes = np.frombuffer(data, dtype=np.uint8)
+    events = np.flatnonzero(_JSON_DELIMITERS[codes])
+    kinds = codes[events]
+    quotes = kinds == ord('"')
+    backslashes = kinds == ord("\\")
+    if backslashes.any():
+        # Length of the backslash run ending at each event, from the last event that breaks the run
+        ordinal = np.arange(len(events))
+        run_start = np.r_[True, (events[1:] - events[:-1] != 1) | ~backslashes[:-1]] | ~backslashes
+        runs = ordinal - np.maximum.accumulate(np.where(run_start, ordinal, 0)) + 1
+        escaped = np.r_[False, backslashes[:-1] & (events[1:] - events[:-1] == 1) & (runs[:-1] % 2 == 1)]
+        quotes &= ~escaped
+    structural = np.cumsum(quotes) % 2 == 0
+    step = np.zeros(len(events), dtype=np.int64)
+    step[structural & ((kinds == ord("{")) | (kinds == ord("[")))] = 1
+    step[structural & ((kinds == ord("}")) | (kinds == ord("]")))] = -1
+    depth = np.cumsum(step)
+    separators = events[structural & (kinds == ord(",")) & (depth == 0)]
+    end = events[structural & (kinds == ord("]")) & (depth == -1)]
+    return separators, int(end[0]) if len(end) else None
+
+def iter_json_array(fileobj, read_bytes: int = JSON_READ_BYTES):
+    """Yield the elements of a top-level JSON array without loading the whole document.
+
+    Each read is cut after its last complete element and those elements are decoded in one call.
+    """
+    _rewind(fileobj)
+    buffer, started = b"", False
+    while True:
+        chunk = fileobj.read(read_bytes)
+        buffer += chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+        if not started:
+            buffer = buffer.lstrip(b"\xef\xbb\xbf \t\r\n")
+            if not buffer and chunk:
+                continue
+            if not buffer.startswith(b"["):
+                raise ValueError("Expected a JSON array")
+            buffer, started = buffer[1:], True
+        separators, end = _array_delimiters(buffer)
+        if end is not None:
+            if buffer[:end].strip():
+                yield from _loads(b"[" + buffer[:end] + b"]")
+            return
+        if len(separators):
+            cut = separators[-1]
+            yield from _loads(b"[" + buffer[:cut] + b"]")
+            buffer = buffer[cut + 1:]
+        if not chunk:
+            raise ValueError("Unterminated JSON array")
+
+def _records_to_frame(records, usecols: List[str] = None, chunk_rows: int = JSON_CHUNK_ROWS) -> pd.DataFrame:
+    frames = []
+    for batch in iter(lambda: list(itertools.islice(records, chunk_rows)), []):
+        # Flattening walks every value in Python, so it only runs on batches that have nested objects
+        nested = any(isinstance(value, dict) for record in batch if isinstance(record, dict) for value in record.values())
+        frame = pd.json_normalize(batch, sep="_") if nested else pd.DataFrame.from_records(batch)
+        if usecols:
+            frame = frame[[c for c in usecols if c in frame.columns]]
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+def read_json_upload(fileobj, ext: str, usecols: List[str] = None, chunk_rows: int = JSON_CHUNK_ROWS) -> pd.DataFrame:
+    layout = detect_json_layout(fileobj, ext)
+    if layout == "lines":
+        df = _records_to_frame(iter_json_lines(fileobj), usecols, chunk_rows)
+    elif layout == "array" and file_size(fileobj) < JSON_ARRAY_STREAM_MIN_BYTES:
+        fileobj.seek(0)
+        df = _records_to_frame(iter(_loads(fileobj.read())), usecols, chunk_rows)
+    elif layout == "array":
+        df = _records_to_frame(iter_json_array(fileobj), usecols, chunk_rows)
+    else:
+        fileobj.seek(0)
+        df = pd.read_json(fileobj)
+        if usecols:
+            df = df[[c for c in usecols if c in df.columns]]
+    df.attrs['parse_engine'] = f"json-{layout}"
+    return df
+
+def _apply_dtype_hints(df: pd.DataFrame, dtype: Dict[str, str] = None) -> pd.DataFrame:
+    for col, name in (dtype or {}).items():
+        if col in df.columns:
+            target = _pandas_dtype(name)
+            df[col] = pd.to_datetime(df[col], errors="coerce") if target is None else df[col].astype(target)
+    return df
+
+def read_upload(fileobj, ext: str, csv_engine: str = "auto", dtype: Dict[str, str] = None,
+                usecols: List[str] = None, sheet: str = None) -> pd.DataFrame:
+    fileobj.seek(0)
+    if ext == ".csv":
+        return read_csv_upload(fileobj, csv_engine, dtype, usecols)
+    if ext in [".xlsx", ".xls"]:
+        df = read_excel_upload(fileobj, ext, sheet, usecols)
+    elif ext in JSON_EXTENSIONS:
+        df = read_json_upload(fileobj, ext, usecols)
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+    return _apply_dtype_hints(df, dtype)
+
+def _first_byte(stream) -> bytes:
+    # First non-whitespace byte of a buffered stream; only the whitespace before it is consumed
+    while True:
+        head = stream.peek(1)
+        if not head:
+            return b""
+        stripped = head.lstrip(b" \t\r\n")
+        if stripped:
+            return stripped[:1]
+        stream.read(len(head))
+
+def read_upload_stream(stream, ext: str, csv_engine: str = "auto", dtype: Dict[str, str] = None,
+                       usecols: List[str] = None) -> pd.DataFrame:
+    """Parse a forward-only buffered binary stream while it is still arriving.
+
+    CSV, NDJSON and JSON arrays are consumed incrementally; workbooks and single JSON documents need the
+    whole body, so they are spooled and parsed like a regular upload once it has arrived.
+    """
+    if ext == ".csv":
+        # The C parser pulls its input block by block; pyarrow's reader is used only when asked for
+        df = read_csv_upload(stream, "c" if csv_engine == "auto" else csv_engine, dtype, usecols, size_bytes=0)
+        df.attrs['parse_engine'] = f"{df.attrs['parse_engine']}-stream"
+        return df
+    if ext in (".jsonl", ".ndjson") or (ext == ".json" and _first_byte(stream) == b"["):
+        layout = "lines" if ext != ".json" else "array"
+        df = _records_to_frame(iter_json_lines(stream) if layout == "lines" else iter_json_array(stream), usecols)
+        df.attrs['parse_engine'] = f"json-{layout}-stream"
+        return _apply_dtype_hints(df, dtype)
+    if ext not in STREAM_EXTENSIONS:
+        raise ValueError(f"Unsupported file type: {ext}")
+    with tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_MEMORY_BYTES) as spool:
+        shutil.copyfileobj(stream, spool)
+        return read_upload(spool, ext, csv_engine, dtype, usecols)
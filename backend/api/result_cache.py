@@ -0,0 +1,181 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+import pandas as pd
+from api.table_store import ensure_private_directory
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+def upload_digest():
+    """Digest that names uploaded content; streamed uploads feed it chunk by chunk."""
+    return hashlib.blake2b(digest_size=16)
+
+def hash_upload(fileobj) -> str:
+    """Hash an uploaded file in fixed-size chunks and rewind it for parsing."""
+    digest = upload_digest()
+    fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(HASH_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+def make_cache_key(content_hash: str, kind: str, params: Dict) -> str:
+    payload = json.dumps({"content": content_hash, "kind": kind, "params": params}, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+def _estimate_size(entry: Dict) -> int:
+    size = 0
+    for value in entry.values():
+        if isinstance(value, pd.DataFrame):
+            size += int(value.memory_usage(deep=True).sum())
+        elif isinstance(value, pd.Series):
+            size += int(value.memory_usage(deep=True))
+        else:
+            try:
+                size += len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            except Exception:
+                size += 1024
+    return size
+
+class ResultCache:
+    def __init__(self, max_entries: int = 64, max_bytes: int = 512 * 1024 * 1024, cache_dir: str = None,
+                 max_disk_bytes: int = 4 * 1024 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            # Entries are unpickled, so the directory must be private to this user
+            ensure_private_directory(cache_dir)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        if self.cache_dir and os.path.exists(self._path(key)):
+            try:
+                with open(self._path(key), "rb") as f:
+                    blob = f.read()
+                entry = pickle.loads(blob)
+                os.utime(self._path(key))
+            except Exception:
+                entry = None
+            if entry is not None:
+                self._remember(key, entry, len(blob))
+                with self._lock:
+                    self.hits += 1
+                return entry
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, entry: Dict):
+        if not self.cache_dir:
+            self._remember(key, entry, _estimate_size(entry))
+            return
+        # The pickled entry is both the file contents and the memory estimate
+        blob = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, entry, len(blob))
+        # A private temporary file per writer, so concurrent workers never interleave their writes
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            # A full or read-only disk only loses the persistent copy, never the request
+            logger.warning("Could not persist cache entry %s: %s", key, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._evict_disk()
+
+    def _remember(self, key: str, entry: Dict, size: int):
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._sizes.pop(key)
+                del self._entries[key]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._sizes[key] = size
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                self._total_bytes -= self._sizes.pop(evicted)
+
+    def _evict_disk(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # Another worker evicted it first
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self, include_disk: bool = False):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+        if include_disk and self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "persistent": bool(self.cache_dir)
+            }
+
+def cache_from_env() -> ResultCache:
+    return ResultCache(
+        max_entries=int(os.environ.get("DQC_CACHE_MAX_ENTRIES", 64)),
+        max_bytes=int(os.environ.get("DQC_CACHE_MAX_BYTES", 512 * 1024 * 1024)),
+        cache_dir=os.environ.get("DQC_CACHE_DIR") or None,
+        max_disk_bytes=int(os.environ.get("DQC_CACHE_MAX_DISK_BYTES", 4 * 1024 * 1024 * 1024)),
+    )
@@ -0,0 +1,190 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from fastapi import APIRouter, Body, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from ml.anomaly_checker import normalize_null_tokens
+from ml.anomaly_ensemble import COMPLEX_DETECTORS
+from ml.online_scoring import build_scoring_profile, align_records, score_records
+from ml.profiling import StageProfiler
+from api.serialization import FastJSONResponse
+from api.upload import in_memory_tables, table_content_hashes, sanitize_column_name
+
+router = APIRouter()
+
+MAX_PROFILES = int(os.environ.get("DQC_SCORE_MAX_PROFILES", 16))
+# How long the batcher waits for concurrent calls to join a batch, and the most records it scores at once
+BATCH_WAIT_SECONDS = float(os.environ.get("DQC_SCORE_BATCH_WAIT_MS", 1)) / 1000
+MAX_BATCH_RECORDS = int(os.environ.get("DQC_SCORE_MAX_BATCH", 1024))
+MAX_RECORDS_PER_CALL = 1000
+
+class ProfileCache:
+    """Reference profiles per table version; built once per worker and evicted least recently used."""
+
+    def __init__(self, max_profiles: int = MAX_PROFILES):
+        self.max_profiles = max_profiles
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+        self._building = {}
+
+    def cached(self, table_name: str, complex_detector: str):
+        key = (table_name, table_content_hashes.get(table_name), complex_detector)
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is not None:
+                self._profiles.move_to_end(key)
+        return key, profile
+
+    def get(self, table_name: str, complex_detector: str):
+        content_hash = table_content_hashes.get(table_name)
+        if content_hash is None or table_name not in in_memory_tables:
+            return None, None
+        key = (table_name, content_hash, complex_detector)
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is not None:
+                self._profiles.move_to_end(key)
+                return key, profile
+            build_lock = self._building.setdefault(key, threading.Lock())
+        # Concurrent first calls for the same table wait for one build instead of fitting in parallel
+        try:
+            with build_lock:
+                with self._lock:
+                    profile = self._profiles.get(key)
+                if profile is None:
+                    df = normalize_null_tokens(in_memory_tables[table_name])
+                    with StageProfiler().stage('score_profile_build', len(df)):
+                        profile = build_scoring_profile(df, complex_detector=complex_detector)
+                    with self._lock:
+                        self._profiles[key] = profile
+                        while len(self._profiles) > self.max_profiles:
+                            self._profiles.popitem(last=False)
+        finally:
+            # A failed build must not leave its lock behind for every later call of this key
+            with self._lock:
+                self._building.pop(key, None)
+        return key, profile
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+class MicroBatcher:
+    """Coalesce concurrent scoring calls for the same profile into one vectorized batch."""
+
+    def __init__(self, wait_seconds: float = BATCH_WAIT_SECONDS, max_batch_records: int = MAX_BATCH_RECORDS):
+        self.wait_seconds = wait_seconds
+        self.max_batch_records = max_batch_records
+        self._pending = {}
+        # Drain task per profile key; holding it here also keeps the task from being garbage collected
+        self._draining = {}
+        # One scoring thread: batches are GIL-bound, and calls queue up behind it to form the next batch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dqc-score")
+
+    async def submit(self, key, profile: Dict, records: List[Dict]) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append((records, future))
+        if key not in self._draining:
+            self._draining[key] = loop.create_task(self._drain(key, profile))
+        return await future
+
+    def _take(self, key) -> List:
+        pending = self._pending[key]
+        batch, size = [], 0
+        while pending and (not batch or size + len(pending[0][0]) <= self.max_batch_records):
+            records, future = pending.pop(0)
+            batch.append((records, future))
+            size += len(records)
+        if not pending:
+            del self._pending[key]
+        return batch
+
+    async def _drain(self, key, profile: Dict):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending.get(key):
+                await asyncio.sleep(self.wait_seconds)
+                batch = self._take(key)
+                try:
+                    results = await loop.run_in_executor(self._executor, _score_batch, profile,
+                                                         [records for records, _ in batch])
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self._draining.pop(key, None)
+
+def _score_batch(profile: Dict, calls: List[List[Dict]]) -> List[List[Dict]]:
+    records = [record for call in calls for record in call]
+    with StageProfiler().stage('score_batch', len(records)):
+        events = score_records(profile, align_records(records, profile, rename=sanitize_column_name))
+        per_record = [[] for _ in records]
+        if not events.empty:
+            fields = [field for field in events.columns if field not in ('row_index', 'weight', 'method_weight')]
+            for position, *values in zip(events['row_index'].to_numpy(), *(events[f].to_numpy() for f in fields)):
+                per_record[position].append(dict(zip(fields, values)))
+
+    results, offset = [], 0
+    for call in calls:
+        results.append(per_record[offset:offset + len(call)])
+        offset += len(call)
+    return results
+
+profile_cache = ProfileCache()
+batcher = MicroBatcher()
+
+@router.post("/score/{table_name}")
+async def score(
+    table_name: str,
+    payload: dict | list = Body(..., description="One record, a list of records, or {\"records\": [...]}"),
+    complex_detector: str = Query("hbos", enum=COMPLEX_DETECTORS)
+):
+    """Check records against the profile and model of a stored reference table"""
+    start = time.perf_counter()
+    if isinstance(payload, dict):
+        records = payload["records"] if isinstance(payload.get("records"), list) else [payload]
+    else:
+        records = payload
+    if not records:
+        raise HTTPException(status_code=400, detail="No records to score")
+    if len(records) > MAX_RECORDS_PER_CALL:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_RECORDS_PER_CALL} records per call; "
+                                                    "upload larger batches as a file")
+    if not all(isinstance(record, dict) for record in records):
+        raise HTTPException(status_code=400, detail="Every record must be a JSON object")
+
+    key, profile = profile_cache.cached(table_name, complex_detector)
+    if profile is None:
+        # First call for this table version: fit the reference profile off the event loop
+        key, profile = await run_in_threadpool(profile_cache.get, table_name, complex_detector)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Table '{table_name}' not found. Please upload the file again.")
+
+    try:
+        scored = await batcher.submit(key, profile, records)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    results = [{
+        "record": i,
+        "is_anomalous": bool(events),
+        "max_severity": max((event["severity_score"] for event in events), default=0.0),
+        "events": events,
+    } for i, events in enumerate(scored)]
+    return FastJSONResponse({
+        "table_name": table_name,
+        "complex_detector": complex_detector,
+        "scored": len(records),
+        "anomalous": sum(result["is_anomalous"] for result in results),
+        "results": results,
+        "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+    })
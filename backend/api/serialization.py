@@ -0,0 +1,115 @@
+import json
+import math
+import datetime
+import decimal
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def sanitize_for_json(obj):
+    if isinstance(obj, (np.floating, np.integer, np.bool_)):
+        obj = obj.item()
+    if isinstance(obj, float):
+        if math.isnan(obj) or math.isinf(obj):
+            return None
+        return obj
+
+    if isinstance(obj, dict):
+        return {str(k): sanitize_for_json(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple, set)):
+        return [sanitize_for_json(v) for v in obj]
+    if isinstance(obj, pd.Series):
+        return sanitize_for_json(obj.to_dict())
+    if isinstance(obj, pd.DataFrame):
+        return sanitize_for_json(obj.to_dict(orient="records"))
+    return obj
+
+def _default(obj):
+    # Fallback hook for values the encoder does not handle natively
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, (pd.Timestamp, datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, pd.Timedelta):
+        return str(obj)
+    if isinstance(obj, np.generic):
+        value = obj.item()
+        if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+            return None
+        return value
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict(orient="records")
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return obj.tolist() if isinstance(obj, pd.Index) else obj.to_dict()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    return str(obj)
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            obj, default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(sanitize_for_json(obj), default=_default, allow_nan=False,
+                      ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _is_large(obj, chunk_size: int) -> bool:
+    if isinstance(obj, pd.DataFrame):
+        return len(obj) > chunk_size
+    if isinstance(obj, dict):
+        return any(_is_large(v, chunk_size) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return len(obj) > chunk_size or any(_is_large(v, chunk_size) for v in obj)
+    return False
+
+def iter_json(obj, chunk_size: int = 1000):
+    """Encode obj as JSON in chunks so large lists and frames are never built as one string."""
+    if not _is_large(obj, chunk_size):
+        yield dumps(obj)
+        return
+    if isinstance(obj, dict):
+        yield b"{"
+        for i, (key, value) in enumerate(obj.items()):
+            yield (b"," if i else b"") + dumps(str(key)) + b":"
+            yield from iter_json(value, chunk_size)
+        yield b"}"
+        return
+    if isinstance(obj, pd.DataFrame):
+        yield b"["
+        for start in range(0, len(obj), chunk_size):
+            records = obj.iloc[start:start + chunk_size].to_dict(orient="records")
+            yield (b"," if start else b"") + dumps(records)[1:-1]
+        yield b"]"
+        return
+    yield b"["
+    sep = b""
+    for start in range(0, len(obj), chunk_size):
+        batch = list(obj[start:start + chunk_size])
+        if any(_is_large(v, chunk_size) for v in batch):
+            for value in batch:
+                yield sep
+                sep = b","
+                yield from iter_json(value, chunk_size)
+        else:
+            yield sep + dumps(batch)[1:-1]
+            sep = b","
+    yield b"]"
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+class StreamingJSONResponse(StreamingResponse):
+    def __init__(self, content, chunk_size: int = 1000, status_code: int = 200, headers=None):
+        super().__init__(iter_json(content, chunk_size), status_code=status_code,
+                         headers=headers, media_type="application/json")
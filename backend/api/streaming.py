@@ -0,0 +1,151 @@
+import asyncio
+import io
+import os
+import queue
+import threading
+import time
+from typing import Callable
+from api.result_cache import upload_digest
+
+# Streamed uploads: the event loop hands request-body chunks to a parser thread through a bounded queue, so
+# parsing overlaps the transfer, a slow parser stops the socket reads instead of buffering the body, and
+# the body is hashed on the way through without ever being written out whole.
+
+MAX_STREAM_BYTES = int(os.environ.get("DQC_STREAM_MAX_BYTES", 2 * 1024 ** 3))
+MAX_CONCURRENT_STREAMS = int(os.environ.get("DQC_STREAM_MAX_CONCURRENT", 4))
+# Per-upload transfer cap in bytes per second; 0 leaves it unthrottled
+MAX_STREAM_BYTES_PER_SEC = float(os.environ.get("DQC_STREAM_MAX_BYTES_PER_SEC", 0))
+# Chunks in flight between the socket and the parser; at most this many chunks of the body are in memory
+STREAM_QUEUE_CHUNKS = int(os.environ.get("DQC_STREAM_QUEUE_CHUNKS", 64))
+STREAM_READ_BYTES = 1024 * 1024
+
+class UploadTooLarge(ValueError):
+    pass
+
+class UploadAborted(ValueError):
+    pass
+
+class BodyPipe(io.RawIOBase):
+    """Read end of a request body fed from the event loop; hashes and counts the bytes it hands out."""
+
+    def __init__(self, max_chunks: int = STREAM_QUEUE_CHUNKS):
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._pending = memoryview(b"")
+        self._eof = False
+        # Set once the reader is done, so the writer stops feeding a parser that has returned or failed
+        self.reader_done = threading.Event()
+        self.digest = upload_digest()
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending and not self._eof:
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._eof = True
+            elif isinstance(chunk, Exception):
+                self._eof = True
+                raise chunk
+            else:
+                self.digest.update(chunk)
+                self.bytes_read += len(chunk)
+                self._pending = memoryview(chunk)
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def drain(self):
+        # Parsers may stop before the end (trailing whitespace after a JSON array); the hash covers it all
+        while self.readinto(bytearray(STREAM_READ_BYTES)):
+            pass
+
+    def finish_reading(self):
+        self.reader_done.set()
+        # Unblock a writer waiting on a full queue
+        while True:
+            try:
+                self._chunks.get_nowait()
+            except queue.Empty:
+                return
+
+    async def write(self, chunk):
+        """Queue a chunk (or None at the end, or an exception to raise in the reader), waiting while it is full."""
+        try:
+            self._chunks.put_nowait(chunk)
+        except queue.Full:
+            # Backpressure: the request body is not read further until the parser catches up
+            while not self.reader_done.is_set():
+                try:
+                    await asyncio.to_thread(self._chunks.put, chunk, True, 0.1)
+                    return
+                except queue.Full:
+                    continue
+
+class StreamLimiter:
+    """Admission and size/rate limits for streamed uploads in this process."""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_STREAMS, max_bytes: int = MAX_STREAM_BYTES,
+                 max_bytes_per_sec: float = MAX_STREAM_BYTES_PER_SEC):
+        self.max_concurrent = max_concurrent
+        self.max_bytes = max_bytes
+        self.max_bytes_per_sec = max_bytes_per_sec
+        self.active = 0
+
+    def try_acquire(self) -> bool:
+        # Only touched from the event loop, so the counter needs no lock
+        if self.active >= self.max_concurrent:
+            return False
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+
+    async def throttle(self, received: int, started: float):
+        if self.max_bytes_per_sec > 0:
+            ahead = received / self.max_bytes_per_sec - (time.perf_counter() - started)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+
+async def stream_into(chunks, parse: Callable, limiter: StreamLimiter, declared_bytes: int = None):
+    """Feed an async iterator of body chunks to `parse(stream)` running in a worker thread.
+
+    Returns the parse result, the content hash and the byte count of the body. Raises UploadTooLarge
+    once the body passes the limit, and UploadAborted when the client goes away mid-transfer.
+    """
+    if declared_bytes is not None and declared_bytes > limiter.max_bytes:
+        raise UploadTooLarge(f"Upload of {declared_bytes} bytes exceeds the {limiter.max_bytes} byte limit")
+    pipe = BodyPipe()
+
+    def read():
+        try:
+            with io.BufferedReader(pipe, buffer_size=STREAM_READ_BYTES) as stream:
+                result = parse(stream)
+                pipe.drain()
+            return result
+        finally:
+            pipe.finish_reading()
+
+    parsing = asyncio.get_running_loop().run_in_executor(None, read)
+    received, started = 0, time.perf_counter()
+    try:
+        async for chunk in chunks:
+            if pipe.reader_done.is_set():
+                break
+            if not chunk:
+                continue
+            received += len(chunk)
+            if received > limiter.max_bytes:
+                await pipe.write(UploadTooLarge(f"Upload exceeds the {limiter.max_bytes} byte limit"))
+                break
+            await pipe.write(chunk)
+            await limiter.throttle(received, started)
+        else:
+            await pipe.write(None)
+    except Exception as e:
+        await pipe.write(UploadAborted(f"Upload interrupted after {received} bytes: {e}"))
+    result = await parsing
+    return result, pipe.digest.hexdigest(), pipe.bytes_read
@@ -0,0 +1,305 @@
+import base64
+import io
+import json
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Frames decoded from the shared store that each worker keeps around between requests
+MAX_CACHED_FRAMES = 8
+# Catalogs from before this version held pickled entries; they are dropped instead of loaded
+CATALOG_VERSION = 2
+# Nothing in the shared store is unpickled: tables are Parquet, entries are JSON with frames embedded as Parquet.
+# Object columns with no Arrow type (mixed ints and strings) are stored as one JSON text per value.
+JSON_COLUMNS_KEY = b"dqc_json_columns"
+FRAME_KEY = "__parquet_frame__"
+
+def _json_default(value):
+    if isinstance(value, pd.DataFrame):
+        buffer = io.BytesIO()
+        write_parquet(value, buffer, preserve_index=None)
+        return {FRAME_KEY: base64.b64encode(buffer.getvalue()).decode("ascii")}
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return str(value)
+
+def _json_object(obj: dict):
+    if len(obj) == 1 and FRAME_KEY in obj:
+        return read_parquet(io.BytesIO(base64.b64decode(obj[FRAME_KEY])))
+    return obj
+
+def write_parquet(df: pd.DataFrame, sink, preserve_index=False):
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=preserve_index)
+        json_columns = []
+    except (pa.ArrowException, TypeError, ValueError):
+        json_columns = []
+        for col in df.columns[(df.dtypes == object).to_numpy()]:
+            try:
+                pa.array(df[col], from_pandas=True)
+            except (pa.ArrowException, TypeError, ValueError):
+                json_columns.append(col)
+        df = df.copy(deep=False)
+        for col in json_columns:
+            df[col] = [json.dumps(v, default=_json_default) for v in df[col]]
+        table = pa.Table.from_pandas(df, preserve_index=preserve_index)
+    if json_columns:
+        metadata = dict(table.schema.metadata or {})
+        metadata[JSON_COLUMNS_KEY] = json.dumps([str(col) for col in json_columns]).encode()
+        table = table.replace_schema_metadata(metadata)
+    pq.write_table(table, sink)
+
+def read_parquet(source, memory_map: bool = False) -> pd.DataFrame:
+    table = pq.read_table(source, memory_map=memory_map)
+    df = table.to_pandas()
+    for col in json.loads((table.schema.metadata or {}).get(JSON_COLUMNS_KEY, b"[]")):
+        df[col] = pd.Series([json.loads(v) for v in df[col]], index=df.index, dtype=object)
+    return df
+
+def ensure_private_directory(directory: str):
+    # Files in shared directories are loaded back by every worker, so only this user may write them
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise ValueError(f"'{directory}' is not a directory")
+    if hasattr(os, "getuid"):
+        if info.st_uid != os.getuid():
+            raise ValueError(f"Directory '{directory}' is owned by another user")
+        if info.st_mode & 0o077:
+            raise ValueError(f"Directory '{directory}' is accessible to other users; chmod it to 700")
+
+class InMemoryTableStore(dict):
+    """Per-process table store, the default for a single worker."""
+    shared = False
+
+    def summary(self, table_name: str) -> Dict:
+        df = self[table_name]
+        return {"row_count": len(df), "column_count": len(df.columns), "columns": list(df.columns)}
+
+class SqliteCatalog:
+    """SQLite catalog in a directory shared by every worker process on the host."""
+
+    def __init__(self, directory: str):
+        ensure_private_directory(directory)
+        self.directory = directory
+        self.path = os.path.join(directory, "catalog.sqlite")
+        self._local = threading.local()
+        conn = self.connect()
+        if conn.execute("PRAGMA user_version").fetchone()[0] < CATALOG_VERSION:
+            conn.execute("DROP TABLE IF EXISTS tables")
+            conn.execute("DROP TABLE IF EXISTS entries")
+            conn.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+        conn.execute("CREATE TABLE IF NOT EXISTS tables (name TEXT PRIMARY KEY, path TEXT NOT NULL, "
+                     "format TEXT NOT NULL, row_count INTEGER, columns TEXT, version INTEGER)")
+        conn.execute("CREATE TABLE IF NOT EXISTS entries (namespace TEXT NOT NULL, key TEXT NOT NULL, "
+                     "value BLOB, PRIMARY KEY (namespace, key))")
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; WAL lets readers in other workers proceed while one worker writes
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+class SharedTableStore(MutableMapping):
+    """Tables persisted as Parquet files and listed in a SQLite catalog."""
+    shared = True
+
+    def __init__(self, catalog: SqliteCatalog, max_cached_frames: int = MAX_CACHED_FRAMES):
+        self.catalog = catalog
+        self.max_cached_frames = max_cached_frames
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _write(self, table_name: str, df: pd.DataFrame):
+        path = os.path.join(self.catalog.directory, f"{table_name}-{uuid.uuid4().hex[:8]}.parquet")
+        try:
+            write_parquet(df, path + ".tmp")
+        except BaseException:
+            self._remove_file(path + ".tmp")
+            raise
+        os.replace(path + ".tmp", path)
+        return path, "parquet"
+
+    def _read(self, path: str, fmt: str) -> pd.DataFrame:
+        return read_parquet(path, memory_map=True)
+
+    def _remove_file(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def __setitem__(self, table_name: str, df: pd.DataFrame):
+        path, fmt = self._write(table_name, df)
+        version = time.time_ns()
+        conn = self.catalog.connect()
+        old = conn.execute("SELECT path FROM tables WHERE name = ?", (table_name,)).fetchone()
+        conn.execute("INSERT OR REPLACE INTO tables VALUES (?, ?, ?, ?, ?, ?)",
+                     (table_name, path, fmt, len(df), json.dumps([str(c) for c in df.columns]), version))
+        if old is not None and old[0] != path:
+            self._remove_file(old[0])
+        with self._lock:
+            self._remember(table_name, version, df)
+
+    def _remember(self, table_name: str, version: int, df: pd.DataFrame):
+        self._frames[table_name] = (version, df)
+        self._frames.move_to_end(table_name)
+        while len(self._frames) > self.max_cached_frames:
+            self._frames.popitem(last=False)
+
+    def __getitem__(self, table_name: str) -> pd.DataFrame:
+        conn = self.catalog.connect()
+        for _ in range(2):
+            row = conn.execute("SELECT path, format, version FROM tables WHERE name = ?", (table_name,)).fetchone()
+            if row is None:
+                break
+            path, fmt, version = row
+            with self._lock:
+                cached = self._frames.get(table_name)
+                if cached is not None and cached[0] == version:
+                    self._frames.move_to_end(table_name)
+                    return cached[1]
+            try:
+                df = self._read(path, fmt)
+            except FileNotFoundError:
+                # Replaced by another worker between the lookup and the read
+                continue
+            with self._lock:
+                self._remember(table_name, version, df)
+            return df
+        with self._lock:
+            self._frames.pop(table_name, None)
+        raise KeyError(table_name)
+
+    def __delitem__(self, table_name: str):
+        conn = self.catalog.connect()
+        row = conn.execute("SELECT path FROM tables WHERE name = ?", (table_name,)).fetchone()
+        if row is None:
+            raise KeyError(table_name)
+        conn.execute("DELETE FROM tables WHERE name = ?", (table_name,))
+        self._remove_file(row[0])
+        with self._lock:
+            self._frames.pop(table_name, None)
+
+    def __contains__(self, table_name) -> bool:
+        conn = self.catalog.connect()
+        return conn.execute("SELECT 1 FROM tables WHERE name = ?", (table_name,)).fetchone() is not None
+
+    def __iter__(self):
+        rows = self.catalog.connect().execute("SELECT name FROM tables ORDER BY rowid").fetchall()
+        return iter([name for (name,) in rows])
+
+    def __len__(self) -> int:
+        return self.catalog.connect().execute("SELECT COUNT(*) FROM tables").fetchone()[0]
+
+    def summary(self, table_name: str) -> Dict:
+        row = self.catalog.connect().execute(
+            "SELECT row_count, columns FROM tables WHERE name = ?", (table_name,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(table_name)
+        columns = json.loads(row[1])
+        return {"row_count": row[0], "column_count": len(columns), "columns": columns}
+
+    def clear(self):
+        conn = self.catalog.connect()
+        paths = [path for (path,) in conn.execute("SELECT path FROM tables").fetchall()]
+        conn.execute("DELETE FROM tables")
+        for path in paths:
+            self._remove_file(path)
+        with self._lock:
+            self._frames.clear()
+
+class SharedMapping(MutableMapping):
+    """JSON key/value namespace in the shared catalog; iterates in last-write order."""
+
+    def __init__(self, catalog: SqliteCatalog, namespace: str):
+        self.catalog = catalog
+        self.namespace = namespace
+
+    def __getitem__(self, key):
+        row = self.catalog.connect().execute(
+            "SELECT value FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0], object_hook=_json_object)
+
+    def __setitem__(self, key, value):
+        self.catalog.connect().execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+            (self.namespace, key, json.dumps(value, default=_json_default))
+        )
+
+    def __delitem__(self, key):
+        cursor = self.catalog.connect().execute(
+            "DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+        )
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return self.catalog.connect().execute(
+            "SELECT 1 FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone() is not None
+
+    def __iter__(self):
+        rows = self.catalog.connect().execute(
+            "SELECT key FROM entries WHERE namespace = ? ORDER BY rowid", (self.namespace,)
+        ).fetchall()
+        return iter([key for (key,) in rows])
+
+    def __len__(self) -> int:
+        return self.catalog.connect().execute(
+            "SELECT COUNT(*) FROM entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+    def clear(self):
+        self.catalog.connect().execute("DELETE FROM entries WHERE namespace = ?", (self.namespace,))
+
+def catalog_from_env() -> Optional[SqliteCatalog]:
+    backend = os.environ.get("DQC_TABLE_STORE", "memory").lower()
+    if backend == "memory":
+        return None
+    if backend != "shared":
+        raise ValueError(f"DQC_TABLE_STORE must be 'memory' or 'shared', got '{backend}'")
+    if pq is None:
+        raise ValueError("DQC_TABLE_STORE=shared requires pyarrow")
+    # The default is per user, so another account's directory of the same name is never picked up
+    user = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+    directory = os.environ.get("DQC_TABLE_STORE_DIR") or os.path.join(tempfile.gettempdir(), f"dqc_tables-{user}")
+    return SqliteCatalog(directory)
+
+shared_catalog = catalog_from_env()
+
+def open_table_store(catalog: Optional[SqliteCatalog] = shared_catalog):
+    return SharedTableStore(catalog) if catalog is not None else InMemoryTableStore()
+
+def open_mapping(namespace: str, catalog: Optional[SqliteCatalog] = shared_catalog, ordered: bool = False):
+    if catalog is not None:
+        return SharedMapping(catalog, namespace)
+    return OrderedDict() if ordered else {}
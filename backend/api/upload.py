@@ -1,24 +1,55 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
-from fastapi import APIRouter, File, UploadFile, HTTPException, Query, Form, Body
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query, Form, Body, Header, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from typing import List
 import pandas as pd
 import re
-from ml.anomaly_checker import run_comprehensive_anomaly_detection
+import uuid
+import json
+from ml.anomaly_checker import run_comprehensive_anomaly_detection, normalize_null_tokens
+from ml.row_fingerprint import compute_row_fingerprints, find_duplicate_groups
+from ml.near_duplicate import NearDuplicateIndex
+from ml.key_discovery import KeySketchIndex
+from ml.profiling import StageProfiler, profile_call
+from ml.emission import DEFAULT_MAX_EXAMPLES
+from ml.sampling import choose_strata_column, sample_positions, extrapolate_quality_metrics
+from ml.sql_engine import SQL_ENGINES, open_sql_engine
+from ml.anomaly_ensemble import COMPLEX_DETECTORS
+from ml.rules import parse_rule_spec
+from api.anomalies import anomaly_store
+from api.result_cache import cache_from_env, hash_upload, make_cache_key
+from api.parsing import STREAM_EXTENSIONS, read_upload, read_upload_stream, select_excel_sheets
+from api.streaming import StreamLimiter, UploadTooLarge, stream_into
+from api.serialization import sanitize_for_json, FastJSONResponse, StreamingJSONResponse
+from api.table_store import open_table_store, open_mapping
 import random
 import numpy as np
-import math
 
 router = APIRouter()
 
-in_memory_tables = {}
-last_filename_to_table = {}
+# Tables, filenames and previews live in the table store so every worker sees them (DQC_TABLE_STORE=shared);
+# fingerprints, the near-duplicate index and the key sketches are per-process and rebuilt from the store on demand
+in_memory_tables = open_table_store()
+last_filename_to_table = open_mapping("filenames")
+table_content_hashes = open_mapping("content_hashes")
+indexed_tables = open_mapping("indexed_tables")
+table_fingerprints = {}
+near_duplicate_index = NearDuplicateIndex()
+key_sketch_index = KeySketchIndex()
+result_cache = cache_from_env()
+preview_sessions = open_mapping("previews", ordered=True)
+MAX_PREVIEW_SESSIONS = 32
+stream_limiter = StreamLimiter()
+
+def sanitize_column_name(col: str) -> str:
+    col = re.sub(r'[^a-zA-Z0-9_]', '_', col)
+    return re.sub(r'^[^a-zA-Z_]+', '_', col) if not re.match(r'^[a-zA-Z_]', col) else col
 
 def sanitize_columns(df):
-    df.columns = [re.sub(r'[^a-zA-Z0-9_]', '_', col) for col in df.columns]
-    df.columns = [re.sub(r'^[^a-zA-Z_]+', '_', col) if not re.match(r'^[a-zA-Z_]', col) else col for col in df.columns]
+    df.columns = [sanitize_column_name(col) for col in df.columns]
     return df
 
 def infer_sql_type(dtype):
@@ -33,48 +64,259 @@ def infer_sql_type(dtype):
     else:
         return "TEXT"
 
-def process_single_file(file: UploadFile, analysis_type: str):
-    filename = file.filename
-    ext = os.path.splitext(filename)[-1].lower()
-    
+def _register_table(table_name: str, df: pd.DataFrame, content_hash: str, fingerprints: pd.Series = None,
+                    index_entry: dict = None):
+    in_memory_tables[table_name] = df
+    table_content_hashes[table_name] = content_hash
+    table_fingerprints[table_name] = fingerprints if fingerprints is not None else compute_row_fingerprints(df)
+    key_sketch_index.add_table(table_name, df, content_hash)
+    if index_entry is not None:
+        near_duplicate_index.restore_table(table_name, index_entry)
+    else:
+        near_duplicate_index.add_table(table_name, df)
+    indexed_tables[table_name] = True
+
+def _sync_near_duplicate_index():
+    """Index the tables other workers registered and drop the ones they deleted."""
+    indexed = set(indexed_tables)
+    for table_name in [t for t in near_duplicate_index.tables if t not in indexed]:
+        near_duplicate_index.remove_table(table_name)
+        table_fingerprints.pop(table_name, None)
+    for table_name in indexed.difference(near_duplicate_index.tables):
+        df = in_memory_tables.get(table_name)
+        if df is not None:
+            near_duplicate_index.add_table(table_name, df)
+
+def _sync_key_sketches():
+    """Sketch the tables other workers or previews stored and drop the ones that were deleted."""
+    names = set(in_memory_tables)
+    for table_name in [t for t in key_sketch_index.tables if t not in names]:
+        key_sketch_index.remove_table(table_name)
+    for table_name in names:
+        content_hash = table_content_hashes.get(table_name)
+        entry = key_sketch_index.tables.get(table_name)
+        if entry is None or entry['version'] != content_hash:
+            df = in_memory_tables.get(table_name)
+            if df is not None:
+                key_sketch_index.add_table(table_name, df, content_hash)
+
+def _cached_response(entry: dict, profiler: StageProfiler, **overrides):
+    result = dict(entry["result"])
+    if anomaly_store.get(result["analysis_id"]) is None:
+        anomaly_store.put(result["analysis_id"], entry["anomaly_results"],
+                          {"table_name": result["table_name"], "mode": result["mode_used"]})
+    result.update(overrides)
+    result["cache_hit"] = True
+    result["timings"] = profiler.to_list()
+    result["total_seconds"] = profiler.total_wall_seconds()
+    return result
+
+def _run_preview(table_name: str, df: pd.DataFrame, analysis_type: str, quality_score_mode: str, sample_size: int,
+                 routing: dict, profiler: StageProfiler, max_examples: int = DEFAULT_MAX_EXAMPLES,
+                 sql_engine: str = "auto", complex_detector: str = "hbos", rules: dict = None):
+    """Run the detectors on a stratified sample and extrapolate the quality metrics to the whole table."""
+    with profiler.stage('sampling', len(df)):
+        strata_column = choose_strata_column(df)
+        positions, strata, population_sizes = sample_positions(df, sample_size, strata_column)
+        sample_df = df.iloc[positions].reset_index(drop=True)
+
+    results = run_comprehensive_anomaly_detection(
+        sample_df, mode=analysis_type, quality_score_mode=quality_score_mode, profiler=profiler,
+        normalize_nulls=False, routing=routing, max_examples=max_examples, sql_engine=sql_engine,
+        complex_detector=complex_detector, rules=rules
+    )
+    report = results['report']
+    with profiler.stage('extrapolation', len(sample_df)):
+        issue_types = results['anomaly_results']['issue_type'].unique() if not results['anomaly_results'].empty else []
+        quality_metrics = extrapolate_quality_metrics(results['row_anomaly_index'], strata, population_sizes,
+                                                      quality_score_mode, issue_types=issue_types)
+        quality_metrics['strata_column'] = strata_column
+        # Report anomalies against the rows of the full table, not the sample
+        anomaly_results = results['anomaly_results'].copy()
+        if not anomaly_results.empty:
+            anomaly_results['row_index'] = positions[anomaly_results['row_index'].to_numpy(dtype=np.int64)]
+        top_anomalies = [dict(a, row_index=int(positions[int(a['row_index'])])) for a in report.get('top_anomalies', [])]
+
+    preview_id = uuid.uuid4().hex
+    preview_sessions[preview_id] = {
+        "table_name": table_name,
+        "routing": routing,
+        "rules": rules,
+        "column_profile": results['column_profile']
+    }
+    while len(preview_sessions) > MAX_PREVIEW_SESSIONS:
+        preview_sessions.pop(next(iter(preview_sessions)), None)
+
+    with profiler.stage('store_results', len(anomaly_results)):
+        analysis_id = uuid.uuid4().hex
+        anomaly_store.put(analysis_id, anomaly_results, {"table_name": table_name, "mode": analysis_type})
+
+    log_output = results.get('log', '')
+    return {
+        "table_name": table_name,
+        "analysis_id": analysis_id,
+        "preview": True,
+        "preview_id": preview_id,
+        "anomaly_event_count": report.get('anomaly_event_count', 0),
+        "schema": df.dtypes.apply(lambda x: str(x)).to_dict(),
+        "sample": df.head(10).where(pd.notnull(df.head(10)), None).to_dict(orient="records"),
+        "row_count": len(df),
+        "anomaly_summary": report.get('anomaly_summary', {}),
+        "quality_metrics": quality_metrics,
+        "sample_quality_metrics": report.get('quality_metrics', {}),
+        "top_anomalies": top_anomalies,
+        "feature_importance": report.get('feature_importance', []),
+        "column_routing": results['column_routing'],
+        "recommendations": results['recommendations'],
+        "log": log_output,
+        "formatted_output": log_output,
+        "mode_used": analysis_type,
+        "timings": profiler.to_list(),
+        "total_seconds": profiler.total_wall_seconds(),
+        "cache_hit": False,
+        "status": "success"
+    }
+
+ROUTING_DESCRIPTION = ('JSON object overriding the columns each detector sees, e.g. '
+                       '{"numeric": ["amount"], "keys": ["customer_id"], "exclude": ["notes"]}')
+
+MAX_EXAMPLES_DESCRIPTION = ("Representative events kept per (column, issue_type) by the relational detectors; "
+                            "the rest are only counted")
+
+SHEETS_DESCRIPTION = ('Excel sheets to analyze: a comma-separated list of sheet names, or "*" for every sheet; '
+                      'each sheet becomes its own table')
+SQL_ENGINE_DESCRIPTION = ('Engine for the relational checks of the sql mode: "duckdb" runs them as set-based queries, '
+                          '"auto" picks it for large tables when duckdb is installed')
+COMPLEX_DETECTOR_DESCRIPTION = ('Unsupervised detector for cross-column patterns: "hbos" (histogram-based, default) '
+                                'or the previous "lightgbm" model')
+RULES_DESCRIPTION = ('JSON or YAML rule spec replacing the heuristic relational checks, e.g. '
+                     '{"required_columns": ["email"], "foreign_key_mappings": {"customer_id": "customers"}, '
+                     '"constraint_mappings": {"age": {"min_value": 0}}}; checks it does not name are not run')
+STREAM_RULES_DESCRIPTION = ("Rule spec for a streamed upload, sent as a header because the body is the file; "
+                            "JSON on one line")
+STREAM_FILENAME_DESCRIPTION = ("Name of the uploaded file; its extension selects the parser and it names the table "
+                               "like the multipart upload does")
+
+def _parse_rules_param(value: str | None):
+    return parse_rule_spec(value) if value else None
+
+def _parse_json_param(value: str | None, name: str):
+    if not value:
+        return None
     try:
-        file.file.seek(0)
-        
-        if ext == ".csv":
-            df = pd.read_csv(file.file)
-        elif ext in [".xlsx", ".xls"]:
-            df = pd.read_excel(file.file)
-        elif ext == ".json":
-            df = pd.read_json(file.file)
-        else:
-            raise ValueError(f"Unsupported file type: {ext}")
-    except Exception as e:
-        raise ValueError(f"File parsing error for {filename}: {e}")
+        return json.loads(value)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON for {name}: {e}")
+
+def _split_columns(value: str | None):
+    return [c.strip() for c in value.split(",") if c.strip()] if value else None
 
-    df = sanitize_columns(df)
+def _remember_filename(filename: str, sheet: str, table_name: str):
+    # Sheets are addressed as "workbook.xlsx#Sheet"; the bare filename points at the first sheet seen
+    if sheet is None:
+        last_filename_to_table[filename] = table_name
+    else:
+        last_filename_to_table[f"{filename}#{sheet}"] = table_name
+        last_filename_to_table.setdefault(filename, table_name)
 
-    def null_to_nan(val):
-        if isinstance(val, str) and re.fullmatch(r'null', val, re.IGNORECASE):
-            return np.nan
-        return val
+def process_upload(file: UploadFile, analysis_type: str, quality_score_mode: str = "events", sheets: str = None,
+                   **options) -> List[dict]:
+    """Process an upload, expanding Excel workbooks into one table per selected sheet."""
+    ext = os.path.splitext(file.filename)[-1].lower()
+    if ext not in (".xlsx", ".xls") or not sheets:
+        return [process_single_file(file, analysis_type, quality_score_mode, **options)]
+    content_hash = hash_upload(file.file)
+    return [
+        process_single_file(file, analysis_type, quality_score_mode, sheet=sheet, content_hash=content_hash, **options)
+        for sheet in select_excel_sheets(file.file, ext, sheets)
+    ]
 
-    df = df.applymap(null_to_nan)
-    
+def process_single_file(file: UploadFile, analysis_type: str, quality_score_mode: str = "events",
+                        csv_engine: str = "auto", dtype_hints: dict = None, columns: List[str] = None,
+                        routing: dict = None, preview: bool = False, sample_size: int = 10000,
+                        max_examples: int = DEFAULT_MAX_EXAMPLES, sheet: str = None, content_hash: str = None,
+                        sql_engine: str = "auto", complex_detector: str = "hbos", rules: dict = None,
+                        filename: str = None, parsed: pd.DataFrame = None, profiler: StageProfiler = None):
+    # Streamed uploads arrive already parsed and hashed, with no file to read
+    filename = filename or file.filename
+    ext = os.path.splitext(filename)[-1].lower()
+    profiler = profiler or StageProfiler()
+
+    if content_hash is None:
+        with profiler.stage('content_hash'):
+            content_hash = hash_upload(file.file)
     base_name = os.path.splitext(os.path.basename(filename))[0].replace("-", "_").replace(" ", "_").lower()
-    table_name = f"{base_name}_{hash(filename) % 10000}"
+    if sheet is not None:
+        base_name = f"{base_name}_{re.sub(r'[^a-z0-9_]', '_', sheet.lower())}"
+    table_name = f"{base_name}_{content_hash[:8]}"
+    _sync_near_duplicate_index()
+    cache_key = make_cache_key(content_hash, "upload", {
+        "table_name": table_name,
+        "analysis_type": analysis_type,
+        "quality_score_mode": quality_score_mode,
+        "dtype_hints": dtype_hints,
+        "columns": columns,
+        "routing": routing,
+        "max_examples": max_examples,
+        "sql_engine": sql_engine,
+        "complex_detector": complex_detector,
+        "rules": rules,
+        "other_tables": sorted(t for t in near_duplicate_index.tables if t != table_name)
+    })
+    with profiler.stage('cache_lookup'):
+        cached = result_cache.get(cache_key)
+    if cached is not None:
+        if table_content_hashes.get(table_name) != content_hash:
+            _register_table(table_name, cached["table"], content_hash, cached["fingerprints"], cached["index_entry"])
+        _remember_filename(filename, sheet, table_name)
+        return _cached_response(cached, profiler, filename=filename)
     
-    in_memory_tables[table_name] = df
+    if parsed is not None:
+        df = parsed
+    else:
+        try:
+            with profiler.stage('parse'):
+                df = read_upload(file.file, ext, csv_engine, dtype_hints, columns, sheet)
+        except Exception as e:
+            raise ValueError(f"File parsing error for {filename}: {e}")
+        profiler.stages[-1]['rows'] = len(df)
+        profiler.stages[-1]['engine'] = df.attrs.get('parse_engine', 'pandas')
 
-    try:
-        global last_filename_to_table
-        last_filename_to_table[filename] = table_name
-    except Exception:
-        pass
+    with profiler.stage('sanitize', len(df)):
+        df = sanitize_columns(df)
+
+    if ext != ".csv":
+        # CSV null tokens are already handled by the parser
+        with profiler.stage('null_normalization', len(df)):
+            df = normalize_null_tokens(df)
+
+    if preview:
+        # Fingerprints and the near-duplicate index are built when the preview is upgraded
+        in_memory_tables[table_name] = df
+        table_content_hashes[table_name] = content_hash
+        key_sketch_index.add_table(table_name, df, content_hash)
+        _remember_filename(filename, sheet, table_name)
+        result = _run_preview(table_name, df, analysis_type, quality_score_mode, sample_size, routing, profiler,
+                              max_examples, sql_engine, complex_detector, rules)
+        return dict(result, filename=filename, sheet=sheet)
+    
+    with profiler.stage('fingerprint', len(df)):
+        fingerprints = compute_row_fingerprints(df)
+    with profiler.stage('cross_file_duplicate', len(df)):
+        _register_table(table_name, df, content_hash, fingerprints)
+        cross_file_matches = near_duplicate_index.query_table(table_name)
+
+    _remember_filename(filename, sheet, table_name)
     
     schema = df.dtypes.apply(lambda x: str(x)).to_dict()
     sample = df.head(10).where(pd.notnull(df.head(10)), None).to_dict(orient="records")
 
-    results = run_comprehensive_anomaly_detection(df, mode=analysis_type)
+    results = run_comprehensive_anomaly_detection(
+        df, mode=analysis_type, fingerprints=table_fingerprints[table_name],
+        extra_results={'cross_file_duplicate': cross_file_matches} if len(cross_file_matches) else None,
+        quality_score_mode=quality_score_mode, profiler=profiler, normalize_nulls=False, routing=routing,
+        max_examples=max_examples, sql_engine=sql_engine, complex_detector=complex_detector, rules=rules
+    )
     report = results['report']
     recommendations = results['recommendations']
     log_output = results.get('log', '')
@@ -87,9 +329,16 @@ def process_single_file(file: UploadFile, analysis_type: str):
         f"RECOMMENDATIONS:\n  " + "\n  ".join(recommendations)
     )
 
-    return {
+    with profiler.stage('store_results', len(results['anomaly_results'])):
+        analysis_id = uuid.uuid4().hex
+        anomaly_store.put(analysis_id, results['anomaly_results'], {"table_name": table_name, "mode": analysis_type})
+
+    result = {
         "filename": filename,
+        "sheet": sheet,
         "table_name": table_name,
+        "analysis_id": analysis_id,
+        "anomaly_event_count": report.get('anomaly_event_count', 0),
         "schema": schema,
         "sample": sample,
         "row_count": len(df),
@@ -97,51 +346,144 @@ def process_single_file(file: UploadFile, analysis_type: str):
         "quality_metrics": report.get('quality_metrics', {}),
         "top_anomalies": report.get('top_anomalies', []),
         "feature_importance": report.get('feature_importance', []),
+        "column_routing": results['column_routing'],
         "recommendations": recommendations,
         "log": log_output,
         "formatted_output": formatted_output,
         "mode_used": analysis_type,
+        "timings": profiler.to_list(),
+        "total_seconds": profiler.total_wall_seconds(),
+        "cache_hit": False,
         "status": "success"
     }
-
-def sanitize_for_json(obj):
-    if isinstance(obj, (np.floating, np.integer, np.bool_)):
-        obj = obj.item()
-    if isinstance(obj, float):
-        if math.isnan(obj) or math.isinf(obj):
-            return None
-        return obj
-   
-    if isinstance(obj, dict):
-        return {str(k): sanitize_for_json(v) for k, v in obj.items()}
-    if isinstance(obj, (list, tuple, set)):
-        return [sanitize_for_json(v) for v in obj]
-    if isinstance(obj, pd.Series):
-        return sanitize_for_json(obj.to_dict())
-    if isinstance(obj, pd.DataFrame):
-        return sanitize_for_json(obj.to_dict(orient="records"))
-    return obj
+    result_cache.put(cache_key, {
+        "result": dict(result),
+        "anomaly_results": results['anomaly_results'],
+        "table": df,
+        "fingerprints": fingerprints,
+        "index_entry": near_duplicate_index.tables.get(table_name)
+    })
+    return result
 
 @router.post("/upload")
 def upload_file(
     file: UploadFile = File(...),
-    analysis_type: str = Query("sql", enum=["sql", "ml"])
+    analysis_type: str = Query("sql", enum=["sql", "ml"]),
+    quality_score_mode: str = Query("events", enum=["events", "rows"]),
+    profile: str | None = Query(None, enum=["cprofile", "pyinstrument"]),
+    csv_engine: str = Query("auto", enum=["auto", "c", "pyarrow"]),
+    columns: str | None = Query(None, description="Comma-separated subset of columns to load"),
+    dtypes: str | None = Query(None, description='JSON object of dtype hints, e.g. {"age": "int"}'),
+    routing: str | None = Query(None, description=ROUTING_DESCRIPTION),
+    preview: bool = Query(False, description="Analyze a sample and extrapolate the quality metrics"),
+    sample_size: int = Query(10000, ge=100),
+    max_examples: int = Query(DEFAULT_MAX_EXAMPLES, ge=1, description=MAX_EXAMPLES_DESCRIPTION),
+    sheets: str | None = Query(None, description=SHEETS_DESCRIPTION),
+    sql_engine: str = Query("auto", enum=SQL_ENGINES, description=SQL_ENGINE_DESCRIPTION),
+    complex_detector: str = Query("hbos", enum=COMPLEX_DETECTORS, description=COMPLEX_DETECTOR_DESCRIPTION),
+    rules: str | None = Form(None, description=RULES_DESCRIPTION)
 ):
     """Single file upload endpoint - kept for backward compatibility"""
     random.seed(42)
     np.random.seed(42)
     
     try:
-        result = process_single_file(file, analysis_type)
-        return JSONResponse(sanitize_for_json(result))
+        options = dict(csv_engine=csv_engine, dtype_hints=_parse_json_param(dtypes, "dtypes"),
+                       columns=_split_columns(columns), routing=_parse_json_param(routing, "routing"),
+                       preview=preview, sample_size=sample_size, max_examples=max_examples, sql_engine=sql_engine,
+                       complex_detector=complex_detector, rules=_parse_rules_param(rules))
+        if profile:
+            results, profile_report = profile_call(profile, process_upload, file, analysis_type, quality_score_mode,
+                                                   sheets, **options)
+        else:
+            results, profile_report = process_upload(file, analysis_type, quality_score_mode, sheets, **options), None
+        if sheets:
+            result = {"filename": file.filename, "total_sheets": len(results), "results": results}
+        else:
+            result = results[0]
+        if profile_report is not None:
+            result["profile"] = profile_report
+        return FastJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def _process_streamed(filename: str, df: pd.DataFrame, content_hash: str, analysis_type: str,
+                       quality_score_mode: str, profiler: StageProfiler, **options) -> dict:
+    random.seed(42)
+    np.random.seed(42)
+    return process_single_file(None, analysis_type, quality_score_mode, filename=filename, parsed=df,
+                               content_hash=content_hash, profiler=profiler, **options)
+
+@router.post("/upload-stream")
+async def upload_stream(
+    request: Request,
+    filename: str = Query(..., description=STREAM_FILENAME_DESCRIPTION),
+    analysis_type: str = Query("sql", enum=["sql", "ml"]),
+    quality_score_mode: str = Query("events", enum=["events", "rows"]),
+    csv_engine: str = Query("auto", enum=["auto", "c", "pyarrow"]),
+    columns: str | None = Query(None, description="Comma-separated subset of columns to load"),
+    dtypes: str | None = Query(None, description='JSON object of dtype hints, e.g. {"age": "int"}'),
+    routing: str | None = Query(None, description=ROUTING_DESCRIPTION),
+    preview: bool = Query(False, description="Analyze a sample and extrapolate the quality metrics"),
+    sample_size: int = Query(10000, ge=100),
+    max_examples: int = Query(DEFAULT_MAX_EXAMPLES, ge=1, description=MAX_EXAMPLES_DESCRIPTION),
+    sql_engine: str = Query("auto", enum=SQL_ENGINES, description=SQL_ENGINE_DESCRIPTION),
+    complex_detector: str = Query("hbos", enum=COMPLEX_DETECTORS, description=COMPLEX_DETECTOR_DESCRIPTION),
+    rules: str | None = Header(None, alias="X-Rules", description=STREAM_RULES_DESCRIPTION)
+):
+    """Upload a file as the raw request body; CSV and JSON lines/arrays are parsed while they arrive"""
+    ext = os.path.splitext(filename)[-1].lower()
+    if ext not in STREAM_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
+    try:
+        dtype_hints, usecols = _parse_json_param(dtypes, "dtypes"), _split_columns(columns)
+        options = dict(csv_engine=csv_engine, dtype_hints=dtype_hints, columns=usecols,
+                       routing=_parse_json_param(routing, "routing"), preview=preview, sample_size=sample_size,
+                       max_examples=max_examples, sql_engine=sql_engine, complex_detector=complex_detector,
+                       rules=_parse_rules_param(rules))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not stream_limiter.try_acquire():
+        raise HTTPException(status_code=429, detail="Too many uploads in progress; retry shortly",
+                            headers={"Retry-After": "1"})
+    # The slot is held through the analysis too, which bounds the parsed tables held by streamed uploads
+    try:
+        declared = request.headers.get("content-length")
+        profiler = StageProfiler()
+        try:
+            with profiler.stage('stream_parse'):
+                df, content_hash, size = await stream_into(
+                    request.stream(), lambda stream: read_upload_stream(stream, ext, csv_engine, dtype_hints, usecols),
+                    stream_limiter, int(declared) if declared and declared.isdigit() else None)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"File parsing error for {filename}: {e}")
+        profiler.stages[-1].update(rows=len(df), bytes=size, engine=df.attrs.get('parse_engine', 'pandas'))
+        try:
+            result = await run_in_threadpool(_process_streamed, filename, df, content_hash, analysis_type,
+                                             quality_score_mode, profiler, **options)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse(result)
+    finally:
+        stream_limiter.release()
+
 @router.post("/upload-multiple")
 def upload_multiple_files(
     files: List[UploadFile] = File(...),
     analysis_type: str = Query("sql", enum=["sql", "ml"]),
-    relationships: str | None = Form(None)
+    relationships: str | None = Form(None),
+    quality_score_mode: str = Query("events", enum=["events", "rows"]),
+    csv_engine: str = Query("auto", enum=["auto", "c", "pyarrow"]),
+    columns: str | None = Query(None, description="Comma-separated subset of columns to load"),
+    dtypes: str | None = Form(None, description='JSON object of dtype hints, e.g. {"age": "int"}'),
+    routing: str | None = Form(None, description=ROUTING_DESCRIPTION),
+    max_examples: int = Query(DEFAULT_MAX_EXAMPLES, ge=1, description=MAX_EXAMPLES_DESCRIPTION),
+    sheets: str | None = Query(None, description=SHEETS_DESCRIPTION),
+    sql_engine: str = Query("auto", enum=SQL_ENGINES, description=SQL_ENGINE_DESCRIPTION),
+    complex_detector: str = Query("hbos", enum=COMPLEX_DETECTORS, description=COMPLEX_DETECTOR_DESCRIPTION),
+    rules: str | None = Form(None, description=RULES_DESCRIPTION)
 ):
     random.seed(42)
     np.random.seed(42)
@@ -155,9 +497,17 @@ def upload_multiple_files(
     filename_to_table = {}
     for file in files:
         try:
-            result = process_single_file(file, analysis_type)
-            results.append(result)
-            filename_to_table[file.filename] = result.get("table_name")
+            file_results = process_upload(
+                file, analysis_type, quality_score_mode, sheets, csv_engine=csv_engine,
+                dtype_hints=_parse_json_param(dtypes, "dtypes"), columns=_split_columns(columns),
+                routing=_parse_json_param(routing, "routing"), max_examples=max_examples, sql_engine=sql_engine,
+                complex_detector=complex_detector, rules=_parse_rules_param(rules)
+            )
+            for result in file_results:
+                results.append(result)
+                if result.get("sheet") is not None:
+                    filename_to_table[f"{file.filename}#{result['sheet']}"] = result.get("table_name")
+                filename_to_table.setdefault(file.filename, result.get("table_name"))
         except Exception as e:
             error_result = {
                 "filename": file.filename,
@@ -185,7 +535,7 @@ def upload_multiple_files(
     if filename_to_table:
         response_data["filename_to_table"] = filename_to_table
 
-    return JSONResponse(sanitize_for_json(response_data))
+    return StreamingJSONResponse(response_data)
 
 def _normalize_name(name: str) -> str:
     import re
@@ -224,7 +574,7 @@ def _infer_join_keys(df_primary: pd.DataFrame, df_other: pd.DataFrame) -> List[s
                     best_match = (score, c1)
     return [best_match[1]] if best_match else []
 
-def _infer_self_relationship_keys(df: pd.DataFrame) -> List[str]:
+def _infer_self_relationship_keys(df: pd.DataFrame, table_name: str = None) -> List[str]:
     """Infer potential self-relationship keys within the same table"""
     candidates = []
     
@@ -238,14 +588,11 @@ def _infer_self_relationship_keys(df: pd.DataFrame) -> List[str]:
             if 'id' in df.columns:
                 candidates.append(col)
     
-    # If no obvious candidates, look for columns that reference the primary key
-    if not candidates and 'id' in df.columns:
-        for col in df.columns:
-            if col != 'id' and df[col].dtype == df['id'].dtype:
-                # Check if values in this column exist in the id column
-                common_values = set(df[col].dropna()) & set(df['id'].dropna())
-                if len(common_values) > 0:
-                    candidates.append(col)
+    # If no obvious candidates, look for a column whose values the key sketches find in the id column
+    if not candidates and 'id' in df.columns and table_name is not None:
+        column = key_sketch_index.self_reference(table_name, 'id')
+        if column is not None:
+            candidates.append(column)
     
     return candidates[:1] if candidates else ['id'] if 'id' in df.columns else []
 
@@ -310,7 +657,28 @@ def _check_self_relationship(df: pd.DataFrame, keys: List[str], relation_type: s
     
     return issues
 
-def _check_cardinality(df_primary: pd.DataFrame, df_other: pd.DataFrame, keys: List[str], relation_type: str) -> List[dict]:
+def _duplicate_key_issues(df: pd.DataFrame, key: str, message: str, limit: int = 50, engine=None,
+                          table: str = None) -> List[dict]:
+    issues = []
+    groups = engine.key_duplicate_groups(table, key) if engine is not None else find_duplicate_groups(df, [key])
+    for members in groups[:limit]:
+        issues.append({
+            "issue_type": "cardinality_violation",
+            "details": f"{message}; value {df.loc[members[0], key]!r} duplicated at rows {[int(i) for i in members[:20]]}",
+            "duplicate_rows": [int(i) for i in members],
+            "group_size": len(members),
+        })
+    return issues
+
+def _align_join_key(df: pd.DataFrame, column: str, key: str) -> pd.DataFrame:
+    # The checks join on one column name, so a related key named differently takes the primary's name
+    renames = {column: key}
+    if key in df.columns:
+        renames[key] = f"{key}_related"
+    return df.rename(columns=renames)
+
+def _check_cardinality(df_primary: pd.DataFrame, df_other: pd.DataFrame, keys: List[str], relation_type: str,
+                       engine=None) -> List[dict]:
     issues = []
     if not keys:
         return issues
@@ -318,64 +686,49 @@ def _check_cardinality(df_primary: pd.DataFrame, df_other: pd.DataFrame, keys: L
     if key not in df_primary.columns or key not in df_other.columns:
         return issues
 
-    primary_dupes = df_primary.duplicated(subset=[key], keep=False)
-    other_dupes = df_other.duplicated(subset=[key], keep=False)
-
     if relation_type == "1:1":
-        if primary_dupes.any():
-            for idx in df_primary[primary_dupes].index[:50]:
-                issues.append({
-                    "issue_type": "cardinality_violation",
-                    "details": f"1:1 requires unique '{key}' in primary; duplicate at row {int(idx)}",
-                })
-        if other_dupes.any():
-            for idx in df_other[other_dupes].index[:50]:
-                issues.append({
-                    "issue_type": "cardinality_violation",
-                    "details": f"1:1 requires unique '{key}' in related; duplicate at row {int(idx)}",
-                })
+        issues.extend(_duplicate_key_issues(df_primary, key, f"1:1 requires unique '{key}' in primary",
+                                            engine=engine, table="primary"))
+        issues.extend(_duplicate_key_issues(df_other, key, f"1:1 requires unique '{key}' in related",
+                                            engine=engine, table="related"))
     elif relation_type == "1:M":
-        if primary_dupes.any():
-            for idx in df_primary[primary_dupes].index[:50]:
-                issues.append({
-                    "issue_type": "cardinality_violation",
-                    "details": f"1:M requires unique '{key}' in primary; duplicate at row {int(idx)}",
-                })
+        issues.extend(_duplicate_key_issues(df_primary, key, f"1:M requires unique '{key}' in primary",
+                                            engine=engine, table="primary"))
     elif relation_type == "M:1":
-        if other_dupes.any():
-            for idx in df_other[other_dupes].index[:50]:
-                issues.append({
-                    "issue_type": "cardinality_violation",
-                    "details": f"M:1 requires unique '{key}' in related; duplicate at row {int(idx)}",
-                })
+        issues.extend(_duplicate_key_issues(df_other, key, f"M:1 requires unique '{key}' in related",
+                                            engine=engine, table="related"))
     return issues
 
-def _check_referential(df_primary: pd.DataFrame, df_other: pd.DataFrame, keys: List[str]) -> List[dict]:
+def _check_referential(df_primary: pd.DataFrame, df_other: pd.DataFrame, keys: List[str], engine=None) -> List[dict]:
     issues = []
     if not keys:
         return issues
     key = keys[0]
     if key not in df_primary.columns or key not in df_other.columns:
         return issues
-    primary_keys = set(df_primary[key].dropna().astype(str))
-    other_keys = set(df_other[key].dropna().astype(str))
+    if engine is not None:
+        missing_in_primary, missing_in_other = engine.key_differences("primary", "related", key)
+    else:
+        primary_keys = set(df_primary[key].dropna().astype(str))
+        other_keys = set(df_other[key].dropna().astype(str))
+        missing_in_primary = len(other_keys - primary_keys)
+        missing_in_other = len(primary_keys - other_keys)
 
-    missing_in_primary = other_keys - primary_keys
     if missing_in_primary:
         issues.append({
             "issue_type": "referential_violation",
-            "details": f"{len(missing_in_primary)} keys in related not present in primary for key '{key}'",
+            "details": f"{missing_in_primary} keys in related not present in primary for key '{key}'",
         })
 
-    missing_in_other = primary_keys - other_keys
     if missing_in_other:
         issues.append({
             "issue_type": "unreferenced_keys",
-            "details": f"{len(missing_in_other)} keys in primary not referenced by related for key '{key}'",
+            "details": f"{missing_in_other} keys in primary not referenced by related for key '{key}'",
         })
     return issues
 
-def _check_conflicting_values(df_primary: pd.DataFrame, df_other: pd.DataFrame, keys: List[str]) -> List[dict]:
+def _check_conflicting_values(df_primary: pd.DataFrame, df_other: pd.DataFrame, keys: List[str],
+                              engine=None) -> List[dict]:
     issues = []
     if not keys:
         return issues
@@ -387,20 +740,47 @@ def _check_conflicting_values(df_primary: pd.DataFrame, df_other: pd.DataFrame,
     if not overlap_cols:
         return issues
     
-    merged = df_primary[[key] + overlap_cols].merge(
-        df_other[[key] + overlap_cols], on=key, how="inner", suffixes=("_primary", "_related")
-    )
+    if engine is not None:
+        conflicts = engine.conflicting_value_counts("primary", "related", key, overlap_cols)
+    else:
+        merged = df_primary[[key] + overlap_cols].merge(
+            df_other[[key] + overlap_cols], on=key, how="inner", suffixes=("_primary", "_related")
+        )
+        conflicts = {}
+        for col in overlap_cols:
+            left = f"{col}_primary"
+            right = f"{col}_related"
+            conflicts[col] = int(((merged[left].notna()) & (merged[right].notna()) & (merged[left] != merged[right])).sum())
     for col in overlap_cols:
-        left = f"{col}_primary"
-        right = f"{col}_related"
-        diffs = merged[(merged[left].notna()) & (merged[right].notna()) & (merged[left] != merged[right])]
-        if not diffs.empty:
+        if conflicts[col]:
             issues.append({
                 "issue_type": "inconsistent_update",
-                "details": f"Column '{col}' has {len(diffs)} conflicting values between primary and related",
+                "details": f"Column '{col}' has {conflicts[col]} conflicting values between primary and related",
             })
     return issues
 
+@router.get("/key-candidates")
+def key_candidates(
+    table_name: str | None = Query(None, description="Only pairs with a column of this table"),
+    min_containment: float = Query(0.5, ge=0, le=1, description="Smallest estimated share of the foreign values "
+                                                                "found in the key"),
+    limit: int = Query(50, ge=1)
+):
+    """Rank key/foreign-key column pairs across every loaded table by estimated value containment"""
+    profiler = StageProfiler()
+    with profiler.stage('key_sketches'):
+        _sync_key_sketches()
+    with profiler.stage('key_discovery'):
+        candidates = key_sketch_index.candidates(min_containment=min_containment)
+        if table_name is not None:
+            candidates = candidates[(candidates['foreign_table'] == table_name) | (candidates['key_table'] == table_name)]
+    return FastJSONResponse(sanitize_for_json({
+        "tables": len(key_sketch_index.tables),
+        "total_candidates": len(candidates),
+        "candidates": candidates.head(limit),
+        "timings": profiler.to_list(),
+    }))
+
 @router.post("/analyze-relationships")
 def analyze_relationships(
     payload: dict = Body(..., description="Relationships and file contexts for cross-table analysis")
@@ -408,6 +788,7 @@ def analyze_relationships(
     try:
         relationships = payload.get("relationships") or {}
         file_contexts = payload.get("files") or []
+        sql_engine = payload.get("sql_engine", "auto")
       
         filename_to_table = {ctx.get("filename"): ctx.get("table_name") for ctx in file_contexts if ctx.get("filename") and ctx.get("table_name")}
         if not filename_to_table:
@@ -438,6 +819,7 @@ def analyze_relationships(
 
         relation_results = []
         processed_pairs = set()
+        _sync_key_sketches()
 
         for rel in new_relationships:
             table1_name = rel.get("table1")
@@ -482,10 +864,13 @@ def analyze_relationships(
 
             df1 = in_memory_tables[table1]
             df2 = in_memory_tables[table2]
+            keys = rel.get("keys")
+            if isinstance(keys, str):
+                keys = [keys]
             
             # Handle self-relationships
             if table1_name == table2_name:
-                keys = _infer_self_relationship_keys(df1)
+                keys = keys or _infer_self_relationship_keys(df1, table1)
                 anomalies = _check_self_relationship(df1, keys, relation_type)
                 
                 relation_results.append({
@@ -497,59 +882,92 @@ def analyze_relationships(
                     "self_relationship": True
                 })
             else:
-                keys = _infer_join_keys(df1, df2)
-                anomalies = []
-                anomalies.extend(_check_cardinality(df1, df2, keys, relation_type))
-                anomalies.extend(_check_referential(df1, df2, keys))
-                anomalies.extend(_check_conflicting_values(df1, df2, keys))
+                # Without explicit keys, prefer the pair whose values the key sketches match; names are the fallback
+                key_pair = None if keys else key_sketch_index.best_pair(table1, table2)
+                if key_pair is not None:
+                    keys = [key_pair["primary_column"]]
+                    if key_pair["related_column"] != key_pair["primary_column"]:
+                        df2 = _align_join_key(df2, key_pair["related_column"], key_pair["primary_column"])
+                keys = keys or _infer_join_keys(df1, df2)
+                engine = open_sql_engine(sql_engine, {"primary": df1, "related": df2})
+                try:
+                    anomalies = []
+                    anomalies.extend(_check_cardinality(df1, df2, keys, relation_type, engine))
+                    anomalies.extend(_check_referential(df1, df2, keys, engine))
+                    anomalies.extend(_check_conflicting_values(df1, df2, keys, engine))
+                finally:
+                    if engine is not None:
+                        engine.close()
 
                 relation_results.append({
                     "table1": table1_name,
                     "table2": table2_name,
                     "relation_type": relation_type,
                     "join_keys": keys,
+                    "key_discovery": sanitize_for_json(key_pair),
                     "anomalies": anomalies,
                     "self_relationship": False
                 })
 
         total_anomalies = sum(len(r.get("anomalies", [])) for r in relation_results)
-        return JSONResponse(sanitize_for_json({
+        return StreamingJSONResponse({
             "relationships": new_relationships,
             "results": relation_results,
             "total_anomalies": total_anomalies
-        }))
+        })
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/analyze/{table_name}")
-def analyze_table(
-    table_name: str,
-    analysis_type: str = Query("sql", enum=["sql", "ml"])
-):
-    """Analyze a specific table that was previously uploaded"""
-    random.seed(42)
-    np.random.seed(42)
-
-    df = in_memory_tables.get(table_name)
-    if df is None:
-        return JSONResponse(
-            status_code=404, 
-            content={"detail": f"Table '{table_name}' not found in memory. Please upload it first."}
-        )
-
-    df = sanitize_columns(df)
-
-    def null_to_nan(val):
-        if isinstance(val, str) and re.fullmatch(r'null', val, re.IGNORECASE):
-            return np.nan
-        return val
+def _analyze_stored_table(table_name: str, df: pd.DataFrame, analysis_type: str, quality_score_mode: str,
+                          routing: dict = None, column_profile: pd.DataFrame = None,
+                          max_examples: int = DEFAULT_MAX_EXAMPLES, sql_engine: str = "auto",
+                          complex_detector: str = "hbos", rules: dict = None):
+    profiler = StageProfiler()
+    content_hash = table_content_hashes.get(table_name)
+    cache_key = None
+    _sync_near_duplicate_index()
+    if content_hash is not None:
+        cache_key = make_cache_key(content_hash, "analyze", {
+            "table_name": table_name,
+            "analysis_type": analysis_type,
+            "quality_score_mode": quality_score_mode,
+            "routing": routing,
+            "max_examples": max_examples,
+            "sql_engine": sql_engine,
+            "complex_detector": complex_detector,
+            "rules": rules,
+            "other_tables": sorted(t for t in near_duplicate_index.tables if t != table_name)
+        })
+        with profiler.stage('cache_lookup'):
+            cached = result_cache.get(cache_key)
+        if cached is not None:
+            return _cached_response(cached, profiler)
+    with profiler.stage('sanitize', len(df)):
+        df = sanitize_columns(df)
 
-    df = df.applymap(null_to_nan)
+    with profiler.stage('null_normalization', len(df)):
+        df = normalize_null_tokens(df)
+    fingerprints = table_fingerprints.get(table_name)
+    if fingerprints is None or len(fingerprints) != len(df):
+        with profiler.stage('fingerprint', len(df)):
+            fingerprints = compute_row_fingerprints(df)
+        table_fingerprints[table_name] = fingerprints
     schema = df.dtypes.apply(lambda x: str(x)).to_dict()
     sample = df.head(10).where(pd.notnull(df.head(10)), None).to_dict(orient="records")
-    results = run_comprehensive_anomaly_detection(df, mode=analysis_type)
+    with profiler.stage('cross_file_duplicate', len(df)):
+        if table_name not in near_duplicate_index.tables:
+            near_duplicate_index.add_table(table_name, df)
+            indexed_tables[table_name] = True
+        cross_file_matches = near_duplicate_index.query_table(table_name)
+    results = run_comprehensive_anomaly_detection(
+        df, mode=analysis_type, fingerprints=fingerprints,
+        extra_results={'cross_file_duplicate': cross_file_matches} if len(cross_file_matches) else None,
+        quality_score_mode=quality_score_mode, profiler=profiler, normalize_nulls=False, routing=routing,
+        column_profile=column_profile, max_examples=max_examples, sql_engine=sql_engine,
+        complex_detector=complex_detector, rules=rules
+    )
     report = results['report']
     recommendations = results['recommendations']
     log_output = results.get('log', '')
@@ -562,8 +980,14 @@ def analyze_table(
         f"RECOMMENDATIONS:\n  " + "\n  ".join(recommendations)
     )
 
-    return JSONResponse(sanitize_for_json({
+    with profiler.stage('store_results', len(results['anomaly_results'])):
+        analysis_id = uuid.uuid4().hex
+        anomaly_store.put(analysis_id, results['anomaly_results'], {"table_name": table_name, "mode": analysis_type})
+
+    result = {
         "table_name": table_name,
+        "analysis_id": analysis_id,
+        "anomaly_event_count": report.get('anomaly_event_count', 0),
         "schema": schema,
         "sample": sample,
         "row_count": len(df),
@@ -571,32 +995,100 @@ def analyze_table(
         "quality_metrics": report.get('quality_metrics', {}),
         "top_anomalies": report.get('top_anomalies', []),
         "feature_importance": report.get('feature_importance', []),
+        "column_routing": results['column_routing'],
         "recommendations": recommendations,
         "log": log_output,
         "formatted_output": formatted_output,
-        "mode_used": analysis_type
-    }))
+        "mode_used": analysis_type,
+        "timings": profiler.to_list(),
+        "total_seconds": profiler.total_wall_seconds(),
+        "cache_hit": False
+    }
+    if cache_key is not None:
+        result_cache.put(cache_key, {"result": dict(result), "anomaly_results": results['anomaly_results']})
+    return result
+
+@router.api_route("/analyze/{table_name}", methods=["GET", "POST"])
+def analyze_table(
+    table_name: str,
+    analysis_type: str = Query("sql", enum=["sql", "ml"]),
+    quality_score_mode: str = Query("events", enum=["events", "rows"]),
+    profile: str | None = Query(None, enum=["cprofile", "pyinstrument"]),
+    routing: str | None = Query(None, description=ROUTING_DESCRIPTION),
+    preview: bool = Query(False, description="Analyze a sample and extrapolate the quality metrics"),
+    sample_size: int = Query(10000, ge=100),
+    preview_id: str | None = Query(None, description="Upgrade this preview to a full run, reusing its column profile"),
+    max_examples: int = Query(DEFAULT_MAX_EXAMPLES, ge=1, description=MAX_EXAMPLES_DESCRIPTION),
+    sql_engine: str = Query("auto", enum=SQL_ENGINES, description=SQL_ENGINE_DESCRIPTION),
+    complex_detector: str = Query("hbos", enum=COMPLEX_DETECTORS, description=COMPLEX_DETECTOR_DESCRIPTION),
+    rules: str | None = Form(None, description=RULES_DESCRIPTION)
+):
+    """Analyze a specific table that was previously uploaded"""
+    random.seed(42)
+    np.random.seed(42)
+
+    df = in_memory_tables.get(table_name)
+    if df is None:
+        return JSONResponse(
+            status_code=404, 
+            content={"detail": f"Table '{table_name}' not found in memory. Please upload it first."}
+        )
+
+    column_profile = None
+    if preview_id is not None:
+        session = preview_sessions.get(preview_id)
+        if session is None or session["table_name"] != table_name:
+            raise HTTPException(status_code=404, detail=f"Preview '{preview_id}' not found for table '{table_name}'")
+        column_profile = session["column_profile"]
+        routing = routing or (json.dumps(session["routing"]) if session["routing"] else None)
+        rules = rules or (json.dumps(session["rules"]) if session.get("rules") else None)
+
+    try:
+        routing_overrides = _parse_json_param(routing, "routing")
+        rule_spec = _parse_rules_param(rules)
+        if preview:
+            run, args = _run_preview, (table_name, df, analysis_type, quality_score_mode, sample_size,
+                                       routing_overrides, StageProfiler(), max_examples, sql_engine,
+                                       complex_detector, rule_spec)
+        else:
+            run, args = _analyze_stored_table, (table_name, df, analysis_type, quality_score_mode,
+                                                routing_overrides, column_profile, max_examples, sql_engine,
+                                                complex_detector, rule_spec)
+        if profile:
+            result, profile_report = profile_call(profile, run, *args)
+            result["profile"] = profile_report
+        else:
+            result = run(*args)
+        if preview_id is not None:
+            result["upgraded_from_preview"] = preview_id
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(result)
 
 @router.get("/tables")
 def list_tables():
     tables_info = []
-    for table_name, df in in_memory_tables.items():
-        tables_info.append({
-            "table_name": table_name,
-            "row_count": len(df),
-            "column_count": len(df.columns),
-            "columns": list(df.columns)
-        })
+    for table_name in list(in_memory_tables):
+        try:
+            tables_info.append({"table_name": table_name, **in_memory_tables.summary(table_name)})
+        except KeyError:
+            continue
     
-    return JSONResponse(sanitize_for_json({
+    return FastJSONResponse({
         "total_tables": len(tables_info),
         "tables": tables_info
-    }))
+    })
 
 @router.delete("/tables/{table_name}")
 def delete_table(table_name: str):
     if table_name in in_memory_tables:
         del in_memory_tables[table_name]
+        table_fingerprints.pop(table_name, None)
+        near_duplicate_index.remove_table(table_name)
+        key_sketch_index.remove_table(table_name)
+        indexed_tables.pop(table_name, None)
+        anomaly_store.discard_table(table_name)
+        table_content_hashes.pop(table_name, None)
         return JSONResponse({"message": f"Table '{table_name}' deleted successfully"})
     else:
         raise HTTPException(status_code=404, detail=f"Table '{table_name}' not found")
@@ -605,4 +1097,10 @@ def delete_table(table_name: str):
 def clear_all_tables():
     cleared_count = len(in_memory_tables)
     in_memory_tables.clear()
+    table_fingerprints.clear()
+    near_duplicate_index.clear()
+    key_sketch_index.clear()
+    indexed_tables.clear()
+    anomaly_store.clear()
+    table_content_hashes.clear()
     return JSONResponse({"message": f"Cleared {cleared_count} tables from memory"})
\ No newline at end of file
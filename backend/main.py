@@ -1,11 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.upload import router as upload_router
+from api.anomalies import router as anomalies_router
+from api.metrics import router as metrics_router
+from api.scoring import router as scoring_router
 import random
 import numpy as np
 import os
+import time
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Optional warm-up so the first request does not pay for loading LightGBM, scikit-learn and SciPy
+    if os.environ.get("DQC_WARMUP", "").lower() in ("1", "true", "yes"):
+        from ml.anomaly_checker import warm_up
+        start = time.perf_counter()
+        warm_up()
+        print(f"🔥 Warm-up finished in {time.perf_counter() - start:.2f}s")
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow React frontend (adjust port if needed)
 app.add_middleware(
@@ -21,4 +36,7 @@ random.seed(42)
 np.random.seed(42)
 os.environ['PYTHONHASHSEED'] = '42'
 
-app.include_router(upload_router) 
+app.include_router(upload_router)
+app.include_router(anomalies_router)
+app.include_router(scoring_router)
+app.include_router(metrics_router) 
@@ -0,0 +1,444 @@
+"""End-to-end benchmarks for the anomaly detectors and API endpoints.
+
+Usage:
+    python benchmarks/run_benchmarks.py --rows 10000,100000 --output bench.json
+    python benchmarks/run_benchmarks.py --rows 10000 --compare bench.json
+"""
+import argparse
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import warnings
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import generate_synthetic_table, generate_parent_table, generate_typo_column
+from ml.numeric_anomaly import detect_numeric_anomalies
+from ml.categorical_anomaly import detect_categorical_anomalies
+from ml.lightgbm_anomaly import train_lightgbm_anomaly_detector, detect_lightgbm_anomalies
+from ml.hbos_anomaly import fit_hbos, detect_hbos_anomalies
+from ml.column_routing import profile_columns, route_columns
+from ml.insertion_anomaly import detect_duplicate_records, detect_missing_required_fields, detect_invalid_foreign_keys
+from ml.deletion_anomaly import detect_orphaned_records, detect_referential_integrity_violations, detect_accidental_deletions
+from ml.update_anomaly import detect_inconsistent_updates, detect_partial_updates, detect_data_type_violations
+from ml.near_duplicate import NearDuplicateIndex
+from ml.key_discovery import KeySketchIndex
+from ml.typo_resolver import TypoIndex, edit_distances, _codepoints, _max_distance
+from ml.anomaly_ensemble import run_all_anomaly_detectors, combine_anomaly_results
+
+warnings.filterwarnings('ignore')
+
+def _lightgbm(df):
+    model, label_encoders = train_lightgbm_anomaly_detector(df, 0.05)
+    return detect_lightgbm_anomalies(df, model, label_encoders)[0]
+
+def _hbos(df):
+    model = fit_hbos(df, 0.05)
+    return detect_hbos_anomalies(df, model)[0]
+
+def _cross_file(df):
+    index = NearDuplicateIndex()
+    index.add_table('reference', df.iloc[: len(df) // 2])
+    index.add_table('upload', df.iloc[len(df) // 4:])
+    return index.query_table('upload')
+
+def _key_discovery(df):
+    # The parent key is renamed so only the values can link it to the child's column
+    index = KeySketchIndex()
+    index.add_table('child', df)
+    index.add_table('parent', generate_parent_table(df).rename(columns={'ref0_id': 'parent_no'}))
+    return index.candidates()
+
+def _scoring(df):
+    stdout, sys.stdout = sys.stdout, io.StringIO()
+    try:
+        all_results = run_all_anomaly_detectors(df, 0.05, 'sql')
+    finally:
+        sys.stdout = stdout
+    start = time.perf_counter()
+    combined = combine_anomaly_results(all_results)
+    return combined, time.perf_counter() - start
+
+DETECTORS = {
+    'numeric': detect_numeric_anomalies,
+    'categorical': detect_categorical_anomalies,
+    'lightgbm': _lightgbm,
+    'hbos': _hbos,
+    'insertion.duplicate_records': detect_duplicate_records,
+    'insertion.missing_required_fields': detect_missing_required_fields,
+    'insertion.invalid_foreign_keys': detect_invalid_foreign_keys,
+    'deletion.orphaned_records': detect_orphaned_records,
+    'deletion.referential_integrity': detect_referential_integrity_violations,
+    'deletion.accidental_deletions': detect_accidental_deletions,
+    'update.inconsistent_updates': detect_inconsistent_updates,
+    'update.partial_updates': detect_partial_updates,
+    'update.data_type_violations': detect_data_type_violations,
+    'cross_file_duplicate': _cross_file,
+    'key_discovery': _key_discovery,
+    'scoring': _scoring,
+}
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is reported in KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+def _run_detector(name, df, conn):
+    stdout, sys.stdout = sys.stdout, io.StringIO()
+    try:
+        baseline = _max_rss_mb()
+        start = time.perf_counter()
+        output = DETECTORS[name](df)
+        seconds = time.perf_counter() - start
+        if isinstance(output, tuple):
+            output, seconds = output
+        conn.send({'seconds': seconds, 'events': int(len(output)), 'peak_rss_mb': _max_rss_mb(),
+                   'baseline_rss_mb': baseline})
+    except Exception as e:
+        conn.send({'error': f'{type(e).__name__}: {e}'})
+    finally:
+        sys.stdout = stdout
+        conn.close()
+
+# Imported lazily by the detectors; loading them before forking keeps import time out of every child's timing
+PRELOADED_MODULES = ['scipy.stats', 'sklearn.preprocessing', 'sklearn.model_selection', 'lightgbm', 'duckdb']
+
+def _preload():
+    for module in PRELOADED_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+def _isolated(name, df):
+    # Each detector runs in a forked child so its peak RSS is not masked by earlier runs
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        parent, child = multiprocessing.Pipe()
+        _run_detector(name, df, child)
+        return parent.recv()
+    ctx = multiprocessing.get_context('fork')
+    parent, child = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_run_detector, args=(name, df, child))
+    process.start()
+    child.close()
+    result = parent.recv()
+    process.join()
+    return result
+
+def benchmark_detectors(df, repeat, selected=None):
+    _preload()
+    results = []
+    for name in DETECTORS:
+        if selected and name not in selected:
+            continue
+        runs = [_isolated(name, df) for _ in range(repeat)]
+        errors = [r['error'] for r in runs if 'error' in r]
+        if errors:
+            results.append({'kind': 'detector', 'name': name, 'rows': len(df), 'error': errors[0]})
+            continue
+        best = min(runs, key=lambda r: r['seconds'])
+        results.append(_record('detector', name, len(df), best['seconds'], best['events'],
+                               peak_rss_mb=max(r['peak_rss_mb'] for r in runs),
+                               baseline_rss_mb=best['baseline_rss_mb']))
+    return results
+
+def _record(kind, name, rows, seconds, events, **extra):
+    record = {
+        'kind': kind,
+        'name': name,
+        'rows': rows,
+        'seconds': round(seconds, 6),
+        'events': events,
+        'events_per_sec': round(events / seconds, 2) if seconds > 0 else None,
+        'rows_per_sec': round(rows / seconds, 2) if seconds > 0 else None,
+    }
+    record.update({k: round(v, 2) if isinstance(v, float) else v for k, v in extra.items()})
+    return record
+
+def benchmark_endpoints(df, parent, repeat):
+    from fastapi.testclient import TestClient
+    from main import app
+    import api.upload
+    from api.result_cache import ResultCache
+    client = TestClient(app)
+    # Memory-only cache, emptied before every timed call, so repeats measure analysis rather than cache hits
+    cache = api.upload.result_cache = ResultCache(cache_dir=None)
+    child_csv = df.to_csv(index=False).encode()
+    parent_csv = parent.to_csv(index=False).encode()
+
+    def timed(call):
+        best, response = None, None
+        for _ in range(repeat):
+            cache.clear()
+            start = time.perf_counter()
+            response = call()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{response.status_code}: {response.text[:200]}')
+        return best, response
+
+    def events(payload):
+        return int(payload.get('anomaly_event_count', 0) or 0)
+
+    results = []
+    cases = []
+    for mode in ('sql', 'ml'):
+        cases.append((f'POST /upload?analysis_type={mode}', lambda mode=mode: client.post(
+            '/upload', params={'analysis_type': mode}, files={'file': ('bench_child.csv', child_csv, 'text/csv')}),
+            lambda r: events(r.json())))
+    cases.append(('POST /upload-multiple', lambda: client.post('/upload-multiple', files=[
+        ('files', ('bench_child.csv', child_csv, 'text/csv')),
+        ('files', ('bench_parent.csv', parent_csv, 'text/csv'))]),
+        lambda r: sum(events(x) for x in r.json()['results'])))
+    for name, call, count in cases:
+        try:
+            seconds, response = timed(call)
+            results.append(_record('endpoint', name, len(df), seconds, count(response), peak_rss_mb=_max_rss_mb()))
+        except Exception as e:
+            results.append({'kind': 'endpoint', 'name': name, 'rows': len(df), 'error': str(e)})
+    try:
+        # The same content once more with the cache warm, for comparison with the cold runs above
+        name, call, count = cases[0]
+        call()
+        start = time.perf_counter()
+        response = call()
+        results.append(_record('endpoint', 'POST /upload (cache hit)', len(df), time.perf_counter() - start,
+                               count(response), peak_rss_mb=_max_rss_mb()))
+    except Exception as e:
+        results.append({'kind': 'endpoint', 'name': 'POST /upload (cache hit)', 'rows': len(df), 'error': str(e)})
+
+    upload = client.post('/upload', files={'file': ('bench_child.csv', child_csv, 'text/csv')}).json()
+    later = [
+        ('GET /analyze/{table_name}', lambda: client.get(f'/analyze/{upload["table_name"]}'),
+         lambda r: events(r.json())),
+        ('GET /anomalies/{analysis_id}', lambda: client.get(f'/anomalies/{upload["analysis_id"]}', params={'limit': 1000}),
+         lambda r: len(r.json()['items'])),
+        ('POST /analyze-relationships', lambda: client.post('/analyze-relationships', json={'relationships': {
+            'relationships': [{'table1': 'bench_child.csv', 'table2': 'bench_parent.csv', 'relationType': 'M:1'}]}}),
+         lambda r: r.json()['total_anomalies']),
+        ('GET /tables', lambda: client.get('/tables'), lambda r: r.json()['total_tables']),
+    ]
+    for name, call, count in later:
+        try:
+            seconds, response = timed(call)
+            results.append(_record('endpoint', name, len(df), seconds, count(response), peak_rss_mb=_max_rss_mb()))
+        except Exception as e:
+            results.append({'kind': 'endpoint', 'name': name, 'rows': len(df), 'error': str(e)})
+    results.extend(benchmark_scoring(client, upload['table_name'], df))
+    client.delete('/tables')
+    return results
+
+def benchmark_scoring(client, table_name, df, calls=200):
+    """Latency percentiles of online scoring against the uploaded table, one record and small batches."""
+    records = json.loads(df.head(100).to_json(orient='records'))
+    results = []
+    for size in (1, 10, 100):
+        name = f'POST /score/{{table_name}} ({size} records)'
+        try:
+            # The first call fits the reference profile; it is reported separately from the steady state
+            start = time.perf_counter()
+            response = client.post(f'/score/{table_name}', json=records[:size])
+            first = time.perf_counter() - start
+            if response.status_code >= 400:
+                raise RuntimeError(f'{response.status_code}: {response.text[:200]}')
+            latencies = []
+            for _ in range(calls):
+                start = time.perf_counter()
+                response = client.post(f'/score/{table_name}', json=records[:size])
+                latencies.append(time.perf_counter() - start)
+            server = response.json()['latency_ms']
+            results.append(_record('endpoint', name, size, float(np.median(latencies)), response.json()['anomalous'],
+                                   first_call_ms=first * 1000,
+                                   p50_ms=float(np.percentile(latencies, 50)) * 1000,
+                                   p99_ms=float(np.percentile(latencies, 99)) * 1000,
+                                   server_latency_ms=server))
+        except Exception as e:
+            results.append({'kind': 'endpoint', 'name': name, 'rows': size, 'error': str(e)})
+    return results
+
+def _legacy_parse(data):
+    df = pd.read_csv(io.BytesIO(data))
+    return df.applymap(lambda v: np.nan if isinstance(v, str) and v.lower() == 'null' else v)
+
+def benchmark_parsing(df, repeat):
+    from api.parsing import read_csv_upload, pa_csv
+    data = df.to_csv(index=False).encode()
+    cases = {'legacy (read_csv + applymap)': _legacy_parse,
+             'c': lambda d: read_csv_upload(io.BytesIO(d), 'c')}
+    if pa_csv is not None:
+        cases['pyarrow'] = lambda d: read_csv_upload(io.BytesIO(d), 'pyarrow')
+    results = []
+    for name, parse in cases.items():
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parsed = parse(data)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results.append(_record('parse', name, len(parsed), best, 0, megabytes=len(data) / (1024 * 1024)))
+    return results
+
+def _roc_auc(labels, scores):
+    ranks = pd.Series(scores).rank().to_numpy()
+    positives = labels.sum()
+    negatives = len(labels) - positives
+    if positives == 0 or negatives == 0:
+        return float('nan')
+    return (ranks[labels == 1].sum() - positives * (positives + 1) / 2) / (positives * negatives)
+
+def benchmark_complex_detectors(df, truth, contamination=0.05):
+    """Compare the complex-pattern detectors on the injected numeric, categorical and key anomalies."""
+    # Appended duplicate rows are copies, so only the original rows are scored
+    original = len(df) - len(truth.get('duplicate_record', [])) // 2
+    labels = np.zeros(original, dtype=int)
+    for kind in ('numeric_outlier', 'rare_category', 'invalid_foreign_key'):
+        labels[truth.get(kind, [])] = 1
+    features = df[route_columns(profile_columns(df))['lightgbm']].iloc[:original]
+
+    def lightgbm(frame):
+        model, label_encoders = train_lightgbm_anomaly_detector(frame, contamination)
+        return detect_lightgbm_anomalies(frame, model, label_encoders)
+
+    def hbos(frame):
+        results, predictions, _ = detect_hbos_anomalies(frame, fit_hbos(frame, contamination))
+        return results, predictions
+
+    results = []
+    for name, run in (('lightgbm', lightgbm), ('hbos', hbos)):
+        start = time.perf_counter()
+        flagged, predictions = run(features)
+        seconds = time.perf_counter() - start
+        hits = labels[flagged['row_index'].to_numpy(dtype=int)] if len(flagged) else np.array([])
+        results.append(_record('quality', name, len(features), seconds, int(len(flagged)),
+                               roc_auc=round(float(_roc_auc(labels, predictions)), 4),
+                               precision=round(float(hits.mean()), 4) if len(hits) else 0.0,
+                               recall=round(float(hits.sum() / labels.sum()), 4) if labels.sum() else None))
+    return results
+
+def benchmark_typo_resolution(distinct=100000, sample=200):
+    """Rare-category misspelling suggestions on a high-cardinality column, against a full pairwise scan."""
+    column, truth = generate_typo_column(distinct)
+    start = time.perf_counter()
+    events = detect_categorical_anomalies(column.to_frame(), min_frq=3 / len(column))
+    seconds = time.perf_counter() - start
+    suggested = events.drop_duplicates('value').dropna(subset=['suggested_value'])
+    suggested = dict(zip(suggested['value'], suggested['suggested_value']))
+    hits = sum(suggested.get(typo) == word for typo, word in truth.items())
+
+    # The naive resolver compares each rare value with every common one; time a sample and extrapolate
+    index = TypoIndex(column.value_counts())
+    rare = events['value'].drop_duplicates()
+    probes = rare.sample(min(sample, len(rare)), random_state=0).astype(str).str.casefold()
+    width = max(index.width, int(probes.str.len().max()))
+    common = np.zeros((len(index), width), dtype=np.int64)
+    common[:, :index.width] = index.codes
+    scan_start = time.perf_counter()
+    for probe in probes:
+        distances = edit_distances(_codepoints(pd.Series([probe] * len(index)), width),
+                                   np.full(len(index), len(probe)), common, index.lengths)
+        (distances <= _max_distance(np.array([len(probe)]))[0]).any()
+    naive = (time.perf_counter() - scan_start) / max(len(probes), 1) * len(rare)
+    return [_record('quality', 'typo_resolution', len(column), seconds, int(len(events)),
+                    distinct=int(column.nunique()), rare_values=int(len(rare)), suggestions=len(suggested),
+                    precision=round(hits / len(suggested), 4) if suggested else 0.0,
+                    recall=round(hits / len(truth), 4) if truth else None,
+                    naive_seconds_estimate=round(naive, 1))]
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    before = {(r['kind'], r['name'], r['rows']): r for r in previous['results'] if 'seconds' in r}
+    print(f"\n{'benchmark':<50} {'rows':>8} {'before':>10} {'after':>10} {'ratio':>7}")
+    for record in current['results']:
+        key = (record['kind'], record['name'], record['rows'])
+        if key in before and 'seconds' in record:
+            old, new = before[key]['seconds'], record['seconds']
+            ratio = new / old if old else float('nan')
+            print(f"{record['kind'] + ' ' + record['name']:<50} {record['rows']:>8} {old:>10.4f} {new:>10.4f} {ratio:>6.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='10000', help='Comma-separated row counts')
+    parser.add_argument('--numeric-columns', type=int, default=4)
+    parser.add_argument('--categorical-columns', type=int, default=3)
+    parser.add_argument('--text-columns', type=int, default=1)
+    parser.add_argument('--id-columns', type=int, default=2)
+    parser.add_argument('--cardinality', type=int, default=20)
+    parser.add_argument('--null-rate', type=float, default=0.02)
+    parser.add_argument('--duplicate-rate', type=float, default=0.01)
+    parser.add_argument('--anomaly-rate', type=float, default=0.01)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--detectors', default=None, help='Comma-separated subset of detectors to run')
+    parser.add_argument('--n-jobs', type=int, default=None, help='Column-parallel threads (sets DQC_N_JOBS)')
+    parser.add_argument('--skip-detectors', action='store_true')
+    parser.add_argument('--skip-endpoints', action='store_true')
+    parser.add_argument('--skip-parsing', action='store_true')
+    parser.add_argument('--skip-quality', action='store_true', help='Skip the complex-detector quality comparison')
+    parser.add_argument('--typo-distinct', type=int, default=100000,
+                        help='Distinct values of the column used for the misspelling benchmark')
+    parser.add_argument('--skip-typos', action='store_true', help='Skip the rare-category misspelling benchmark')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', default=None, help='Previous results file to compare against')
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'cpu_count': os.cpu_count(),
+            'parameters': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        },
+        'results': [],
+    }
+    if args.n_jobs:
+        os.environ['DQC_N_JOBS'] = str(args.n_jobs)
+    selected = set(args.detectors.split(',')) if args.detectors else None
+    for rows in [int(r) for r in args.rows.split(',')]:
+        df, truth = generate_synthetic_table(
+            rows, args.numeric_columns, args.categorical_columns, args.text_columns, args.id_columns,
+            args.cardinality, args.null_rate, args.duplicate_rate, args.anomaly_rate)
+        print(f"📊 {len(df)} rows x {len(df.columns)} columns, injected: "
+              f"{ {k: len(v) for k, v in truth.items()} }")
+        if not args.skip_parsing:
+            report['results'].extend(benchmark_parsing(df, args.repeat))
+        if not args.skip_detectors:
+            report['results'].extend(benchmark_detectors(df, args.repeat, selected))
+        if not args.skip_quality:
+            report['results'].extend(benchmark_complex_detectors(df, truth))
+        if not args.skip_endpoints:
+            report['results'].extend(benchmark_endpoints(df, generate_parent_table(df), args.repeat))
+    if not args.skip_typos:
+        report['results'].extend(benchmark_typo_resolution(args.typo_distinct))
+
+    for record in report['results']:
+        if 'error' in record:
+            print(f"✗ {record['kind']:<9} {record['name']:<40} {record['error']}")
+        else:
+            quality = "".join(f" {label}={record[key]}" for key, label in
+                              (('roc_auc', 'auc'), ('precision', 'precision'), ('recall', 'recall')) if key in record)
+            print(f"✓ {record['kind']:<9} {record['name']:<40} {record['rows']:>8} rows "
+                  f"{record['seconds']:>9.4f}s {record['events']:>8} events{quality}")
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == '__main__':
+    main()
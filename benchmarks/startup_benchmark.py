@@ -0,0 +1,71 @@
+"""Cold-start benchmark: import time of the API and latency of the first requests.
+
+Every configuration runs in a fresh interpreter so nothing is cached between runs.
+
+Usage:
+    python benchmarks/startup_benchmark.py --repeat 3 --output startup_results.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PROBE = r'''
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+sys.path.insert(0, os.path.join({root!r}, 'backend'))
+import main
+imported = time.perf_counter()
+heavy = sorted(m for m in ('lightgbm', 'sklearn', 'scipy', 'duckdb') if m in sys.modules)
+from fastapi.testclient import TestClient
+import numpy as np
+import pandas as pd
+rng = np.random.default_rng(0)
+csv = pd.DataFrame({{'id': np.arange(500), 'customer_id': rng.integers(1, 50, 500),
+                     'amount': rng.normal(100, 10, 500), 'state': rng.choice(['CA', 'NY'], 500)}}).to_csv(index=False)
+with TestClient(main.app) as client:
+    started = time.perf_counter()
+    latencies = []
+    for i in range(2):
+        t = time.perf_counter()
+        response = client.post('/upload', files={{'file': (f'probe_{{i}}.csv', csv.replace('CA', f'C{{i}}').encode())}})
+        latencies.append(time.perf_counter() - t)
+        assert response.status_code == 200, response.text
+print(json.dumps({{'import_seconds': imported - start, 'startup_seconds': started - imported,
+                  'first_request_seconds': latencies[0], 'second_request_seconds': latencies[1],
+                  'heavy_modules_after_import': heavy}}))
+'''
+
+def run_probe(warmup: bool) -> dict:
+    env = dict(os.environ, DQC_WARMUP='1' if warmup else '0')
+    output = subprocess.run([sys.executable, '-c', PROBE.format(root=ROOT)], env=env, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='startup_results.json')
+    args = parser.parse_args()
+
+    results = []
+    for warmup in (False, True):
+        runs = [run_probe(warmup) for _ in range(args.repeat)]
+        summary = {'warmup': warmup, 'runs': runs}
+        for key in ('import_seconds', 'startup_seconds', 'first_request_seconds', 'second_request_seconds'):
+            summary[key] = round(min(r[key] for r in runs), 4)
+        results.append(summary)
+        print(f"{'warm-up' if warmup else 'cold':<8} import {summary['import_seconds']:.3f}s  "
+              f"startup {summary['startup_seconds']:.3f}s  first request {summary['first_request_seconds']:.3f}s  "
+              f"second request {summary['second_request_seconds']:.3f}s  "
+              f"heavy modules after import: {runs[0]['heavy_modules_after_import'] or 'none'}")
+    with open(args.output, 'w') as f:
+        json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+if __name__ == '__main__':
+    main()
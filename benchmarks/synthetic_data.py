@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+
+def generate_synthetic_table(rows: int = 10000, numeric_columns: int = 4, categorical_columns: int = 3,
+                             text_columns: int = 1, id_columns: int = 2, cardinality: int = 20,
+                             null_rate: float = 0.02, duplicate_rate: float = 0.01, anomaly_rate: float = 0.01,
+                             seed: int = 42) -> Tuple[pd.DataFrame, Dict[str, np.ndarray]]:
+    """Build a table with controllable shape plus the row positions of every injected anomaly."""
+    rng = np.random.default_rng(seed)
+    data = {'id': np.arange(1, rows + 1)}
+
+    for i in range(id_columns):
+        # *_id key columns reference a parent table roughly a tenth the size of this one
+        data[f'ref{i}_id'] = rng.integers(1, max(2, rows // 10), rows)
+    for i in range(numeric_columns):
+        data[f'metric{i}'] = rng.normal(100 * (i + 1), 10 * (i + 1), rows).round(3)
+    categories = [f'cat_{c}' for c in range(cardinality)]
+    weights = rng.dirichlet(np.ones(cardinality) * 5)
+    for i in range(categorical_columns):
+        data[f'category{i}'] = rng.choice(categories, rows, p=weights)
+    words = np.array(['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta'])
+    for i in range(text_columns):
+        data[f'note{i}'] = [' '.join(rng.choice(words, 5)) + f' #{n}' for n in range(rows)]
+    df = pd.DataFrame(data)
+
+    truth = {}
+    n_anomalies = int(rows * anomaly_rate)
+    if numeric_columns and n_anomalies:
+        positions = rng.choice(rows, n_anomalies, replace=False)
+        df.loc[positions, 'metric0'] = df['metric0'].mean() + 50 * df['metric0'].std()
+        truth['numeric_outlier'] = np.sort(positions)
+    if categorical_columns and n_anomalies:
+        positions = rng.choice(rows, max(1, n_anomalies // 5), replace=False)
+        df.loc[positions, 'category0'] = [f'rare_{p}' for p in positions]
+        truth['rare_category'] = np.sort(positions)
+    if id_columns and n_anomalies:
+        positions = rng.choice(rows, max(1, n_anomalies // 5), replace=False)
+        df.loc[positions, 'ref0_id'] = -1
+        truth['invalid_foreign_key'] = np.sort(positions)
+
+    if null_rate:
+        for col in [c for c in df.columns if c != 'id']:
+            mask = rng.random(rows) < null_rate
+            df.loc[mask, col] = np.nan
+
+    n_duplicates = int(rows * duplicate_rate)
+    if n_duplicates:
+        sources = rng.choice(rows, n_duplicates, replace=False)
+        duplicates = df.iloc[sources]
+        df = pd.concat([df, duplicates], ignore_index=True)
+        truth['duplicate_record'] = np.concatenate([np.sort(sources), np.arange(rows, rows + n_duplicates)])
+
+    return df, truth
+
+def generate_parent_table(child: pd.DataFrame, key: str = 'ref0_id', coverage: float = 0.9, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    keys = pd.Series(child[key].dropna().unique())
+    keys = keys[keys > 0].sample(frac=coverage, random_state=seed).sort_values().to_numpy()
+    return pd.DataFrame({key: keys, 'name': [f'parent_{k}' for k in keys], 'score': rng.random(len(keys))})
+
+def _misspell(word: str, rng) -> str:
+    position = int(rng.integers(0, len(word) - 1))
+    edit = rng.integers(0, 4)
+    if edit == 0:
+        return word[:position] + word[position + 1:]
+    if edit == 1:
+        return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    letter = chr(int(rng.integers(97, 123)))
+    if edit == 2:
+        return word[:position] + letter + word[position + 1:]
+    return word[:position] + letter + word[position:]
+
+def generate_typo_column(distinct: int = 100000, canonical_share: float = 0.2, typo_share: float = 0.5,
+                         seed: int = 42) -> Tuple[pd.Series, Dict[str, str]]:
+    """A category column with `distinct` values: common names, one-edit misspellings of them seen once,
+    and unrelated one-off values. Returns the column and the misspelling -> common name mapping."""
+    rng = np.random.default_rng(seed)
+    letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+    n_canonical = int(distinct * canonical_share)
+    canonical = list(dict.fromkeys(''.join(rng.choice(letters, int(rng.integers(6, 15)))) for _ in range(n_canonical)))
+    truth = {}
+    for word in rng.choice(canonical, int(distinct * typo_share)):
+        typo = _misspell(word, rng)
+        if typo not in truth and typo != word:
+            truth[typo] = word
+    common = set(canonical)
+    truth = {typo: word for typo, word in truth.items() if typo not in common}
+    others = [''.join(rng.choice(letters, int(rng.integers(6, 15)))) for _ in range(distinct - len(canonical) - len(truth))]
+    values = np.concatenate([np.repeat(canonical, rng.integers(10, 30, len(canonical))), list(truth), others])
+    return pd.Series(rng.permutation(values), name='city'), truth
@@ -3,33 +3,69 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pandas as pd
+from ml.profiling import StageProfiler
+from ml.column_routing import profile_columns, route_columns
+from ml.emission import DEFAULT_MAX_EXAMPLES
 from ml.anomaly_ensemble import run_all_anomaly_detectors, combine_anomaly_results, generate_anomaly_report, get_anomaly_recommendations
 import numpy as np
-import re
 
-def run_comprehensive_anomaly_detection(df: pd.DataFrame, contamination: float = 0.1,mode:str="sql"):
+def normalize_null_tokens(df: pd.DataFrame) -> pd.DataFrame:
+    replacements = {}
+    for col in df.columns[(df.dtypes == object).to_numpy()]:
+        try:
+            is_null_token = df[col].str.fullmatch(r'null', case=False, na=False)
+        except AttributeError:
+            continue
+        if is_null_token.any():
+            replacements[col] = df[col].mask(is_null_token.astype(bool), np.nan)
+    if not replacements:
+        return df
+    df = df.copy()
+    for col, values in replacements.items():
+        df[col] = values
+    return df
+
+def run_comprehensive_anomaly_detection(df: pd.DataFrame, contamination: float = 0.1,mode:str="sql",
+                                        fingerprints: pd.Series = None, extra_results: dict = None,
+                                        quality_score_mode: str = "events", profiler: StageProfiler = None,
+                                        normalize_nulls: bool = True, routing: dict = None,
+                                        column_profile: pd.DataFrame = None, max_examples: int = DEFAULT_MAX_EXAMPLES,
+                                        sql_engine: str = "auto", complex_detector: str = "hbos",
+                                        rules: dict = None):
     import io
     import sys
+    if profiler is None:
+        profiler = StageProfiler()
     log_stream = io.StringIO()
     old_stdout = sys.stdout
     sys.stdout = log_stream
     try:
-        def null_to_nan(val):
-            if isinstance(val, str) and re.fullmatch(r'null', val, re.IGNORECASE):
-                return np.nan
-            return val
-        df = df.applymap(null_to_nan)
+        if normalize_nulls:
+            with profiler.stage('detector_input_normalization', len(df)):
+                df = normalize_null_tokens(df)
+        with profiler.stage('column_routing', len(df)):
+            if column_profile is None:
+                column_profile = profile_columns(df)
+            column_routing = route_columns(column_profile, routing)
         print("🔍 Starting comprehensive anomaly detection...")
         print(f"📊 Dataset: {len(df)} rows, {len(df.columns)} columns")
-        all_results = run_all_anomaly_detectors(df, contamination,mode)
-        combined_results = combine_anomaly_results(all_results)
-        report = generate_anomaly_report(df, combined_results, all_results.get('feature_importance'))
-        recommendations = get_anomaly_recommendations(report)
+        print(f"🧭 Column routing: {column_routing}")
+        all_results = run_all_anomaly_detectors(df, contamination,mode, fingerprints=fingerprints,
+                                                extra_results=extra_results, profiler=profiler,
+                                                routing=column_routing, max_examples=max_examples,
+                                                sql_engine=sql_engine, complex_detector=complex_detector,
+                                                rules=rules)
+        combined_results = combine_anomaly_results(all_results, profiler=profiler)
+        with profiler.stage('report', len(df)):
+            report = generate_anomaly_report(df, combined_results, all_results.get('feature_importance'),
+                                             all_results.get('row_anomaly_index'), quality_score_mode)
+            recommendations = get_anomaly_recommendations(report)
         print("\n📋 ANOMALY DETECTION SUMMARY:")
         print(f"Total anomalies found (events): {report['anomaly_event_count']}")
         print(f"Unique rows flagged: {report['unique_rows_flagged']}")
         print(f"Anomaly breakdown by method: {report['method_breakdown']}")
-        print(f"Data quality score: {report['quality_metrics']['quality_score']}%")
+        print(f"Data quality score: {report['quality_metrics']['quality_score']}% ({quality_score_mode} mode)")
+        print(f"Row-based quality score: {report['quality_metrics']['row_quality_score']}%")
         print(f"Methods used: {', '.join(report['anomaly_summary']['methods_used'])}")
         log_output = log_stream.getvalue()
     finally:
@@ -40,8 +76,23 @@ def run_comprehensive_anomaly_detection(df: pd.DataFrame, contamination: float =
         'report': report,
         'recommendations': recommendations,
         'all_results': all_results,
-        'log': log_output
+        'row_anomaly_index': all_results.get('row_anomaly_index'),
+        'column_profile': column_profile,
+        'column_routing': column_routing,
+        'log': log_output,
+        'timings': profiler.to_list()
     }
 
+def warm_up(rows: int = 200):
+    """Load the ML libraries and run a tiny synthetic analysis so the first request does not pay for it."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'id': np.arange(rows),
+        'customer_id': rng.integers(1, 20, rows),
+        'amount': rng.normal(100, 10, rows),
+        'state': rng.choice(['CA', 'NY', 'TX'], rows),
+    })
+    return run_comprehensive_anomaly_detection(df, contamination=0.05, mode="sql")
+
 if __name__ == "__main__":
     print("⚠️ Please call `run_comprehensive_anomaly_detection(df)` with a DataFrame as input.")
@@ -4,17 +4,38 @@ from typing import Dict, List, Tuple
 from ml.numeric_anomaly import detect_numeric_anomalies
 from ml.categorical_anomaly import detect_categorical_anomalies
 from ml.lightgbm_anomaly import train_lightgbm_anomaly_detector, detect_lightgbm_anomalies, get_feature_importance
-from ml.insertion_anomaly import detect_insertion_anomalies
+from ml.hbos_anomaly import fit_hbos, detect_hbos_anomalies, get_hbos_feature_importance
+from ml.insertion_anomaly import detect_insertion_anomalies, detect_duplicate_records
 from ml.deletion_anomaly import detect_deletion_anomalies
 from ml.update_anomaly import detect_update_anomalies
-from ml.anomaly_scorer import calculate_anomaly_scores, filter_high_confidence_anomalies, get_anomaly_summary, rank_anomalies_by_severity
-
-def run_all_anomaly_detectors(df: pd.DataFrame, contamination: float = 0.05, mode: str = "sql") -> Dict:
+from ml.profiling import profile_stage
+from ml.column_routing import profile_columns, route_columns
+from ml.emission import DEFAULT_MAX_EXAMPLES, FLAGGED_ROWS, event_total, cap_events
+from ml.rules import MAX_FOREIGN_KEY, parse_rule_spec, compile_rule_plan, evaluate_rule_plan
+from ml.sql_engine import FRAME_TABLE, open_sql_engine
+from ml.anomaly_scorer import calculate_anomaly_scores, get_anomaly_summary, score_anomaly_severity, top_k_anomalies, build_row_anomaly_index, get_row_quality_metrics
+
+# Detectors that can fill the complex-pattern ('lightgbm') slot of the ensemble
+COMPLEX_DETECTORS = ['hbos', 'lightgbm']
+
+def run_all_anomaly_detectors(df: pd.DataFrame, contamination: float = 0.05, mode: str = "sql",
+                              fingerprints: pd.Series = None, extra_results: Dict[str, pd.DataFrame] = None,
+                              profiler=None, routing: Dict[str, List[str]] = None,
+                              max_examples: int = DEFAULT_MAX_EXAMPLES, sql_engine: str = "auto",
+                              complex_detector: str = "hbos", rules: Dict = None, n_jobs: int = None) -> Dict:
+    if complex_detector not in COMPLEX_DETECTORS:
+        raise ValueError(f"complex_detector must be one of {', '.join(COMPLEX_DETECTORS)}")
+    # Explicit rules replace the heuristics of the relational detectors and their extra table scans
+    rule_plan = compile_rule_plan(parse_rule_spec(rules), df.columns.tolist()) if rules else None
     results = {}
+    if routing is None:
+        routing = route_columns(profile_columns(df))
+    key_columns = routing.get('keys', [])
 
     if mode in ("sql", "ml"):
         try:
-            numeric_results = detect_numeric_anomalies(df)
+            with profile_stage(profiler, 'numeric', len(df)):
+                numeric_results = detect_numeric_anomalies(df[routing['numeric']], n_jobs=n_jobs)
             results['numeric'] = numeric_results
             print(f"✓ Numeric anomalies detected: {len(numeric_results)}")
         except Exception as e:
@@ -22,7 +43,8 @@ def run_all_anomaly_detectors(df: pd.DataFrame, contamination: float = 0.05, mod
             results['numeric'] = pd.DataFrame()
 
         try:
-            categorical_results = detect_categorical_anomalies(df)
+            with profile_stage(profiler, 'categorical', len(df)):
+                categorical_results = detect_categorical_anomalies(df[routing['categorical']], n_jobs=n_jobs)
             results['categorical'] = categorical_results
             print(f"✓ Categorical anomalies detected: {len(categorical_results)}")
         except Exception as e:
@@ -30,69 +52,133 @@ def run_all_anomaly_detectors(df: pd.DataFrame, contamination: float = 0.05, mod
             results['categorical'] = pd.DataFrame()
 
         try:
-            model, label_encoders = train_lightgbm_anomaly_detector(df, contamination)
-            lightgbm_results, predictions = detect_lightgbm_anomalies(df, model, label_encoders)
-            feature_importance = get_feature_importance(model, df)
+            if not routing['lightgbm']:
+                raise ValueError("no columns routed to the complex-pattern detector")
+            lightgbm_df = df[routing['lightgbm']]
+            if complex_detector == 'lightgbm':
+                with profile_stage(profiler, 'lightgbm_train', len(df)):
+                    model, label_encoders = train_lightgbm_anomaly_detector(lightgbm_df, contamination)
+                with profile_stage(profiler, 'lightgbm_predict', len(df)):
+                    lightgbm_results, predictions = detect_lightgbm_anomalies(lightgbm_df, model, label_encoders)
+                with profile_stage(profiler, 'feature_importance', len(df)):
+                    feature_importance = get_feature_importance(model, lightgbm_df)
+            else:
+                with profile_stage(profiler, 'hbos_fit', len(df)):
+                    model = fit_hbos(lightgbm_df, contamination)
+                with profile_stage(profiler, 'hbos_score', len(df)):
+                    lightgbm_results, predictions, contributions = detect_hbos_anomalies(lightgbm_df, model)
+                with profile_stage(profiler, 'feature_importance', len(df)):
+                    feature_importance = get_hbos_feature_importance(contributions, lightgbm_results)
             results['lightgbm'] = lightgbm_results
             results['lightgbm_predictions'] = predictions
             results['feature_importance'] = feature_importance
-            print(f"✓ Complex pattern anomalies detected: {len(lightgbm_results)}")
+            print(f"✓ Complex pattern anomalies detected ({complex_detector}): {len(lightgbm_results)}")
         except Exception as e:
-            print(f"✗ LightGBM anomaly detection failed: {e}")
+            print(f"✗ Complex pattern anomaly detection ({complex_detector}) failed: {e}")
             results['lightgbm'] = pd.DataFrame()
             results['lightgbm_predictions'] = None
             results['feature_importance'] = pd.DataFrame()
 
-    if mode == "sql":
+    if rule_plan is not None:
+        print(f"📐 Rule plan: {rule_plan['check_count']} checks on {len(rule_plan['columns'])} columns")
+        with profile_stage(profiler, 'rules', len(df)):
+            rule_results = evaluate_rule_plan(rule_plan, df, max_examples)
+        if mode == "sql":
+            with profile_stage(profiler, 'insertion', len(df)):
+                duplicate_results = detect_duplicate_records(df, fingerprints=fingerprints)
+            print(f"✓ Duplicate groups detected: {len(duplicate_results)}")
+            insertion = [r for r in (duplicate_results, rule_results['insertion']) if not r.empty]
+            rule_results['insertion'] = cap_events(pd.concat(insertion, ignore_index=True), max_examples) \
+                if insertion else pd.DataFrame()
+        for method, method_results in rule_results.items():
+            results[method] = method_results
+            print(f"✓ {method.capitalize()} rule violations detected: {event_total(method_results)}")
+
+    elif mode == "sql":
+        with profile_stage(profiler, 'sql_engine_register', len(df)):
+            engine = open_sql_engine(sql_engine, {FRAME_TABLE: df})
+        print(f"🗄️ SQL engine: {'duckdb' if engine is not None else 'pandas'}")
 
         try:
-            insertion_results = detect_insertion_anomalies(df)
+            with profile_stage(profiler, 'insertion', len(df)):
+                insertion_results = detect_insertion_anomalies(df, foreign_key_mappings={k: k for k in key_columns},
+                                                               fingerprints=fingerprints, max_examples=max_examples,
+                                                               sql_engine=engine, n_jobs=n_jobs)
             results['insertion'] = insertion_results
-            print(f"✓ Insertion anomalies detected: {len(insertion_results)}")
+            print(f"✓ Insertion anomalies detected: {event_total(insertion_results)}")
         except Exception as e:
             print(f"✗ Insertion anomaly detection failed: {e}")
             results['insertion'] = pd.DataFrame()
 
         try:
-            deletion_results = detect_deletion_anomalies(df)
+            with profile_stage(profiler, 'deletion', len(df)):
+                deletion_results = detect_deletion_anomalies(
+                    df, parent_child_mappings={k: k for k in key_columns},
+                    constraint_mappings={k: {'type': 'foreign_key', 'min_value': 1, 'max_value': MAX_FOREIGN_KEY}
+                                         for k in key_columns},
+                    max_examples=max_examples, sql_engine=engine, n_jobs=n_jobs)
             results['deletion'] = deletion_results
-            print(f"✓ Deletion anomalies detected: {len(deletion_results)}")
+            print(f"✓ Deletion anomalies detected: {event_total(deletion_results)}")
         except Exception as e:
             print(f"✗ Deletion anomaly detection failed: {e}")
             results['deletion'] = pd.DataFrame()
 
         try:
-            update_results = detect_update_anomalies(df)
+            with profile_stage(profiler, 'update', len(df)):
+                update_results = detect_update_anomalies(df, max_examples=max_examples, sql_engine=engine,
+                                                         n_jobs=n_jobs)
             results['update'] = update_results
-            print(f"✓ Update anomalies detected: {len(update_results)}")
+            print(f"✓ Update anomalies detected: {event_total(update_results)}")
         except Exception as e:
             print(f"✗ Update anomaly detection failed: {e}")
             results['update'] = pd.DataFrame()
-    
 
-    return results
+        if engine is not None:
+            engine.close()
 
+    for method, extra in (extra_results or {}).items():
+        results[method] = extra
+        print(f"✓ {method.replace('_', ' ').capitalize()} anomalies detected: {len(extra)}")
 
+    return results
 
-def combine_anomaly_results(all_results: Dict) -> pd.DataFrame:
-    
-    scores_df = calculate_anomaly_scores(
-        all_results, 
-        predictions=all_results.get('lightgbm_predictions')
-    )
 
-    filtered_scores = filter_high_confidence_anomalies(scores_df, min_confidence=0.3)
-    ranked_scores = rank_anomalies_by_severity(filtered_scores)
-    return ranked_scores
 
-def generate_anomaly_report(df: pd.DataFrame, anomaly_results: pd.DataFrame, feature_importance: pd.DataFrame = None) -> Dict:
+def combine_anomaly_results(all_results: Dict, profiler=None, min_confidence: float = 0.3) -> pd.DataFrame:
+    
+    with profile_stage(profiler, 'scoring'):
+        scores_df = calculate_anomaly_scores(
+            all_results, 
+            predictions=all_results.get('lightgbm_predictions'),
+            min_confidence=min_confidence
+        )
+
+    # Events stay in detector order; consumers that need a full ranking sort lazily
+    with profile_stage(profiler, 'ranking', len(scores_df)):
+        scored = score_anomaly_severity(scores_df)
+        all_results['row_anomaly_index'] = build_row_anomaly_index(scored)
+        if FLAGGED_ROWS in scored:
+            del scored[FLAGGED_ROWS]
+    return scored
+
+def generate_anomaly_report(df: pd.DataFrame, anomaly_results: pd.DataFrame, feature_importance: pd.DataFrame = None,
+                            row_anomaly_index: pd.DataFrame = None, quality_score_mode: str = "events") -> Dict:
     filtered_anomaly_results = anomaly_results[anomaly_results['issue_type'] != 'feature_importance'] if not anomaly_results.empty else anomaly_results
     summary = get_anomaly_summary(filtered_anomaly_results)
     total_rows = len(df)
-    anomaly_percentage = (summary['total_anomalies'] / total_rows) * 100 if total_rows > 0 else 0
+    if row_anomaly_index is None:
+        row_anomaly_index = build_row_anomaly_index(filtered_anomaly_results)
+    row_metrics = get_row_quality_metrics(row_anomaly_index, total_rows)
+    if quality_score_mode == "rows":
+        anomaly_percentage = row_metrics['row_anomaly_percentage']
+    else:
+        anomaly_percentage = (summary['total_anomalies'] / total_rows) * 100 if total_rows > 0 else 0
     quality_score = max(0, 100 - anomaly_percentage)
-    unique_rows_flagged = filtered_anomaly_results['row_index'].nunique() if not filtered_anomaly_results.empty and 'row_index' in filtered_anomaly_results else 0
-    method_breakdown = filtered_anomaly_results['method'].value_counts().to_dict() if not filtered_anomaly_results.empty and 'method' in filtered_anomaly_results else {}
+    unique_rows_flagged = row_metrics['rows_flagged']
+    method_breakdown = {}
+    if not filtered_anomaly_results.empty and 'method' in filtered_anomaly_results:
+        weights = filtered_anomaly_results['weight'] if 'weight' in filtered_anomaly_results else pd.Series(1.0, index=filtered_anomaly_results.index)
+        method_breakdown = weights.groupby(filtered_anomaly_results['method']).sum().round().astype(int).sort_values(ascending=False).to_dict()
     report = {
         'dataset_info': {
             'total_rows': total_rows,
@@ -103,12 +189,17 @@ def generate_anomaly_report(df: pd.DataFrame, anomaly_results: pd.DataFrame, fea
         'quality_metrics': {
             'anomaly_percentage': round(anomaly_percentage, 2),
             'quality_score': round(quality_score, 2),
-            'confidence_range': summary['confidence_range']
+            'confidence_range': summary['confidence_range'],
+            'quality_score_mode': quality_score_mode,
+            'row_anomaly_percentage': row_metrics['row_anomaly_percentage'],
+            'row_quality_score': row_metrics['row_quality_score'],
+            'rows_by_method': row_metrics['rows_by_method']
         },
-        'top_anomalies': filtered_anomaly_results.head(10).to_dict('records') if not filtered_anomaly_results.empty else [],
+        'top_anomalies': top_k_anomalies(filtered_anomaly_results, 10).to_dict('records') if not filtered_anomaly_results.empty else [],
         'feature_importance': feature_importance.head(10).to_dict('records') if feature_importance is not None and not feature_importance.empty else [],
         'unique_rows_flagged': unique_rows_flagged,
-        'anomaly_event_count': len(filtered_anomaly_results),
+        'anomaly_event_count': summary['total_anomalies'],
+        'emitted_event_count': len(filtered_anomaly_results),
         'method_breakdown': method_breakdown
     }
     return report
@@ -144,6 +235,9 @@ def get_anomaly_recommendations(report: Dict) -> List[str]:
     if 'update' in methods_used:
         recommendations.append("✏️ Update anomalies detected. Look for inconsistent updates, partial updates, or data type violations.")
 
+    if 'cross_file_duplicate' in methods_used:
+        recommendations.append("📑 Rows duplicated from previously uploaded files found. Deduplicate overlapping extracts before combining them.")
+
     if report['feature_importance']:
         top_feature = report['feature_importance'][0]['feature']
         recommendations.append(f"🎯 Focus on column '{top_feature}' - it contributes most to anomalies.")
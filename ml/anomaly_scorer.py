@@ -1,23 +1,55 @@
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple
+from ml.emission import FLAGGED_ROWS, represented_rows
 
-def calculate_anomaly_scores(anomaly_results: Dict[str, pd.DataFrame], predictions: np.ndarray = None) -> pd.DataFrame:
+# Entries of the detector results dict that carry model output rather than anomaly events
+NON_DETECTOR_RESULTS = {'feature_importance', 'lightgbm_predictions', 'row_anomaly_index'}
+
+ANOMALY_METHODS = ['numeric', 'categorical', 'lightgbm', 'insertion', 'deletion', 'update', 'cross_file_duplicate']
+
+SCORE_COLUMNS = ['row_index', 'method', 'issue_type', 'column', 'confidence', 'value', 'weight']
+# Carried through only when a detector reports them, e.g. the likely intended spelling of a rare category
+OPTIONAL_SCORE_COLUMNS = ['suggested_value', 'edit_distance']
+
+def _score_frame(method: str, results: pd.DataFrame, min_confidence: float = None) -> pd.DataFrame:
+    n = len(results)
+    confidence = results['anomaly_score'].to_numpy(dtype=float) if 'anomaly_score' in results else np.ones(n)
+    # Filter before building the score frame so low-confidence events are never materialized
+    keep = confidence >= min_confidence if min_confidence is not None else np.ones(n, dtype=bool)
+    if not keep.any():
+        return pd.DataFrame(columns=SCORE_COLUMNS)
+    row_index = results['row_index'].to_numpy() if 'row_index' in results else results.index.to_numpy()
+    weight = results['weight'].fillna(1.0).to_numpy(dtype=float) if 'weight' in results else np.ones(n)
+    scores = pd.DataFrame({
+        'row_index': row_index[keep],
+        'method': method,
+        'issue_type': results['issue_type'].to_numpy()[keep] if 'issue_type' in results else method,
+        'column': results['column'].to_numpy()[keep] if 'column' in results else None,
+        'confidence': confidence[keep],
+        'value': results['value'].to_numpy()[keep] if 'value' in results else 'N/A',
+        'weight': weight[keep]
+    })
+    for field in OPTIONAL_SCORE_COLUMNS + [FLAGGED_ROWS]:
+        if field in results:
+            scores[field] = results[field].to_numpy()[keep]
+    return scores
+
+def calculate_anomaly_scores(anomaly_results: Dict[str, pd.DataFrame], predictions: np.ndarray = None,
+                             min_confidence: float = None) -> pd.DataFrame:
     all_scores = []
     
     for method, results in anomaly_results.items():
+        if method in NON_DETECTOR_RESULTS:
+            continue
         if isinstance(results, pd.DataFrame) and not results.empty:
-            for _, row in results.iterrows():
-                score = {
-                    'row_index': row['row_index'] if 'row_index' in row else row.name,
-                    'method': method,
-                    'issue_type': row.get('issue_type', method),
-                    'confidence': row.get('anomaly_score', 1.0) if 'anomaly_score' in row else 1.0,
-                    'value': row.get('value', 'N/A')
-                }
-                all_scores.append(score)
+            scores = _score_frame(method, results, min_confidence)
+            if not scores.empty:
+                all_scores.append(scores)
     
-    return pd.DataFrame(all_scores)
+    if not all_scores:
+        return pd.DataFrame()
+    return pd.concat(all_scores, ignore_index=True)
 
 def set_anomaly_thresholds(method: str) -> float:
     thresholds = {
@@ -32,7 +64,9 @@ def set_anomaly_thresholds(method: str) -> float:
         'potential_accidental_deletion': 0.7,
         'inconsistent_update': 0.8,
         'partial_update': 0.7,
-        'data_type_violation': 0.9
+        'data_type_violation': 0.9,
+        'cross_file_exact_duplicate': 1.0,
+        'cross_file_near_duplicate': 0.6
     }
     return thresholds.get(method, 0.5)
 
@@ -43,6 +77,7 @@ def get_anomaly_summary(scores_df: pd.DataFrame) -> Dict:
     if scores_df.empty:
         return {
             'total_anomalies': 0,
+            'emitted_events': 0,
             'methods_used': [],
             'confidence_range': (0, 0),
             'top_issues': []
@@ -52,37 +87,114 @@ def get_anomaly_summary(scores_df: pd.DataFrame) -> Dict:
     if filtered_df.empty:
         return {
             'total_anomalies': 0,
+            'emitted_events': 0,
             'methods_used': [],
             'confidence_range': (0, 0),
             'top_issues': []
         }
+    # Bounded detectors keep a sample of their events; each one stands in for `weight` events
+    weights = filtered_df['weight'] if 'weight' in filtered_df else pd.Series(1.0, index=filtered_df.index)
+    top_issues = weights.groupby(filtered_df['issue_type']).sum().round().astype(int).sort_values(ascending=False)
     summary = {
-        'total_anomalies': len(filtered_df),
+        'total_anomalies': int(round(weights.sum())),
+        'emitted_events': len(filtered_df),
         'methods_used': filtered_df['method'].unique().tolist(),
         'confidence_range': (filtered_df['confidence'].min(), filtered_df['confidence'].max()),
-        'top_issues': filtered_df['issue_type'].value_counts().head(5).to_dict()
+        'top_issues': top_issues.head(5).to_dict()
     }
     return summary
 
+SEVERITY_WEIGHTS = {
+    'complex_pattern_anomaly': 1.0,
+    'numeric_outlier': 0.8,
+    'rare_category': 0.6,
+    'duplicate_record': 1.0,
+    'missing_required_field': 0.9,
+    'invalid_foreign_key': 0.8,
+    'potential_orphaned_record': 0.7,
+    'referential_integrity_violation': 1.0,
+    'potential_accidental_deletion': 0.7,
+    'inconsistent_update': 0.9,
+    'partial_update': 0.7,
+    'data_type_violation': 0.9,
+    'cross_file_exact_duplicate': 1.0,
+    'cross_file_near_duplicate': 0.8
+}
+
+def score_anomaly_severity(scores_df: pd.DataFrame) -> pd.DataFrame:
+    if scores_df.empty:
+        return scores_df
+    scores_df['method_weight'] = scores_df['issue_type'].map(SEVERITY_WEIGHTS).fillna(0.5)
+    scores_df['severity_score'] = scores_df['confidence'] * scores_df['method_weight']
+    return scores_df
+
+def top_k_anomalies(scores_df: pd.DataFrame, k: int = 10) -> pd.DataFrame:
+    """Most severe k events, ties broken by position, without sorting the whole frame."""
+    if scores_df.empty or k <= 0:
+        return scores_df.iloc[:0]
+    severity = scores_df['severity_score'].to_numpy(dtype=float)
+    if len(severity) > k:
+        kth = severity[np.argpartition(-severity, k - 1)[:k]].min()
+        candidates = np.flatnonzero(severity >= kth)
+    else:
+        candidates = np.arange(len(severity))
+    order = candidates[np.lexsort((candidates, -severity[candidates]))][:k]
+    return scores_df.iloc[order]
+
 def rank_anomalies_by_severity(scores_df: pd.DataFrame) -> pd.DataFrame:
     if scores_df.empty:
         return scores_df
-    
-    method_weights = {
-        'complex_pattern_anomaly': 1.0,
-        'numeric_outlier': 0.8,
-        'rare_category': 0.6,
-        'duplicate_record': 1.0,
-        'missing_required_field': 0.9,
-        'invalid_foreign_key': 0.8,
-        'potential_orphaned_record': 0.7,
-        'referential_integrity_violation': 1.0,
-        'potential_accidental_deletion': 0.7,
-        'inconsistent_update': 0.9,
-        'partial_update': 0.7,
-        'data_type_violation': 0.9
+    return score_anomaly_severity(scores_df).sort_values('severity_score', ascending=False, kind='stable')
+
+def build_row_anomaly_index(scores_df: pd.DataFrame) -> pd.DataFrame:
+    columns = ['method_mask', 'max_severity', 'event_count', 'event_weight']
+    if scores_df.empty:
+        index = pd.DataFrame(columns=columns)
+        index.attrs['method_bits'] = {}
+        return index
+    events = scores_df[scores_df['issue_type'] != 'feature_importance']
+    present = events['method'].unique().tolist()
+    methods = [m for m in ANOMALY_METHODS if m in present] + sorted(m for m in present if m not in ANOMALY_METHODS)
+    method_bits = {m: 1 << i for i, m in enumerate(methods)}
+
+    severity = (events['severity_score'] if 'severity_score' in events else events['confidence']).to_numpy(dtype=float)
+    weight = events['weight'].fillna(1.0).to_numpy(dtype=float) if 'weight' in events else np.ones(len(events))
+    # Capped events also stand for the rows whose examples were dropped; their weight is spread over them
+    owners, rows = represented_rows(events)
+    weight = weight / np.bincount(owners, minlength=len(events)).clip(min=1)
+    pairs = pd.DataFrame({
+        'row_index': rows,
+        'bit': events['method'].map(method_bits).to_numpy(dtype=np.uint64)[owners],
+        'severity': severity[owners],
+        'weight': weight[owners]
+    })
+    grouped = pairs.groupby('row_index', sort=True)
+    # Bits are distinct powers of two, so summing unique (row, bit) pairs is a bitwise OR
+    method_mask = pairs.drop_duplicates(['row_index', 'bit']).groupby('row_index', sort=True)['bit'].sum()
+    index = pd.DataFrame({
+        'method_mask': method_mask.astype(np.uint64),
+        'max_severity': grouped['severity'].max(),
+        'event_count': grouped.size(),
+        'event_weight': grouped['weight'].sum()
+    })
+    index.attrs['method_bits'] = method_bits
+    return index
+
+def rows_flagged_by_method(row_index: pd.DataFrame, method: str) -> pd.Index:
+    bit = row_index.attrs.get('method_bits', {}).get(method)
+    if bit is None:
+        return row_index.index[:0]
+    return row_index.index[(row_index['method_mask'].to_numpy() & np.uint64(bit)) != 0]
+
+def rows_above_severity(row_index: pd.DataFrame, threshold: float) -> pd.Index:
+    return row_index.index[row_index['max_severity'].to_numpy() > threshold]
+
+def get_row_quality_metrics(row_index: pd.DataFrame, total_rows: int) -> Dict:
+    rows_flagged = len(row_index)
+    row_anomaly_percentage = (rows_flagged / total_rows) * 100 if total_rows > 0 else 0
+    return {
+        'rows_flagged': rows_flagged,
+        'row_anomaly_percentage': round(row_anomaly_percentage, 2),
+        'row_quality_score': round(max(0, 100 - row_anomaly_percentage), 2),
+        'rows_by_method': {m: int(len(rows_flagged_by_method(row_index, m))) for m in row_index.attrs.get('method_bits', {})}
     }
-    
-    scores_df['method_weight'] = scores_df['issue_type'].map(method_weights).fillna(0.5)
-    scores_df['severity_score'] = scores_df['confidence'] * scores_df['method_weight']
-    return scores_df.sort_values('severity_score', ascending=False) 
\ No newline at end of file
@@ -1,18 +1,28 @@
 import pandas as pd
-def detect_categorical_anomalies(df: pd.DataFrame, min_frq=0.01):
-    results = []
+from ml.parallel import map_columns
+from ml.typo_resolver import suggest_corrections
 
-    for col in df.select_dtypes(include=['object', 'category']).columns:
-        series = df[col].dropna()
-        value_counts = series.value_counts(normalize=True)
-        rare_values = value_counts[value_counts < min_frq].index.to_list()
+def _categorical_column_anomalies(col, column: pd.Series, min_frq) -> pd.DataFrame:
+    series = column.dropna()
+    value_counts = series.value_counts()
+    rare_values = value_counts[value_counts < min_frq * len(series)].index
+    if rare_values.empty:
+        return None
+    rare = series[series.isin(rare_values)]
+    found = pd.DataFrame({
+        'column': col,
+        'row_index': rare.index,
+        'value': rare.to_numpy(),
+        'issue_type': 'rare_category'
+    })
+    # Rare values that are near-misses of a frequent one carry the spelling they most likely meant
+    suggestions = suggest_corrections(value_counts, rare_values).set_index('value')
+    found['suggested_value'] = found['value'].map(suggestions['suggested_value'])
+    found['edit_distance'] = found['value'].map(suggestions['edit_distance'])
+    return found
 
-        for idx, val in series.items():
-            if val in rare_values:
-                results.append({
-                    'column': col,
-                    'row_index': idx,
-                    'value': val,
-                    'issue_type': 'rare_category'
-                })
-    return pd.DataFrame(results)
\ No newline at end of file
+def detect_categorical_anomalies(df: pd.DataFrame, min_frq=0.01, n_jobs: int = None):
+    columns = df.select_dtypes(include=['object', 'category']).columns
+    results = [r for r in map_columns(lambda col, column: _categorical_column_anomalies(col, column, min_frq),
+                                      df, columns, n_jobs) if r is not None]
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
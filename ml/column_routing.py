@@ -0,0 +1,91 @@
+import pandas as pd
+from typing import Dict, List
+
+ROUTED_DETECTORS = ['numeric', 'categorical', 'lightgbm', 'keys']
+
+# A column is treated as an identifier when nearly every value is unique
+IDENTIFIER_UNIQUE_RATIO = 0.95
+# Text columns above this unique ratio are too sparse for rare-category checks
+CATEGORICAL_MAX_UNIQUE_RATIO = 0.5
+FREE_TEXT_MIN_LENGTH = 30
+PROFILE_SAMPLE_SIZE = 1000
+
+def _is_key_name(col: str) -> bool:
+    return col.endswith('_id') or col.endswith('Id')
+
+def profile_columns(df: pd.DataFrame) -> pd.DataFrame:
+    rows = len(df)
+    records = []
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            kind = 'boolean'
+        elif pd.api.types.is_numeric_dtype(series):
+            kind = 'numeric'
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            kind = 'datetime'
+        else:
+            kind = 'text'
+        try:
+            n_unique = int(series.nunique(dropna=True))
+        except TypeError:
+            # Lists and dicts from nested JSON: counted by their text and kept away from the detectors
+            kind = 'nested'
+            n_unique = int(series.dropna().astype(str).nunique())
+        non_null = int(series.notna().sum())
+        unique_ratio = n_unique / non_null if non_null else 0.0
+        avg_length = None
+        if kind == 'text' and non_null:
+            sample = series.dropna().head(PROFILE_SAMPLE_SIZE).astype(str)
+            avg_length = float(sample.str.len().mean())
+        is_identifier = unique_ratio >= IDENTIFIER_UNIQUE_RATIO and non_null > 1 and kind in ('numeric', 'text')
+        if kind == 'numeric' and is_identifier and not pd.api.types.is_integer_dtype(series.dropna()):
+            # Continuous measurements are naturally unique, only integer-like columns look like IDs
+            is_identifier = bool((series.dropna() % 1 == 0).all())
+        records.append({
+            'column': col,
+            'kind': kind,
+            'dtype': str(series.dtype),
+            'n_unique': n_unique,
+            'unique_ratio': round(unique_ratio, 4),
+            'null_ratio': round(1 - non_null / rows, 4) if rows else 0.0,
+            'avg_length': round(avg_length, 2) if avg_length is not None else None,
+            'is_key': _is_key_name(col),
+            'is_identifier': bool(is_identifier),
+            'is_free_text': bool(kind == 'text' and avg_length is not None and avg_length >= FREE_TEXT_MIN_LENGTH
+                                 and unique_ratio > CATEGORICAL_MAX_UNIQUE_RATIO),
+        })
+    profile = pd.DataFrame(records, columns=['column', 'kind', 'dtype', 'n_unique', 'unique_ratio', 'null_ratio',
+                                             'avg_length', 'is_key', 'is_identifier', 'is_free_text'])
+    return profile.set_index('column')
+
+def route_columns(profile: pd.DataFrame, overrides: Dict[str, List[str]] = None) -> Dict[str, List[str]]:
+    """Decide which columns each detector sees; overrides replace a route or exclude columns everywhere."""
+    is_key = profile['is_key']
+    is_identifier = profile['is_identifier']
+    is_free_text = profile['is_free_text']
+    routes = {
+        'numeric': profile.index[(profile['kind'] == 'numeric') & ~is_key & ~is_identifier].tolist(),
+        'categorical': profile.index[profile['kind'].isin(['text', 'boolean']) & ~is_identifier & ~is_free_text
+                                     & (profile['unique_ratio'] <= CATEGORICAL_MAX_UNIQUE_RATIO)].tolist(),
+        'lightgbm': profile.index[~is_identifier & ~is_free_text & ~profile['kind'].isin(['datetime', 'nested'])].tolist(),
+        'keys': profile.index[is_key].tolist(),
+    }
+    if not overrides:
+        return routes
+
+    unknown_detectors = set(overrides) - set(ROUTED_DETECTORS) - {'exclude'}
+    if unknown_detectors:
+        raise ValueError(f"Unknown routing targets: {', '.join(sorted(unknown_detectors))}; "
+                         f"expected one of {', '.join(ROUTED_DETECTORS + ['exclude'])}")
+    excluded = set()
+    for target, columns in overrides.items():
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        missing = [c for c in columns if c not in profile.index]
+        if missing:
+            raise ValueError(f"Unknown columns in routing for {target}: {', '.join(missing)}")
+        if target == 'exclude':
+            excluded.update(columns)
+        else:
+            routes[target] = columns
+    return {target: [c for c in columns if c not in excluded] for target, columns in routes.items()}
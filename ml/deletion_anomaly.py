@@ -1,34 +1,35 @@
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple
+from ml.emission import DEFAULT_MAX_EXAMPLES, emit_events, cap_events, event_total
+from ml.parallel import map_columns
+from ml.rules import MAX_FOREIGN_KEY, ORPHAN_MIN_VALUE, ColumnView
 
-def detect_orphaned_records(df: pd.DataFrame, parent_child_mappings: Dict[str, str] = None) -> pd.DataFrame:
-    results = []
+def detect_orphaned_records(df: pd.DataFrame, parent_child_mappings: Dict[str, str] = None,
+                            max_examples: int = DEFAULT_MAX_EXAMPLES) -> pd.DataFrame:
     if parent_child_mappings is None:
         potential_fks = [col for col in df.columns if col.endswith('_id') or col.endswith('Id')]
         parent_child_mappings = {fk: fk for fk in potential_fks}
-    
-    for child_col, parent_ref in parent_child_mappings.items():
-        if child_col in df.columns:
-            fk_values = df[child_col].dropna().unique()
-            for idx, value in df[child_col].items():
-                if pd.notna(value):
-                    if isinstance(value, (int, float)):
-                        value_count = (df[child_col] == value).sum()
-                        if value_count == 1 and value > 1000:
-                            results.append({
-                                'row_index': idx,
-                                'issue_type': 'potential_orphaned_record',
-                                'confidence': 0.6,
-                                'value': f"{child_col}: {value}",
-                                'details': f"Potential orphaned record - {child_col} value {value} appears only once"
-                            })
-    
-    return pd.DataFrame(results)
 
-def detect_referential_integrity_violations(df: pd.DataFrame, 
-                                         constraint_mappings: Dict[str, Dict] = None) -> pd.DataFrame:
     results = []
+    for child_col in parent_child_mappings:
+        if child_col not in df.columns:
+            continue
+        view = ColumnView(df[child_col])
+        values = np.where(view.is_number, view.numeric, np.nan)
+        # Numeric keys above the threshold that occur exactly once in the column
+        unique_values = ~pd.Series(values).duplicated(keep=False).to_numpy()
+        positions = np.flatnonzero(view.is_number & unique_values & (values > ORPHAN_MIN_VALUE))
+        if len(positions):
+            results.append(emit_events(
+                positions, df.index, 'potential_orphaned_record', child_col, 0.6, max_examples,
+                value=lambda kept, view=view, col=child_col: [f"{col}: {v}" for v in view.raw[kept]],
+                details=lambda kept, view=view, col=child_col: [
+                    f"Potential orphaned record - {col} value {v} appears only once" for v in view.raw[kept]]))
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+def detect_referential_integrity_violations(df: pd.DataFrame, constraint_mappings: Dict[str, Dict] = None,
+                                            max_examples: int = DEFAULT_MAX_EXAMPLES) -> pd.DataFrame:
     if constraint_mappings is None:
         constraint_mappings = {}
         for col in df.columns:
@@ -36,88 +37,92 @@ def detect_referential_integrity_violations(df: pd.DataFrame,
                 constraint_mappings[col] = {
                     'type': 'foreign_key',
                     'min_value': 1,
-                    'max_value': 999999999
+                    'max_value': MAX_FOREIGN_KEY
                 }
-    
-    for col, constraints in constraint_mappings.items():
-        if col in df.columns:
-            for idx, value in df[col].items():
-                if pd.notna(value):
-                    if 'min_value' in constraints and value < constraints['min_value']:
-                        results.append({
-                            'row_index': idx,
-                            'issue_type': 'referential_integrity_violation',
-                            'confidence': 0.9,
-                            'value': f"{col}: {value}",
-                            'details': f"Value {value} below minimum {constraints['min_value']} for {col}"
-                        })
-                    
-                    if 'max_value' in constraints and value > constraints['max_value']:
-                        results.append({
-                            'row_index': idx,
-                            'issue_type': 'referential_integrity_violation',
-                            'confidence': 0.8,
-                            'value': f"{col}: {value}",
-                            'details': f"Value {value} above maximum {constraints['max_value']} for {col}"
-                        })
-    
-    return pd.DataFrame(results)
 
-def detect_accidental_deletions(df: pd.DataFrame, critical_columns: List[str] = None) -> pd.DataFrame:
     results = []
-    if critical_columns is None:
-        null_percentages = df.isnull().mean()
-        unique_ratios = df.nunique() / len(df)
-        critical_columns = []
-        
-        for col in df.columns:
-            if null_percentages[col] < 0.05 and unique_ratios[col] > 0.8:
-                critical_columns.append(col)
-    
-    for col in critical_columns:
-        if col in df.columns:
-            null_mask = df[col].isnull()
-            consecutive_nulls = null_mask.astype(int).groupby(
-                (null_mask != null_mask.shift()).cumsum()
-            ).sum()
-            
-            if consecutive_nulls.max() > 5:
-                null_indices = df[null_mask].index.tolist()
-                for idx in null_indices[:10]:
-                    results.append({
-                        'row_index': idx,
-                        'issue_type': 'potential_accidental_deletion',
-                        'confidence': 0.7,
-                        'value': f"NULL in {col}",
-                        'details': f"Potential accidental deletion detected in {col}"
-                    })
-    
-    return pd.DataFrame(results)
+    for col, constraints in constraint_mappings.items():
+        if col not in df.columns:
+            continue
+        view = ColumnView(df[col])
+        values = view.numeric
+        labelled = lambda kept, view=view, col=col: [f"{col}: {v}" for v in view.raw[kept]]
+        if 'min_value' in constraints:
+            minimum = constraints['min_value']
+            positions = np.flatnonzero(values < minimum)
+            if len(positions):
+                results.append(emit_events(
+                    positions, df.index, 'referential_integrity_violation', col, 0.9, max_examples, value=labelled,
+                    details=lambda kept, view=view, col=col, minimum=minimum: [
+                        f"Value {v} below minimum {minimum} for {col}" for v in view.raw[kept]]))
+        if 'max_value' in constraints:
+            maximum = constraints['max_value']
+            positions = np.flatnonzero(values > maximum)
+            if len(positions):
+                results.append(emit_events(
+                    positions, df.index, 'referential_integrity_violation', col, 0.8, max_examples, value=labelled,
+                    details=lambda kept, view=view, col=col, maximum=maximum: [
+                        f"Value {v} above maximum {maximum} for {col}" for v in view.raw[kept]]))
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+def detect_accidental_deletions(df: pd.DataFrame, critical_columns: List[str] = None,
+                                n_jobs: int = None) -> pd.DataFrame:
+    infer = critical_columns is None
+
+    def deletions(col, column):
+        null_mask = column.isnull()
+        # Columns that are nearly complete and nearly unique are treated as critical
+        if infer and not (null_mask.mean() < 0.05 and column.nunique() > 0.8 * len(df)):
+            return []
+        consecutive_nulls = null_mask.astype(int).groupby(
+            (null_mask != null_mask.shift()).cumsum()
+        ).sum()
+        if not consecutive_nulls.max() > 5:
+            return []
+        return [{
+            'row_index': idx,
+            'column': col,
+            'issue_type': 'potential_accidental_deletion',
+            'confidence': 0.7,
+            'value': f"NULL in {col}",
+            'details': f"Potential accidental deletion detected in {col}"
+        } for idx in column.index[null_mask.to_numpy()][:10]]
+
+    results = map_columns(deletions, df, df.columns if infer else critical_columns, n_jobs)
+    return pd.DataFrame([event for events in results for event in events])
 
 def detect_deletion_anomalies(df: pd.DataFrame, parent_child_mappings: Dict[str, str] = None,
                             constraint_mappings: Dict[str, Dict] = None,
-                            critical_columns: List[str] = None) -> pd.DataFrame:
+                            critical_columns: List[str] = None,
+                            max_examples: int = DEFAULT_MAX_EXAMPLES, sql_engine=None,
+                            n_jobs: int = None) -> pd.DataFrame:
     all_results = []
     try:
-        orphaned_results = detect_orphaned_records(df, parent_child_mappings)
+        if sql_engine is not None:
+            orphaned_results = sql_engine.orphaned_records(parent_child_mappings, max_examples)
+        else:
+            orphaned_results = detect_orphaned_records(df, parent_child_mappings, max_examples)
         all_results.append(orphaned_results)
-        print(f"✓ Orphaned records detected: {len(orphaned_results)}")
+        print(f"✓ Orphaned records detected: {event_total(orphaned_results)}")
     except Exception as e:
         print(f"✗ Orphaned record detection failed: {e}")
     try:
-        integrity_results = detect_referential_integrity_violations(df, constraint_mappings)
+        if sql_engine is not None:
+            integrity_results = sql_engine.referential_integrity_violations(constraint_mappings, max_examples)
+        else:
+            integrity_results = detect_referential_integrity_violations(df, constraint_mappings, max_examples)
         all_results.append(integrity_results)
-        print(f"✓ Referential integrity violations detected: {len(integrity_results)}")
+        print(f"✓ Referential integrity violations detected: {event_total(integrity_results)}")
     except Exception as e:
         print(f"✗ Integrity violation detection failed: {e}")
     try:
-        accidental_results = detect_accidental_deletions(df, critical_columns)
+        accidental_results = detect_accidental_deletions(df, critical_columns, n_jobs)
         all_results.append(accidental_results)
         print(f"✓ Potential accidental deletions detected: {len(accidental_results)}")
     except Exception as e:
         print(f"✗ Accidental deletion detection failed: {e}")
     if all_results:
         combined_results = pd.concat(all_results, ignore_index=True)
-        return combined_results
+        return cap_events(combined_results, max_examples)
     else:
         return pd.DataFrame() 
\ No newline at end of file
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+# Representative events kept per (column, issue_type); the rest are only counted
+DEFAULT_MAX_EXAMPLES = 1000
+# Row labels a kept event stands for when others were dropped; missing means only its own row. The row
+# anomaly index is built from these, so capping examples never drops a flagged row from the row metrics.
+FLAGGED_ROWS = 'flagged_rows'
+
+def _picks(total: int, max_examples: int) -> np.ndarray:
+    if max_examples is None or total <= max_examples:
+        return np.arange(total)
+    # Evenly spaced picks cover the whole table instead of only its first rows
+    return np.linspace(0, total - 1, max_examples).astype(np.int64)
+
+def emit_events(positions: np.ndarray, index: pd.Index, issue_type: str, column: str, confidence: float,
+                max_examples: int = DEFAULT_MAX_EXAMPLES, value=None, details=None) -> pd.DataFrame:
+    """Build events for the rows at `positions`, keeping at most `max_examples` of them.
+
+    `value` and `details` may be scalars or callables that receive the kept positions, so
+    per-row strings are only formatted for the events that are actually returned.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    total = len(positions)
+    if total == 0:
+        return pd.DataFrame()
+    picks = _picks(total, max_examples)
+    kept = positions[picks]
+    events = pd.DataFrame({
+        'row_index': index[kept],
+        'column': column,
+        'issue_type': issue_type,
+        'confidence': confidence,
+        'value': value(kept) if callable(value) else value,
+        'details': details(kept) if callable(details) else details,
+    })
+    events['total_count'] = total
+    events['weight'] = total / len(kept)
+    if len(kept) < total:
+        # Each example stands for the flagged rows from its own up to the next example
+        flagged = np.empty(len(kept), dtype=object)
+        for i, rows in enumerate(np.split(index.to_numpy()[positions], picks[1:])):
+            flagged[i] = rows
+        events[FLAGGED_ROWS] = flagged
+    return events
+
+def represented_rows(events: pd.DataFrame):
+    """(event position, row label) for every row the events stand for, including the rows only counted."""
+    own = np.arange(len(events))
+    labels = events['row_index'].to_numpy() if 'row_index' in events else events.index.to_numpy()
+    if FLAGGED_ROWS not in events:
+        return own, labels
+    flagged = events[FLAGGED_ROWS].to_numpy()
+    grouped = np.array([isinstance(rows, np.ndarray) for rows in flagged], dtype=bool)
+    if not grouped.any():
+        return own, labels
+    rows = [flagged[i] for i in np.flatnonzero(grouped)]
+    owners = np.concatenate([own[~grouped], np.repeat(own[grouped], [len(r) for r in rows])])
+    return owners, np.concatenate([labels[~grouped]] + rows)
+
+def cap_events(events: pd.DataFrame, max_examples: int = DEFAULT_MAX_EXAMPLES) -> pd.DataFrame:
+    """Bound an event frame to `max_examples` rows per (column, issue_type), preserving the weighted total."""
+    if events.empty:
+        return events
+    events = events.reset_index(drop=True)
+    if 'column' not in events:
+        events['column'] = None
+    events['weight'] = events['weight'].fillna(1.0) if 'weight' in events else 1.0
+    keys = [events['column'].astype(object).where(events['column'].notna(), ''), events['issue_type']]
+    totals = events.groupby(keys, sort=False)['weight'].transform('sum')
+    if max_examples is not None:
+        keep = (events.groupby(keys, sort=False).cumcount() < max_examples).to_numpy()
+        if not keep.all():
+            _fold_dropped(events, keep, keys)
+            events, totals = events[keep].copy(), totals[keep]
+            kept = events.groupby([keys[0][keep], keys[1][keep]], sort=False)['weight'].transform('size')
+            events['weight'] = totals / kept
+    events['total_count'] = totals.round().astype(np.int64)
+    return events.reset_index(drop=True)
+
+def _fold_dropped(events: pd.DataFrame, keep: np.ndarray, keys):
+    # The rows of dropped events move to the last kept event of their group
+    groups = events.groupby(keys, sort=False).ngroup().to_numpy()
+    kept = np.flatnonzero(keep)
+    last_kept = pd.Series(kept).groupby(groups[kept]).last()
+    dropped = np.flatnonzero(~keep)
+    owners, labels = represented_rows(events.iloc[dropped])
+    owner_groups = groups[dropped][owners]
+    order = np.argsort(owner_groups, kind='stable')
+    owner_groups, labels = owner_groups[order], labels[order]
+    bounds = np.flatnonzero(np.diff(owner_groups)) + 1
+    target_events = last_kept[owner_groups[np.r_[0, bounds]]].to_numpy()
+    if FLAGGED_ROWS not in events:
+        events[FLAGGED_ROWS] = None
+    flagged = events[FLAGGED_ROWS].to_numpy(dtype=object).copy()
+    row_labels = events['row_index'].to_numpy() if 'row_index' in events else events.index.to_numpy()
+    for target, moved in zip(target_events, np.split(labels, bounds)):
+        current = flagged[target] if isinstance(flagged[target], np.ndarray) else row_labels[target:target + 1]
+        flagged[target] = np.concatenate([current, moved])
+    events[FLAGGED_ROWS] = flagged
+
+def event_total(events: pd.DataFrame) -> int:
+    if events.empty:
+        return 0
+    return int(round(events['weight'].sum())) if 'weight' in events else len(events)
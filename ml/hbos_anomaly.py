@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+from ml.lightgbm_anomaly import prepare_data_for_lightgbm
+
+# Histogram-based outlier score (HBOS): one histogram per feature, and a row scores the sum of the
+# log inverse densities of its values. Fitting and scoring are single vectorized passes per column.
+
+MIN_BINS = 10
+MAX_BINS = 50
+# Numeric histograms span the Tukey fences at this many IQRs, so a cluster of extreme values cannot
+# stretch the bins; values beyond the fences score by their distance to them
+FENCE_IQR = 3.0
+TOP_CONTRIBUTORS = 3
+
+def _bins(n_rows: int) -> int:
+    return int(min(MAX_BINS, max(MIN_BINS, round(np.sqrt(n_rows)))))
+
+def _inverse_density(counts: np.ndarray, max_count: int) -> np.ndarray:
+    return np.log((max_count + 1) / (counts + 1))
+
+def _as_float(values) -> np.ndarray:
+    return np.asarray(pd.to_numeric(values, errors='coerce'), dtype='float64')
+
+def _fit_feature(processed: pd.Series, raw: pd.Series, classes, n_bins: int) -> Dict:
+    if classes is not None:
+        counts = np.bincount(processed.to_numpy(dtype=np.int64), minlength=len(classes))
+        return {'kind': 'categorical', 'classes': np.asarray(classes), 'counts': counts,
+                'max_count': int(counts.max()) if len(counts) else 0}
+
+    values = _as_float(raw)
+    missing = np.isnan(values)
+    values = values[~missing]
+    missing_count = int(missing.sum())
+    distinct, counts = np.unique(values, return_counts=True)
+    if len(distinct) <= n_bins:
+        # Few distinct numbers are counted exactly instead of being binned
+        max_count = int(max(counts.max() if len(counts) else 0, missing_count))
+        return {'kind': 'discrete', 'values': distinct, 'counts': counts, 'missing_count': missing_count,
+                'max_count': max_count}
+
+    q1, q3 = np.quantile(values, [0.25, 0.75])
+    iqr = q3 - q1
+    low, high = max(distinct[0], q1 - FENCE_IQR * iqr), min(distinct[-1], q3 + FENCE_IQR * iqr)
+    if high <= low:
+        low, high = distinct[0], distinct[-1]
+    width = (high - low) / n_bins
+    inside = (values >= low) & (values <= high)
+    bins = np.minimum(((values[inside] - low) / width).astype(np.int64), n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    max_count = int(max(counts.max(), missing_count))
+    return {'kind': 'histogram', 'low': float(low), 'high': float(high), 'width': float(width), 'counts': counts,
+            'missing_count': missing_count, 'max_count': max_count}
+
+def fit_hbos(df: pd.DataFrame, contamination: float = 0.05, n_bins: int = None) -> Dict:
+    """Fit per-feature histograms on the LightGBM encoding and the score threshold for `contamination`."""
+    df_processed, label_encoders = prepare_data_for_lightgbm(df)
+    n_bins = n_bins or _bins(len(df))
+    features = {}
+    for col in df.columns:
+        encoder = label_encoders.get(col)
+        features[col] = _fit_feature(df_processed[col], df[col], encoder.classes_ if encoder is not None else None,
+                                     n_bins)
+    model = {'features': features, 'n_bins': n_bins, 'contamination': contamination}
+    scores, _ = score_hbos(model, df)
+    model['threshold'] = float(np.quantile(scores, 1 - contamination)) if len(scores) else 0.0
+    model['max_score'] = float(scores.max()) if len(scores) else 0.0
+    return model
+
+def _feature_contribution(feature: Dict, raw: np.ndarray) -> np.ndarray:
+    max_count = feature['max_count']
+    missing = pd.isna(raw)
+    if feature['kind'] == 'categorical':
+        classes = feature['classes']
+        values = np.where(missing, 'MISSING', raw.astype(object)).astype(str)
+        positions = np.searchsorted(classes, values)
+        positions = np.minimum(positions, max(len(classes) - 1, 0))
+        seen = (classes[positions] == values) if len(classes) else np.zeros(len(values), dtype=bool)
+        counts = np.where(seen, feature['counts'][positions] if len(classes) else 0, 0)
+        return _inverse_density(counts, max_count)
+
+    values = _as_float(raw)
+    unparseable = np.isnan(values) & ~missing
+    values = np.where(np.isnan(values), 0.0, values)
+    if feature['kind'] == 'discrete':
+        distinct = feature['values']
+        positions = np.minimum(np.searchsorted(distinct, values), max(len(distinct) - 1, 0))
+        seen = (distinct[positions] == values) if len(distinct) else np.zeros(len(values), dtype=bool)
+        counts = np.where(seen, feature['counts'][positions] if len(distinct) else 0, 0)
+        contribution = _inverse_density(counts, max_count)
+    else:
+        low, high, width = feature['low'], feature['high'], feature['width']
+        bins = np.clip(((values - low) / width).astype(np.int64), 0, len(feature['counts']) - 1)
+        contribution = _inverse_density(feature['counts'][bins], max_count)
+        # Beyond the fitted range: at least an empty bin, growing with the distance in bin widths
+        distance = np.maximum(low - values, values - high) / width
+        outside = distance > 0
+        contribution[outside] = np.log(max_count + 1) + np.log1p(distance[outside])
+    contribution[missing] = _inverse_density(np.array(feature['missing_count']), max_count)
+    contribution[unparseable] = np.log(max_count + 1)
+    return contribution
+
+def contribution_matrix(model: Dict, columns: Dict[str, np.ndarray], n_rows: int) -> np.ndarray:
+    """Per-feature contributions (rows x features) from plain column arrays; absent columns contribute 0."""
+    # Plain arrays keep the per-call overhead low when a handful of records are scored online
+    matrix = np.zeros((n_rows, len(model['features'])))
+    for j, (col, feature) in enumerate(model['features'].items()):
+        if col in columns:
+            matrix[:, j] = _feature_contribution(feature, columns[col])
+    return matrix
+
+def explain_hbos(model: Dict, matrix: np.ndarray, flagged: np.ndarray) -> List[str]:
+    # Name the features that explain each flagged row, strongest first
+    flagged_contributions = matrix[flagged]
+    top = np.argsort(-flagged_contributions, axis=1, kind='stable')[:, :TOP_CONTRIBUTORS]
+    columns = list(model['features'])
+    return [
+        ', '.join(f"{columns[j]} ({flagged_contributions[i, j]:.2f})" for j in row)
+        for i, row in enumerate(top)
+    ]
+
+def score_hbos(model: Dict, df: pd.DataFrame) -> Tuple[np.ndarray, pd.DataFrame]:
+    """Return the HBOS score of every row and the per-feature contributions that sum to it."""
+    matrix = contribution_matrix(model, {col: df[col].to_numpy() for col in df.columns}, len(df))
+    return matrix.sum(axis=1), pd.DataFrame(matrix, columns=list(model['features']), index=df.index)
+
+def hbos_confidence(model: Dict, scores: np.ndarray) -> np.ndarray:
+    # Rows at the threshold start at 0.5 and the most anomalous fitted row reaches 1.0
+    span = max(model['max_score'] - model['threshold'], 1e-9)
+    return 0.5 + 0.5 * np.clip((scores - model['threshold']) / span, 0, 1)
+
+def detect_hbos_anomalies(df: pd.DataFrame, model: Dict) -> Tuple[pd.DataFrame, np.ndarray, pd.DataFrame]:
+    scores, contributions = score_hbos(model, df)
+    predictions = hbos_confidence(model, scores)
+    flagged = np.flatnonzero(scores > model['threshold'])
+    if len(flagged) == 0:
+        return pd.DataFrame(), predictions, contributions
+
+    results = pd.DataFrame({
+        'row_index': flagged,
+        'anomaly_score': predictions[flagged],
+        'issue_type': 'complex_pattern_anomaly',
+        'value': explain_hbos(model, contributions.to_numpy(), flagged),
+    })
+    return results, predictions, contributions
+
+def get_hbos_feature_importance(contributions: pd.DataFrame, results: pd.DataFrame) -> pd.DataFrame:
+    """Mean contribution of each feature to the flagged rows' scores (all rows when none are flagged)."""
+    rows = results['row_index'].to_numpy() if not results.empty else np.arange(len(contributions))
+    importance = contributions.iloc[rows].mean() if len(rows) else contributions.sum() * 0
+    return pd.DataFrame({
+        'feature': importance.index.tolist(),
+        'importance': importance.to_numpy()
+    }).sort_values('importance', ascending=False)
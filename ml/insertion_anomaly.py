@@ -1,108 +1,113 @@
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple
+from ml.row_fingerprint import compute_row_fingerprints, find_duplicate_groups
+from ml.emission import DEFAULT_MAX_EXAMPLES, FLAGGED_ROWS, emit_events, cap_events, event_total
+from ml.parallel import map_columns
+from ml.rules import MAX_FOREIGN_KEY, ColumnView
 
-def detect_duplicate_records(df: pd.DataFrame, subset: List[str] = None) -> pd.DataFrame:
+def detect_duplicate_records(df: pd.DataFrame, subset: List[str] = None, fingerprints: pd.Series = None) -> pd.DataFrame:
     results = []
     if subset is None:
         subset = df.columns.tolist()
-    duplicates = df.duplicated(subset=subset, keep=False)
-    duplicate_indices = df[duplicates].index.tolist()
+    if fingerprints is None:
+        fingerprints = compute_row_fingerprints(df, subset)
+    duplicate_groups = find_duplicate_groups(df, subset, fingerprints)
     
-    for idx in duplicate_indices:
+    for members in duplicate_groups:
         results.append({
-            'row_index': idx,
+            'row_index': members[0],
             'issue_type': 'duplicate_record',
             'confidence': 1.0,
             'value': 'Duplicate data',
-            'details': f"Duplicate found in columns: {', '.join(subset)}"
+            'details': f"{len(members)} identical rows in columns: {', '.join(subset)}",
+            'duplicate_rows': members.tolist(),
+            'group_size': len(members),
+            'fingerprint': format(int(fingerprints.loc[members[0]]), '016x'),
+            # One event per group, standing for every member row
+            'weight': len(members),
+            FLAGGED_ROWS: members
         })
     
     return pd.DataFrame(results)
 
-def detect_missing_required_fields(df: pd.DataFrame, required_columns: List[str] = None) -> pd.DataFrame:
-    results = []
-    if required_columns is None:
-        null_percentages = df.isnull().mean()
-        required_columns = null_percentages[null_percentages < 0.1].index.tolist()
-    
-    for col in required_columns:
-        if col in df.columns:
-            missing_indices = df[df[col].isnull()].index.tolist()
-            
-            for idx in missing_indices:
-                results.append({
-                    'row_index': idx,
-                    'issue_type': 'missing_required_field',
-                    'confidence': 0.9,
-                    'value': f"NULL in {col}",
-                    'details': f"Required field '{col}' is missing"
-                })
-    
-    return pd.DataFrame(results)
+def detect_missing_required_fields(df: pd.DataFrame, required_columns: List[str] = None,
+                                   max_examples: int = DEFAULT_MAX_EXAMPLES, n_jobs: int = None) -> pd.DataFrame:
+    infer = required_columns is None
 
-def detect_invalid_foreign_keys(df: pd.DataFrame, foreign_key_mappings: Dict[str, str] = None) -> pd.DataFrame:
-    results = []
+    def missing(col, column):
+        nulls = column.isnull().to_numpy()
+        # Columns that are mostly filled are treated as required
+        if infer and nulls.sum() >= 0.1 * len(nulls):
+            return None
+        positions = np.flatnonzero(nulls)
+        if not len(positions):
+            return None
+        return emit_events(positions, df.index, 'missing_required_field', col, 0.9, max_examples,
+                           value=f"NULL in {col}", details=f"Required field '{col}' is missing")
+
+    results = [r for r in map_columns(missing, df, df.columns if infer else required_columns, n_jobs) if r is not None]
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+def detect_invalid_foreign_keys(df: pd.DataFrame, foreign_key_mappings: Dict[str, str] = None,
+                                max_examples: int = DEFAULT_MAX_EXAMPLES) -> pd.DataFrame:
     if foreign_key_mappings is None:
         potential_fks = [col for col in df.columns if col.endswith('_id') or col.endswith('Id')]
         foreign_key_mappings = {fk: fk for fk in potential_fks}
-    
-    for fk_col, referenced_table in foreign_key_mappings.items():
-        if fk_col in df.columns:
-            fk_values = df[fk_col].dropna().unique()
-            for idx, value in df[fk_col].items():
-                if pd.notna(value):
-                    if isinstance(value, (int, float)):
-                        if value < 0:
-                            results.append({
-                                'row_index': idx,
-                                'issue_type': 'invalid_foreign_key',
-                                'confidence': 0.8,
-                                'value': f"{fk_col}: {value}",
-                                'details': f"Negative foreign key value in {fk_col}"
-                            })
-                        elif value > 999999999:
-                            results.append({
-                                'row_index': idx,
-                                'issue_type': 'invalid_foreign_key',
-                                'confidence': 0.6,
-                                'value': f"{fk_col}: {value}",
-                                'details': f"Suspiciously large foreign key value in {fk_col}"
-                            })
-                    else:
-                        results.append({
-                            'row_index': idx,
-                            'issue_type': 'invalid_foreign_key',
-                            'confidence': 0.7,
-                            'value': f"{fk_col}: {value}",
-                            'details': f"Non-numeric foreign key value in {fk_col}"
-                        })
-    
-    return pd.DataFrame(results)
+
+    results = []
+    for fk_col in foreign_key_mappings:
+        if fk_col not in df.columns:
+            continue
+        view = ColumnView(df[fk_col])
+        numbers, values = view.is_number, view.numeric
+        labelled = lambda kept, view=view, col=fk_col: [f"{col}: {v}" for v in view.raw[kept]]
+        for mask, confidence, details in (
+            (numbers & (values < 0), 0.8, f"Negative foreign key value in {fk_col}"),
+            (numbers & (values > MAX_FOREIGN_KEY), 0.6, f"Suspiciously large foreign key value in {fk_col}"),
+            (~view.missing & ~numbers, 0.7, f"Non-numeric foreign key value in {fk_col}"),
+        ):
+            positions = np.flatnonzero(mask)
+            if len(positions):
+                results.append(emit_events(positions, df.index, 'invalid_foreign_key', fk_col, confidence,
+                                           max_examples, value=labelled, details=details))
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
 
 def detect_insertion_anomalies(df: pd.DataFrame, required_columns: List[str] = None, 
-                             foreign_key_mappings: Dict[str, str] = None) -> pd.DataFrame:
+                             foreign_key_mappings: Dict[str, str] = None,
+                             fingerprints: pd.Series = None,
+                             max_examples: int = DEFAULT_MAX_EXAMPLES, sql_engine=None,
+                             n_jobs: int = None) -> pd.DataFrame:
     all_results = []
     try:
-        duplicate_results = detect_duplicate_records(df)
+        if sql_engine is not None:
+            duplicate_results = sql_engine.duplicate_records(fingerprints)
+        else:
+            duplicate_results = detect_duplicate_records(df, fingerprints=fingerprints)
         all_results.append(duplicate_results)
-        print(f"✓ Duplicate records detected: {len(duplicate_results)}")
+        print(f"✓ Duplicate groups detected: {len(duplicate_results)}")
     except Exception as e:
         print(f"✗ Duplicate detection failed: {e}")
     try:
-        missing_results = detect_missing_required_fields(df, required_columns)
+        if sql_engine is not None:
+            missing_results = sql_engine.missing_required_fields(required_columns, max_examples)
+        else:
+            missing_results = detect_missing_required_fields(df, required_columns, max_examples, n_jobs)
         all_results.append(missing_results)
-        print(f"✓ Missing required fields detected: {len(missing_results)}")
+        print(f"✓ Missing required fields detected: {event_total(missing_results)}")
     except Exception as e:
         print(f"✗ Missing field detection failed: {e}")
     try:
-        fk_results = detect_invalid_foreign_keys(df, foreign_key_mappings)
+        if sql_engine is not None:
+            fk_results = sql_engine.invalid_foreign_keys(foreign_key_mappings, max_examples)
+        else:
+            fk_results = detect_invalid_foreign_keys(df, foreign_key_mappings, max_examples)
         all_results.append(fk_results)
-        print(f"✓ Invalid foreign keys detected: {len(fk_results)}")
+        print(f"✓ Invalid foreign keys detected: {event_total(fk_results)}")
     except Exception as e:
         print(f"✗ Foreign key validation failed: {e}")
     if all_results:
         combined_results = pd.concat(all_results, ignore_index=True)
-        return combined_results
+        return cap_events(combined_results, max_examples)
     else:
         return pd.DataFrame() 
\ No newline at end of file
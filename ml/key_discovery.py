@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+# Value-based join-key discovery: every key-like column keeps a bottom-k (KMV) sketch, the k smallest
+# hashes of its distinct values. Two sketches estimate how much of one column is contained in the other
+# without the value sets, so candidate key/foreign-key pairs across all tables come from one hash join.
+
+SKETCH_SIZE = 256
+MIN_DISTINCT = 5
+KEY_MIN_UNIQUENESS = 0.95
+MIN_CONTAINMENT = 0.5
+# Long text values are notes and descriptions, not keys
+MAX_KEY_LENGTH = 64
+_NO_THRESHOLD = np.iinfo(np.uint64).max
+
+def _hashed_values(series: pd.Series):
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+        return None
+    values = series.dropna()
+    if pd.api.types.is_float_dtype(values):
+        # Fractional columns are measurements, not keys
+        if len(values) and (values % 1 != 0).any():
+            return None
+        values = values.astype(np.int64)
+    try:
+        uniques = pd.unique(values)
+    except TypeError:
+        # Lists and dicts from nested JSON cannot be keys
+        return None
+    if pd.api.types.is_integer_dtype(uniques.dtype):
+        return pd.util.hash_array(uniques.astype(np.int64))
+    text = pd.Series(uniques).astype(str).str.strip()
+    if len(text) and text.str.len().mean() > MAX_KEY_LENGTH:
+        return None
+    # Integer-looking text hashes like the integers, so "5" in one file joins 5 in another
+    numbers = pd.to_numeric(text, errors='coerce')
+    if len(numbers) and numbers.notna().all() and (numbers % 1 == 0).all():
+        return pd.util.hash_array(numbers.to_numpy(dtype=np.int64))
+    return pd.util.hash_array(text.to_numpy(dtype=object))
+
+def sketch_column(series: pd.Series, k: int = SKETCH_SIZE):
+    """Bottom-k sketch of the distinct normalized values of a column, or None when it cannot be a key."""
+    hashes = _hashed_values(series)
+    if hashes is None:
+        return None
+    hashes = np.unique(hashes)
+    return {
+        'hashes': hashes[:k],
+        # Hashes up to this threshold are all in the sketch; exact sketches have none
+        'threshold': hashes[k - 1] if len(hashes) >= k else _NO_THRESHOLD,
+        'distinct': int(len(hashes)),
+        'non_null': int(series.notna().sum()),
+    }
+
+def _count_at_most(built: Dict, owners: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+    # Sketch entries of each owner that are <= its threshold: one merge of the owners' entries, ordered by
+    # (owner, hash), with the queries sorted in after the equal hashes
+    entries = np.flatnonzero(np.isin(built['owner_ids'], owners))
+    entry_owners = built['owner_ids'][entries]
+    n_entries = len(entries)
+    order = np.lexsort((
+        np.concatenate([np.zeros(n_entries, dtype=np.int8), np.ones(len(owners), dtype=np.int8)]),
+        np.concatenate([built['hashes'][entries], thresholds]),
+        np.concatenate([entry_owners, owners]),
+    ))
+    query_positions = np.flatnonzero(order >= n_entries)
+    queries = order[query_positions] - n_entries
+    offsets = np.searchsorted(entry_owners, owners[queries], side='left')
+    counts = np.empty(len(owners), dtype=np.int64)
+    counts[queries] = query_positions - np.arange(len(queries)) - offsets
+    return counts
+
+class KeySketchIndex:
+    def __init__(self, k: int = SKETCH_SIZE, min_containment: float = MIN_CONTAINMENT):
+        self.k = k
+        self.min_containment = min_containment
+        self.tables = {}
+        self._built = None
+
+    def add_table(self, table_name: str, df: pd.DataFrame, version: str = None):
+        columns = {}
+        for col in df.columns:
+            sketch = sketch_column(df[col], self.k)
+            if sketch is not None:
+                columns[col] = sketch
+        self.tables[table_name] = {'version': version, 'columns': columns}
+        self._built = None
+
+    def remove_table(self, table_name: str):
+        if self.tables.pop(table_name, None) is not None:
+            self._built = None
+
+    def clear(self):
+        self.tables.clear()
+        self._built = None
+
+    def _build(self):
+        owners = [(table, col, sketch) for table, entry in self.tables.items()
+                  for col, sketch in entry['columns'].items()]
+        distinct = np.array([s['distinct'] for _, _, s in owners], dtype=np.int64)
+        non_null = np.array([s['non_null'] for _, _, s in owners], dtype=np.int64)
+        uniqueness = np.divide(distinct, non_null, out=np.zeros(len(owners)), where=non_null > 0)
+        sizes = np.array([len(s['hashes']) for _, _, s in owners], dtype=np.int64)
+        hashes = np.concatenate([s['hashes'] for _, _, s in owners]) if owners else np.empty(0, dtype=np.uint64)
+        owner_ids = np.repeat(np.arange(len(owners)), sizes)
+        is_key = (uniqueness >= KEY_MIN_UNIQUENESS) & (distinct >= MIN_DISTINCT)
+        key_entries = np.flatnonzero(is_key[owner_ids])
+        key_order = key_entries[np.argsort(hashes[key_entries], kind='stable')]
+        names = list(self.tables)
+        self._built = {
+            'names': names,
+            'table_codes': np.array([names.index(t) for t, _, _ in owners], dtype=np.int64),
+            'tables': np.array([t for t, _, _ in owners], dtype=object),
+            'columns': np.array([c for _, c, _ in owners], dtype=object),
+            'thresholds': np.array([s['threshold'] for _, _, s in owners], dtype=np.uint64),
+            'distinct': distinct,
+            'uniqueness': uniqueness,
+            'sizes': sizes,
+            'hashes': hashes,
+            'owner_ids': owner_ids,
+            'eligible': distinct >= MIN_DISTINCT,
+            'key_hashes': hashes[key_order],
+            'key_owners': owner_ids[key_order],
+        }
+        return self._built
+
+    def candidates(self, tables: List[str] = None, min_containment: float = None) -> pd.DataFrame:
+        """Rank (foreign key, key) column pairs by estimated containment of the foreign values in the key."""
+        columns = ['foreign_table', 'foreign_column', 'key_table', 'key_column', 'containment', 'coverage',
+                   'foreign_distinct', 'key_distinct', 'key_uniqueness', 'score']
+        min_containment = self.min_containment if min_containment is None else min_containment
+        built = self._built or self._build()
+        selected = built['eligible'].copy()
+        key_hashes, key_owners = built['key_hashes'], built['key_owners']
+        if tables is not None:
+            selected &= np.isin(built['table_codes'], [built['names'].index(t) for t in tables if t in built['names']])
+            on_selected = selected[key_owners]
+            key_hashes, key_owners = key_hashes[on_selected], key_owners[on_selected]
+        queries = np.flatnonzero(selected[built['owner_ids']])
+        if not len(queries) or not len(key_hashes):
+            return pd.DataFrame(columns=columns)
+
+        # Hash join of every sketch entry against the key columns' entries
+        query_hashes = built['hashes'][queries]
+        lo = np.searchsorted(key_hashes, query_hashes, side='left')
+        hi = np.searchsorted(key_hashes, query_hashes, side='right')
+        counts = hi - lo
+        foreign = np.repeat(built['owner_ids'][queries], counts)
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        key = key_owners[starts + np.arange(int(counts.sum()))]
+        keep = foreign != key
+        n_owners = len(built['sizes'])
+        pairs, shared = np.unique(foreign[keep] * n_owners + key[keep], return_counts=True)
+        foreign, key = pairs // n_owners, pairs % n_owners
+
+        # Shared hashes are below both thresholds; the foreign sample is cut at the key's threshold
+        # so membership in the key sketch is decided exactly for every sampled hash
+        sampled = built['sizes'][foreign].copy()
+        cut = np.flatnonzero(built['thresholds'][key] < built['thresholds'][foreign])
+        sampled[cut] = _count_at_most(built, foreign[cut], built['thresholds'][key[cut]])
+        containment = shared / np.maximum(sampled, 1)
+        found = containment >= min_containment
+        foreign, key, containment = foreign[found], key[found], containment[found]
+        containment = np.minimum(containment, 1.0)
+        # Share of the key's values the foreign column uses: surrogate ids 1..n are contained in every
+        # longer id range, but a real foreign key covers most of the key it references
+        coverage = np.minimum(containment * built['distinct'][foreign] / built['distinct'][key], 1.0)
+        uniqueness = np.minimum(built['uniqueness'][key], 1.0)
+        result = pd.DataFrame({
+            'foreign_table': built['tables'][foreign],
+            'foreign_column': built['columns'][foreign],
+            'key_table': built['tables'][key],
+            'key_column': built['columns'][key],
+            'containment': np.round(containment, 4),
+            'coverage': np.round(coverage, 4),
+            'foreign_distinct': built['distinct'][foreign],
+            'key_distinct': built['distinct'][key],
+            'key_uniqueness': np.round(uniqueness, 4),
+            'score': np.round(containment * uniqueness * (0.5 + 0.5 * coverage), 4),
+        }, columns=columns)
+        return result.sort_values(['score', 'foreign_distinct'], ascending=False, kind='stable').reset_index(drop=True)
+
+    def best_pair(self, primary: str, related: str) -> Dict:
+        """Best key pair linking two tables in either direction, as primary/related column names."""
+        found = self.candidates([primary, related])
+        found = found[found['foreign_table'] != found['key_table']]
+        if found.empty:
+            return None
+        best = found.iloc[0].to_dict()
+        on_primary = best['key_table'] == primary
+        return dict(best,
+                    primary_column=best['key_column'] if on_primary else best['foreign_column'],
+                    related_column=best['foreign_column'] if on_primary else best['key_column'])
+
+    def self_reference(self, table_name: str, key_column: str = 'id') -> str:
+        """Column of a table whose values are contained in its own `key_column`, if any."""
+        found = self.candidates([table_name])
+        found = found[(found['foreign_table'] == table_name) & (found['key_table'] == table_name)
+                      & (found['key_column'] == key_column)]
+        return None if found.empty else found.iloc[0]['foreign_column']
@@ -1,14 +1,11 @@
 import pandas as pd
 import numpy as np
-import lightgbm as lgb
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
 import warnings
-warnings.filterwarnings('ignore')
 
-np.random.seed(42)
+# lightgbm and scikit-learn are imported inside the functions so they only load when this detector runs
 
 def prepare_data_for_lightgbm(df: pd.DataFrame):
+    from sklearn.preprocessing import LabelEncoder
     df_processed = df.copy()
 
     for col in df_processed.columns:
@@ -26,6 +23,8 @@ def prepare_data_for_lightgbm(df: pd.DataFrame):
     return df_processed, label_encoders
 
 def train_lightgbm_anomaly_detector(df: pd.DataFrame, contamination=0.1):
+    import lightgbm as lgb
+    from sklearn.model_selection import train_test_split
     df_processed, label_encoders = prepare_data_for_lightgbm(df)
 
     n_samples = len(df_processed)
@@ -56,7 +55,9 @@ def train_lightgbm_anomaly_detector(df: pd.DataFrame, contamination=0.1):
     }
     
     train_data = lgb.Dataset(X_train, label=y_train)
-    model = lgb.train(params, train_data, num_boost_round=100)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model = lgb.train(params, train_data, num_boost_round=100)
     
     return model, label_encoders
 
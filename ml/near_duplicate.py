@@ -0,0 +1,219 @@
+import pandas as pd
+import numpy as np
+
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+
+def _normalize_column(series: pd.Series) -> pd.Series:
+    values = series
+    if pd.api.types.is_float_dtype(values):
+        non_null = values.dropna()
+        if len(non_null) and (non_null % 1 == 0).all():
+            values = values.astype('Int64')
+    text = values.astype(str).str.lower().str.strip().str.replace(r'\s+', ' ', regex=True)
+    return text.where(series.notna(), '')
+
+def normalize_row_text(df: pd.DataFrame) -> pd.Series:
+    if df.empty or len(df.columns) == 0:
+        return pd.Series('', index=df.index, dtype=object)
+    columns = sorted(df.columns)
+    text = _normalize_column(df[columns[0]])
+    for col in columns[1:]:
+        text = text + ' | ' + _normalize_column(df[col])
+    return text
+
+def _permutations(num_perm: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+    return a, b
+
+def compute_minhash_signatures(text: pd.Series, num_perm: int = 128, chunk_tokens: int = 65536) -> np.ndarray:
+    n = len(text)
+    signatures = np.full((n, num_perm), _MAX_HASH, dtype=np.uint32)
+    if n == 0:
+        return signatures
+
+    a, b = _permutations(num_perm)
+    # Shingles are the set of normalized cell values in the row
+    tokens = text.str.split(' | ', regex=False).map(lambda cells: [c for c in cells if c])
+    lengths = tokens.str.len().fillna(0).to_numpy(dtype=np.int64)
+    flat = tokens.explode().dropna().to_numpy(dtype=object)
+    if len(flat) == 0:
+        return signatures
+    token_hashes = pd.util.hash_array(flat)
+    row_ids = np.repeat(np.arange(n), lengths)
+
+    # Multiply-shift hashing per permutation, reduced to the per-row minimum in chunks of whole rows. The
+    # hashed block is tokens x num_perm uint64, so chunks are bounded by token count rather than row count.
+    rows_with_tokens = np.flatnonzero(lengths > 0)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    row_ends = offsets[rows_with_tokens + 1]
+    start = 0
+    while start < len(rows_with_tokens):
+        lo = offsets[rows_with_tokens[start]]
+        end = max(int(np.searchsorted(row_ends, lo + chunk_tokens, side='right')), start + 1)
+        chunk_rows = rows_with_tokens[start:end]
+        hi = offsets[chunk_rows[-1] + 1]
+        hashed = ((token_hashes[lo:hi, None] * a[None, :] + b[None, :]) >> np.uint64(32)).astype(np.uint32)
+        starts = offsets[chunk_rows] - lo
+        signatures[row_ids[lo:hi][starts]] = np.minimum.reduceat(hashed, starts, axis=0)
+        start = end
+    return signatures
+
+def compute_band_hashes(signatures: np.ndarray, bands: int) -> np.ndarray:
+    rows_per_band = signatures.shape[1] // bands
+    multipliers = _permutations(rows_per_band, seed=7)[0]
+    band_hashes = np.empty((signatures.shape[0], bands), dtype=np.uint64)
+    for band in range(bands):
+        block = signatures[:, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64)
+        band_hashes[:, band] = (block * multipliers).sum(axis=1, dtype=np.uint64) + np.uint64(band)
+    return band_hashes
+
+def _bucket_keys(sorted_hashes: np.ndarray, sorted_codes: np.ndarray, n_tables: int) -> np.ndarray:
+    # (bucket rank, table code) as one sortable integer; ties in the stable sort are already in table order
+    rank = np.cumsum(np.r_[False, sorted_hashes[1:] != sorted_hashes[:-1]])
+    return rank * n_tables + sorted_codes
+
+def _expand_ranges(lo: np.ndarray, hi: np.ndarray):
+    counts = hi - lo
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    owners = np.repeat(np.arange(len(lo)), counts)
+    positions = np.repeat(lo, counts) + (np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts))
+    return owners, positions
+
+def _bucket_members(sorted_hashes: np.ndarray, keys: np.ndarray, n_tables: int, probes: np.ndarray,
+                    exclude: int, cap: int):
+    """(probe, position) of up to `cap` rows per probe's bucket, leaving out the rows of table `exclude`."""
+    lo = np.searchsorted(sorted_hashes, probes, side='left')
+    hi = np.searchsorted(sorted_hashes, probes, side='right')
+    if exclude < 0 or len(keys) == 0:
+        return _expand_ranges(lo, np.minimum(hi, lo + cap))
+    # The excluded table's rows are one run inside each bucket, so they are skipped before the cap applies
+    found = lo < hi
+    target = keys[np.minimum(lo, len(keys) - 1)] // n_tables * n_tables + exclude
+    skip_lo = np.where(found, np.searchsorted(keys, target, side='left'), lo)
+    skip_hi = np.where(found, np.searchsorted(keys, target, side='right'), lo)
+    before = np.minimum(skip_lo, lo + cap)
+    q_before, p_before = _expand_ranges(lo, before)
+    q_after, p_after = _expand_ranges(skip_hi, np.minimum(hi, skip_hi + cap - (before - lo)))
+    return np.concatenate([q_before, q_after]), np.concatenate([p_before, p_after])
+
+class NearDuplicateIndex:
+    def __init__(self, num_perm: int = 128, bands: int = 32, threshold: float = 0.6, max_bucket_size: int = 1000):
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        self.max_bucket_size = max_bucket_size
+        self.tables = {}
+        self._built = None
+
+    def add_table(self, table_name: str, df: pd.DataFrame):
+        text = normalize_row_text(df)
+        signatures = compute_minhash_signatures(text, self.num_perm)
+        non_empty = df.notna().any(axis=1).to_numpy()
+        self.tables[table_name] = {
+            'row_index': df.index.to_numpy()[non_empty],
+            'signatures': signatures[non_empty],
+            'band_hashes': compute_band_hashes(signatures[non_empty], self.bands),
+            'text_hashes': pd.util.hash_array(text.to_numpy(dtype=object))[non_empty],
+        }
+        self._built = None
+
+    def restore_table(self, table_name: str, entry: dict):
+        self.tables[table_name] = entry
+        self._built = None
+
+    def remove_table(self, table_name: str):
+        if self.tables.pop(table_name, None) is not None:
+            self._built = None
+
+    def clear(self):
+        self.tables.clear()
+        self._built = None
+
+    def _build(self):
+        names = list(self.tables)
+        entries = [self.tables[name] for name in names]
+        if not entries:
+            self._built = {'names': names, 'table_codes': np.empty(0, dtype=np.int64)}
+            return self._built
+        table_codes = np.concatenate([np.full(len(e['row_index']), i) for i, e in enumerate(entries)])
+        band_hashes = np.concatenate([e['band_hashes'] for e in entries])
+        text_hashes = np.concatenate([e['text_hashes'] for e in entries])
+        band_order = np.argsort(band_hashes, axis=0, kind='stable')
+        text_order = np.argsort(text_hashes, kind='stable')
+        band_sorted = np.take_along_axis(band_hashes, band_order, axis=0)
+        self._built = {
+            'names': names,
+            'table_codes': table_codes,
+            'row_index': np.concatenate([e['row_index'] for e in entries]),
+            'signatures': np.concatenate([e['signatures'] for e in entries]),
+            'band_order': band_order,
+            'band_sorted': band_sorted,
+            'band_keys': np.stack([_bucket_keys(band_sorted[:, band], table_codes[band_order[:, band]], len(names))
+                                   for band in range(band_sorted.shape[1])], axis=1),
+            'text_order': text_order,
+            'text_sorted': text_hashes[text_order],
+            'text_keys': _bucket_keys(text_hashes[text_order], table_codes[text_order], len(names)),
+        }
+        return self._built
+
+    def query_table(self, table_name: str) -> pd.DataFrame:
+        columns = ['row_index', 'issue_type', 'anomaly_score', 'value', 'details', 'matched_table', 'matched_row']
+        query = self.tables.get(table_name)
+        built = self._built or self._build()
+        if query is None or len(query['row_index']) == 0 or len(built['table_codes']) == 0:
+            return pd.DataFrame(columns=columns)
+        exclude = built['names'].index(table_name) if table_name in built['names'] else -1
+
+        n_tables = len(built['names'])
+
+        # Exact matches on normalized row text
+        q_exact, pos = _bucket_members(built['text_sorted'], built['text_keys'], n_tables, query['text_hashes'],
+                                       exclude, self.max_bucket_size)
+        exact = pd.DataFrame({'query': q_exact, 'owner': built['text_order'][pos], 'similarity': 1.0})
+
+        # LSH candidates: rows of other tables sharing at least one band bucket
+        q_parts, owner_parts = [], []
+        for band in range(self.bands):
+            # Very common buckets carry little signal; cap them to keep candidate sets bounded
+            q_band, pos = _bucket_members(built['band_sorted'][:, band], built['band_keys'][:, band], n_tables,
+                                          query['band_hashes'][:, band], exclude, self.max_bucket_size)
+            q_parts.append(q_band)
+            owner_parts.append(built['band_order'][pos, band])
+        candidates = pd.DataFrame({'query': np.concatenate(q_parts), 'owner': np.concatenate(owner_parts)})
+        candidates = candidates.drop_duplicates()
+        similarity = np.empty(len(candidates))
+        q_idx, o_idx = candidates['query'].to_numpy(), candidates['owner'].to_numpy()
+        for start in range(0, len(candidates), 100000):
+            chunk = slice(start, start + 100000)
+            same = query['signatures'][q_idx[chunk]] == built['signatures'][o_idx[chunk]]
+            similarity[chunk] = same.mean(axis=1)
+        candidates['similarity'] = similarity
+        candidates = candidates[candidates['similarity'] >= self.threshold]
+
+        matches = pd.concat([exact, candidates], ignore_index=True)
+        if matches.empty:
+            return pd.DataFrame(columns=columns)
+        matches = matches.sort_values(['query', 'similarity'], ascending=[True, False], kind='stable')
+        matches = matches.drop_duplicates('query', keep='first')
+
+        owners = matches['owner'].to_numpy()
+        exact_match = matches['similarity'].to_numpy() >= 1.0
+        exact_match &= np.isin(matches.index.to_numpy(), exact.index.to_numpy())
+        matched_tables = np.array(built['names'], dtype=object)[built['table_codes'][owners]]
+        matched_rows = built['row_index'][owners]
+        return pd.DataFrame({
+            'row_index': query['row_index'][matches['query'].to_numpy()],
+            'issue_type': np.where(exact_match, 'cross_file_exact_duplicate', 'cross_file_near_duplicate'),
+            'anomaly_score': matches['similarity'].to_numpy(),
+            'value': [f"{t} row {r}" for t, r in zip(matched_tables, matched_rows)],
+            'details': [
+                f"{'Exact' if e else 'Near'} duplicate of row {r} in table '{t}' (similarity {s:.2f})"
+                for e, t, r, s in zip(exact_match, matched_tables, matched_rows, matches['similarity'])
+            ],
+            'matched_table': matched_tables,
+            'matched_row': matched_rows,
+        })
@@ -1,35 +1,26 @@
 import pandas as pd
-from scipy import stats
-
-def detect_numeric_anomalies(df: pd.DataFrame, z_thresh=3):
-    results = []
-
-    for col in df.select_dtypes(include=['number']).columns:
-        series = df[col].dropna()
-        if len(series) < 10:
-            continue
-
-        series = pd.to_numeric(series, errors='coerce').dropna()
-
-        if len(series) < 10:
-            continue
-
-        z_scores = stats.zscore(series)
-        z_anomalies = series[(abs(z_scores) > z_thresh)]
-
-        q1 = series.quantile(0.25)
-        q3 = series.quantile(0.75)
-        iqr = q3 - q1
-        iqr_anomalies = series[(series < q1 - 1.5 * iqr) | (series > q3 + 1.5 * iqr)]
-
-        anomaly_indices = set(z_anomalies.index).union(iqr_anomalies.index)
-
-        for idx in anomaly_indices:
-            results.append({
-                'column': col,
-                'row_index': idx,
-                'value': df.loc[idx, col],
-                'issue_type': 'numeric_outlier'
-            })
-    
-    return pd.DataFrame(results)
+from ml.parallel import map_columns
+
+def _numeric_column_anomalies(col, column: pd.Series, z_thresh) -> pd.DataFrame:
+    from scipy import stats
+    series = pd.to_numeric(column.dropna(), errors='coerce').dropna()
+    if len(series) < 10:
+        return None
+
+    z_scores = stats.zscore(series)
+    q1 = series.quantile(0.25)
+    q3 = series.quantile(0.75)
+    iqr = q3 - q1
+    anomalies = series[(abs(z_scores) > z_thresh) | (series < q1 - 1.5 * iqr) | (series > q3 + 1.5 * iqr)]
+    return pd.DataFrame({
+        'column': col,
+        'row_index': anomalies.index,
+        'value': anomalies.to_numpy(),
+        'issue_type': 'numeric_outlier'
+    })
+
+def detect_numeric_anomalies(df: pd.DataFrame, z_thresh=3, n_jobs: int = None):
+    columns = df.select_dtypes(include=['number']).columns
+    results = [r for r in map_columns(lambda col, column: _numeric_column_anomalies(col, column, z_thresh),
+                                      df, columns, n_jobs) if r is not None and not r.empty]
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
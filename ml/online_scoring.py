@@ -0,0 +1,232 @@
+import numpy as np
+import pandas as pd
+from collections.abc import Hashable
+from typing import Dict, List
+from ml.column_routing import profile_columns, route_columns
+from ml.hbos_anomaly import fit_hbos, contribution_matrix, hbos_confidence, explain_hbos
+from ml.anomaly_scorer import SCORE_COLUMNS, SEVERITY_WEIGHTS
+from ml.rules import MAX_FOREIGN_KEY
+from ml.typo_resolver import TypoIndex
+
+# Reference profiles hold everything the batch detectors learn from a table, so single records can be
+# checked against it without re-running the detectors: numeric fences, category frequencies, type and
+# key rules, required columns and the fitted complex-pattern model
+
+EVENT_COLUMNS = SCORE_COLUMNS + ['details']
+REQUIRED_MAX_NULL_RATIO = 0.1
+
+def build_scoring_profile(df: pd.DataFrame, routing: Dict[str, List[str]] = None, contamination: float = 0.1,
+                          complex_detector: str = "hbos", z_thresh: float = 3, min_frq: float = 0.01) -> Dict:
+    """Learn the reference statistics of `df` with the same routing and thresholds as the batch detectors."""
+    column_profile = profile_columns(df)
+    routes = route_columns(column_profile, routing)
+
+    numeric = {}
+    for col in routes['numeric']:
+        series = pd.to_numeric(df[col], errors='coerce').dropna()
+        if len(series) < 10:
+            continue
+        q1, q3 = series.quantile(0.25), series.quantile(0.75)
+        iqr = q3 - q1
+        numeric[col] = {'mean': float(series.mean()), 'std': float(series.std(ddof=0)),
+                        'low': float(q1 - 1.5 * iqr), 'high': float(q3 + 1.5 * iqr)}
+
+    categorical, typos = {}, {}
+    for col in df[routes['categorical']].select_dtypes(include=['object', 'category']).columns:
+        counts = df[col].dropna().value_counts()
+        categorical[col] = (counts / max(counts.sum(), 1)).to_dict()
+        typos[col] = TypoIndex(counts)
+
+    null_ratio = column_profile['null_ratio']
+    profile = {
+        'columns': df.columns.tolist(),
+        'kinds': column_profile['kind'].to_dict(),
+        'routing': routes,
+        'numeric': numeric,
+        'z_thresh': z_thresh,
+        'categorical': categorical,
+        'typos': typos,
+        'min_frq': min_frq,
+        'required': null_ratio.index[null_ratio < REQUIRED_MAX_NULL_RATIO].tolist(),
+        'numeric_keys': [c for c in routes['keys'] if column_profile.loc[c, 'kind'] == 'numeric'],
+        'complex_detector': complex_detector,
+        'reference_rows': len(df),
+    }
+
+    features = routes['lightgbm']
+    if features:
+        reference = df[features]
+        if complex_detector == 'lightgbm':
+            from ml.lightgbm_anomaly import train_lightgbm_anomaly_detector
+            model, label_encoders = train_lightgbm_anomaly_detector(reference, contamination)
+            profile['model'] = model
+            profile['label_encoders'] = label_encoders
+            # Code lookups of the fitted encoders; categories never seen in the reference map to -1
+            profile['codes'] = {col: {value: code for code, value in enumerate(encoder.classes_)}
+                                for col, encoder in label_encoders.items()}
+        else:
+            profile['model'] = fit_hbos(reference, contamination)
+    return profile
+
+def _flatten(record: Dict, prefix: str = "") -> Dict:
+    # Same layout as the JSON upload path: nested objects become "_"-joined columns
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}_"))
+        elif isinstance(value, str) and value.lower() == 'null':
+            flat[name] = None
+        else:
+            flat[name] = value
+    return flat
+
+def align_records(records: List[Dict], profile: Dict, rename=None) -> Dict[str, np.ndarray]:
+    """Column arrays of the incoming records in the reference layout; unknown fields are dropped, absent ones are null."""
+    rows = [_flatten(record) for record in records]
+    if rename is not None:
+        # Records of a batch share their field names, so each one is renamed once
+        names = {key: rename(key) for key in {key for row in rows for key in row}}
+        rows = [{names[key]: value for key, value in row.items()} for row in rows]
+    return {col: np.array([row.get(col) for row in rows], dtype=object) for col in profile['columns']}
+
+def _events(positions: np.ndarray, method: str, issue_type: str, column, confidence, value, details) -> Dict:
+    n = len(positions)
+
+    def fill(field):
+        return field if np.ndim(field) else np.full(n, field, dtype=object)
+
+    return {
+        'row_index': positions,
+        'method': fill(method),
+        'issue_type': fill(issue_type),
+        'column': fill(column),
+        'confidence': np.asarray(confidence, dtype=float) if np.ndim(confidence) else np.full(n, confidence, dtype=float),
+        'value': fill(value),
+        'details': fill(details),
+    }
+
+def _lookup(mapping: Dict, values: np.ndarray, default) -> np.ndarray:
+    return np.array([mapping.get(v, default) if isinstance(v, Hashable) else default for v in values])
+
+def _complex_events(profile: Dict, columns: Dict[str, np.ndarray], n_rows: int,
+                    numeric_values: Dict[str, np.ndarray]) -> List[Dict]:
+    features = profile['routing']['lightgbm']
+    if 'model' not in profile or not features or not n_rows:
+        return []
+    model = profile['model']
+    if profile['complex_detector'] == 'lightgbm':
+        encoded = []
+        for col in features:
+            codes = profile['codes'].get(col)
+            raw = columns[col]
+            if codes is None:
+                values = numeric_values.get(col)
+                if values is None:
+                    values = np.asarray(pd.to_numeric(raw, errors='coerce'), dtype=float)
+                encoded.append(np.where(np.isnan(values), -999, values))
+            else:
+                encoded.append(_lookup(codes, np.where(pd.isna(raw), 'MISSING', raw).astype(str), -1))
+        predictions = model.predict(np.column_stack(encoded).astype(float))
+        flagged = np.flatnonzero(predictions > 0.5)
+        if not len(flagged):
+            return []
+        return [_events(flagged, 'lightgbm', 'complex_pattern_anomaly', None, predictions[flagged], 'N/A',
+                        'Complex pattern anomaly against the reference model')]
+
+    matrix = contribution_matrix(model, columns, n_rows)
+    scores = matrix.sum(axis=1)
+    flagged = np.flatnonzero(scores > model['threshold'])
+    if not len(flagged):
+        return []
+    return [_events(flagged, 'lightgbm', 'complex_pattern_anomaly', None, hbos_confidence(model, scores[flagged]),
+                    np.array(explain_hbos(model, matrix, flagged), dtype=object),
+                    'Complex pattern anomaly against the reference histograms')]
+
+def score_records(profile: Dict, columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Score aligned records against a reference profile; events use the batch detectors' issue types."""
+    n_rows = len(next(iter(columns.values()))) if columns else 0
+    events = []
+    missing = {col: pd.isna(values) for col, values in columns.items()}
+    numeric_values = {}
+
+    for col in profile['required']:
+        positions = np.flatnonzero(missing[col])
+        if len(positions):
+            events.append(_events(positions, 'insertion', 'missing_required_field', col, 0.9, f"NULL in {col}",
+                                  f"Required field '{col}' is missing"))
+
+    for col, kind in profile['kinds'].items():
+        if kind not in ('numeric', 'datetime'):
+            continue
+        present = ~missing[col]
+        if not present.any():
+            continue
+        if kind == 'numeric':
+            values = np.asarray(pd.to_numeric(columns[col], errors='coerce'), dtype=float)
+            numeric_values[col] = values
+            invalid = present & np.isnan(values)
+        else:
+            invalid = present & pd.isna(pd.to_datetime(columns[col], errors='coerce'))
+        positions = np.flatnonzero(invalid)
+        if len(positions):
+            raw = columns[col][positions]
+            events.append(_events(positions, 'update', 'data_type_violation', col, 0.9,
+                                  np.array([f"{col}: {v} (type: {type(v).__name__})" for v in raw], dtype=object),
+                                  np.array([f"Expected {kind} but got {type(v).__name__} in {col}" for v in raw],
+                                           dtype=object)))
+
+    z_thresh = profile['z_thresh']
+    for col, stats in profile['numeric'].items():
+        values = numeric_values.get(col)
+        if values is None:
+            continue
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z_scores = np.abs(values - stats['mean']) / stats['std'] if stats['std'] > 0 else np.zeros(len(values))
+        outlier = (z_scores > z_thresh) | (values < stats['low']) | (values > stats['high'])
+        positions = np.flatnonzero(outlier & ~np.isnan(values))
+        if len(positions):
+            events.append(_events(positions, 'numeric', 'numeric_outlier', col, 1.0, values[positions],
+                                  f"Outside the reference range [{stats['low']:.4g}, {stats['high']:.4g}] "
+                                  f"or beyond {z_thresh} standard deviations"))
+
+    min_frq = profile['min_frq']
+    for col, frequencies in profile['categorical'].items():
+        present = ~missing[col]
+        if not present.any():
+            continue
+        observed = _lookup(frequencies, columns[col], 0.0).astype(float)
+        positions = np.flatnonzero(present & (observed < min_frq))
+        if len(positions):
+            details = np.array([f"Seen in {f:.2%} of the reference rows" if f > 0
+                                else "Not seen in the reference" for f in observed[positions]], dtype=object)
+            typos = profile.get('typos', {}).get(col)
+            if typos is not None and len(typos):
+                suggestions = typos.lookup(columns[col][positions])
+                suggested = dict(zip(suggestions['value'], suggestions['suggested_value']))
+                details = np.array([f"{d}; likely a misspelling of {suggested[v]!r}" if v in suggested else d
+                                    for d, v in zip(details, columns[col][positions])], dtype=object)
+            events.append(_events(positions, 'categorical', 'rare_category', col, 1.0, columns[col][positions], details))
+
+    for col in profile['numeric_keys']:
+        values = numeric_values.get(col)
+        if values is None:
+            continue
+        for mask, confidence, message in (
+            (values < 0, 0.8, f"Negative foreign key value in {col}"),
+            (values > MAX_FOREIGN_KEY, 0.6, f"Suspiciously large foreign key value in {col}"),
+        ):
+            positions = np.flatnonzero(mask)
+            if len(positions):
+                events.append(_events(positions, 'insertion', 'invalid_foreign_key', col, confidence,
+                                      np.array([f"{col}: {v:g}" for v in values[positions]], dtype=object), message))
+
+    events.extend(_complex_events(profile, columns, n_rows, numeric_values))
+    if not events:
+        return pd.DataFrame(columns=EVENT_COLUMNS + ['method_weight', 'severity_score'])
+    # One frame for the whole batch; severity as in score_anomaly_severity
+    merged = {field: np.concatenate([block[field] for block in events]) for field in events[0]}
+    merged['weight'] = np.ones(len(merged['row_index']))
+    merged['method_weight'] = np.array([SEVERITY_WEIGHTS.get(t, 0.5) for t in merged['issue_type']])
+    merged['severity_score'] = merged['confidence'] * merged['method_weight']
+    return pd.DataFrame(merged, columns=EVENT_COLUMNS + ['method_weight', 'severity_score'])
@@ -0,0 +1,130 @@
+import io
+import sys
+import time
+import resource
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List
+
+WALL_TIME_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_metrics_lock = threading.Lock()
+_stage_metrics = {}
+
+def _max_rss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def _observe(stage: str, wall: float, cpu: float, rows: int):
+    with _metrics_lock:
+        metric = _stage_metrics.setdefault(stage, {
+            'count': 0, 'wall_sum': 0.0, 'cpu_sum': 0.0, 'rows_sum': 0,
+            'buckets': [0] * len(WALL_TIME_BUCKETS)
+        })
+        metric['count'] += 1
+        metric['wall_sum'] += wall
+        metric['cpu_sum'] += cpu
+        metric['rows_sum'] += rows or 0
+        for i, bound in enumerate(WALL_TIME_BUCKETS):
+            if wall <= bound:
+                metric['buckets'][i] += 1
+
+class StageProfiler:
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str, rows: int = None):
+        # Peak memory comes from tracemalloc when it is tracing. tracemalloc's peak is process-wide and reset at
+        # every stage, so those figures only hold while a single request runs at a time. Otherwise it is the
+        # growth of the process's max RSS, a high-water mark that never goes down: a stage that stays below an
+        # earlier peak, of this request or any other, reports 0.
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            start_traced = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start_rss = _max_rss_bytes()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.process_time() - start_cpu
+            if tracing:
+                peak_delta = max(0, tracemalloc.get_traced_memory()[1] - start_traced)
+            else:
+                end_rss = _max_rss_bytes()
+                peak_delta = max(0, end_rss - start_rss)
+            self.stages.append({
+                'stage': name,
+                'wall_seconds': round(wall, 6),
+                'cpu_seconds': round(cpu, 6),
+                'peak_memory_delta_bytes': peak_delta,
+                'memory_source': 'tracemalloc' if tracing else 'process_max_rss_growth',
+                'process_max_rss_bytes': None if tracing else end_rss,
+                'rows': rows,
+                'rows_per_sec': round(rows / wall, 2) if rows and wall > 0 else None
+            })
+            _observe(name, wall, cpu, rows)
+
+    def to_list(self) -> List[Dict]:
+        return list(self.stages)
+
+    def total_wall_seconds(self) -> float:
+        return round(sum(s['wall_seconds'] for s in self.stages), 6)
+
+def profile_stage(profiler: StageProfiler, name: str, rows: int = None):
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name, rows)
+
+def profile_call(kind: str, func, *args, **kwargs):
+    if kind == 'cprofile':
+        import cProfile
+        import pstats
+        profile = cProfile.Profile()
+        result = profile.runcall(func, *args, **kwargs)
+        stream = io.StringIO()
+        pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(40)
+        return result, stream.getvalue()
+    if kind == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ValueError("pyinstrument is not installed; use profile=cprofile instead")
+        profiler = Profiler()
+        profiler.start()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profiler.stop()
+        return result, profiler.output_text(unicode=True, color=False)
+    raise ValueError(f"Unknown profiler: {kind}")
+
+def render_prometheus_metrics() -> str:
+    with _metrics_lock:
+        snapshot = {stage: dict(metric, buckets=list(metric['buckets'])) for stage, metric in _stage_metrics.items()}
+    lines = [
+        '# HELP dqc_stage_wall_seconds Wall time spent per analysis stage.',
+        '# TYPE dqc_stage_wall_seconds histogram',
+    ]
+    for stage, metric in sorted(snapshot.items()):
+        for bound, count in zip(WALL_TIME_BUCKETS, metric['buckets']):
+            lines.append(f'dqc_stage_wall_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+        lines.append(f'dqc_stage_wall_seconds_bucket{{stage="{stage}",le="+Inf"}} {metric["count"]}')
+        lines.append(f'dqc_stage_wall_seconds_sum{{stage="{stage}"}} {metric["wall_sum"]:.6f}')
+        lines.append(f'dqc_stage_wall_seconds_count{{stage="{stage}"}} {metric["count"]}')
+    lines += ['# HELP dqc_stage_cpu_seconds_total CPU time spent per analysis stage.',
+              '# TYPE dqc_stage_cpu_seconds_total counter']
+    for stage, metric in sorted(snapshot.items()):
+        lines.append(f'dqc_stage_cpu_seconds_total{{stage="{stage}"}} {metric["cpu_sum"]:.6f}')
+    lines += ['# HELP dqc_stage_rows_total Rows processed per analysis stage.',
+              '# TYPE dqc_stage_rows_total counter']
+    for stage, metric in sorted(snapshot.items()):
+        lines.append(f'dqc_stage_rows_total{{stage="{stage}"}} {metric["rows_sum"]}')
+    lines += ['# HELP dqc_process_max_rss_bytes Peak resident set size of this process.',
+              '# TYPE dqc_process_max_rss_bytes gauge',
+              f'dqc_process_max_rss_bytes {_max_rss_bytes()}']
+    return '\n'.join(lines) + '\n'
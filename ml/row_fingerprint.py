@@ -0,0 +1,74 @@
+import pandas as pd
+import numpy as np
+from typing import List
+
+def hashable_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """The frame with object columns holding unhashable cells (lists, dicts from nested JSON) replaced by their text."""
+    unhashable = []
+    for col in df.columns[(df.dtypes == object).to_numpy()]:
+        try:
+            pd.util.hash_array(df[col].to_numpy(dtype=object))
+        except TypeError:
+            unhashable.append(col)
+    if not unhashable:
+        return df
+    df = df.copy(deep=False)
+    for col in unhashable:
+        df[col] = df[col].map(repr).where(df[col].notna(), None)
+    return df
+
+def compute_row_fingerprints(df: pd.DataFrame, subset: List[str] = None) -> pd.Series:
+    if subset is None:
+        subset = df.columns.tolist()
+    if df.empty or not subset:
+        return pd.Series(np.zeros(len(df), dtype=np.uint64), index=df.index)
+    # Per-column vectorized hashes combined into one 64-bit fingerprint per row
+    try:
+        return pd.util.hash_pandas_object(df[subset], index=False)
+    except TypeError:
+        return pd.util.hash_pandas_object(hashable_frame(df[subset]), index=False)
+
+def _split_collisions(rows: pd.DataFrame) -> List[np.ndarray]:
+    groups = []
+    rows = hashable_frame(rows)
+    for members in rows.groupby(rows.columns.tolist(), dropna=False, sort=False).indices.values():
+        if len(members) > 1:
+            groups.append(rows.index.to_numpy()[members])
+    return groups
+
+def find_duplicate_groups(df: pd.DataFrame, subset: List[str] = None,
+                          fingerprints: pd.Series = None) -> List[np.ndarray]:
+    if subset is None:
+        subset = df.columns.tolist()
+    if fingerprints is None:
+        fingerprints = compute_row_fingerprints(df, subset)
+    if len(fingerprints) == 0:
+        return []
+
+    dup_mask = fingerprints.duplicated(keep=False).to_numpy()
+    if not dup_mask.any():
+        return []
+
+    candidates = fingerprints[dup_mask]
+    candidates = candidates.iloc[np.argsort(candidates.to_numpy(), kind='stable')]
+    fp = candidates.to_numpy()
+    indices = candidates.index.to_numpy()
+    boundaries = np.r_[True, fp[1:] != fp[:-1]]
+    starts = np.flatnonzero(boundaries)
+    group_ids = np.cumsum(boundaries) - 1
+
+    # Exact confirmation: every member must equal the first row sharing its fingerprint
+    left = df.loc[indices, subset].to_numpy(dtype=object)
+    right = df.loc[indices[starts][group_ids], subset].to_numpy(dtype=object)
+    same = (left == right) | (pd.isna(left) & pd.isna(right))
+    collided = np.zeros(len(starts), dtype=bool)
+    collided[group_ids[~same.all(axis=1)]] = True
+
+    groups = []
+    for gid, members in enumerate(np.split(indices, starts[1:])):
+        if collided[gid]:
+            groups.extend(_split_collisions(df.loc[members, subset]))
+        else:
+            groups.append(members)
+    groups.sort(key=lambda members: members[0])
+    return groups
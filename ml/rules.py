@@ -0,0 +1,254 @@
+import json
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+from ml.emission import DEFAULT_MAX_EXAMPLES, emit_events, cap_events
+from ml.update_anomaly import detect_inconsistent_updates, detect_partial_updates
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# A rule spec names the configuration the relational detectors otherwise infer with heuristics:
+#   required_columns: [id, amount]
+#   foreign_key_mappings: {customer_id: customers}
+#   parent_child_mappings: {customer_id: customers}
+#   constraint_mappings: {amount: {min_value: 0, max_value: 10000}}
+#   critical_columns: [id]
+#   key_columns: [id]
+#   related_column_groups: [[addr_city, addr_zip]]
+#   expected_types: {amount: numeric, created: datetime}
+# Checks of a kind the spec leaves out are not run.
+
+COLUMN_LIST_RULES = ['required_columns', 'critical_columns', 'key_columns']
+MAPPING_RULES = ['foreign_key_mappings', 'parent_child_mappings']
+RULE_KEYS = COLUMN_LIST_RULES + MAPPING_RULES + ['constraint_mappings', 'related_column_groups', 'expected_types']
+EXPECTED_TYPES = ['numeric', 'datetime', 'string']
+CONSTRAINT_KEYS = {'type', 'min_value', 'max_value'}
+
+MAX_FOREIGN_KEY = 999999999
+ORPHAN_MIN_VALUE = 1000
+DELETION_RUN_LENGTH = 5
+DELETION_EXAMPLES = 10
+STRING_MAX_LENGTH = 1000
+
+# pandas 2 infers one format from the first value; "mixed" parses each value on its own like pd.to_datetime(value)
+DATETIME_PER_VALUE = {'format': 'mixed'} if int(pd.__version__.split('.')[0]) >= 2 else {}
+
+# Per-column checks in the order they are evaluated, and the ensemble method their events belong to
+CHECK_METHODS = {
+    'required': 'insertion',
+    'foreign_key': 'insertion',
+    'orphan': 'deletion',
+    'range': 'deletion',
+    'critical': 'deletion',
+    'type': 'update',
+}
+
+def _column_list(value, key: str) -> List[str]:
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(c, str) for c in value):
+        raise ValueError(f"Rule '{key}' must be a list of column names")
+    return value
+
+def parse_rule_spec(spec) -> Dict:
+    """Parse and validate a rule spec given as a dict, JSON text or YAML text."""
+    if isinstance(spec, (str, bytes)):
+        try:
+            spec = json.loads(spec)
+        except json.JSONDecodeError as e:
+            if yaml is None:
+                raise ValueError(f"Invalid JSON for rules: {e}; install pyyaml to pass YAML rules")
+            try:
+                spec = yaml.safe_load(spec)
+            except yaml.YAMLError as yaml_error:
+                raise ValueError(f"Invalid rules: {yaml_error}")
+    if not isinstance(spec, dict):
+        raise ValueError("Rules must be a JSON/YAML object")
+    unknown = set(spec) - set(RULE_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown rules: {', '.join(sorted(map(str, unknown)))}; expected any of {', '.join(RULE_KEYS)}")
+
+    rules = {}
+    for key in COLUMN_LIST_RULES:
+        if key in spec:
+            rules[key] = _column_list(spec[key], key)
+    for key in MAPPING_RULES:
+        if key in spec:
+            value = spec[key]
+            # A bare list of columns references tables named like the columns, as the heuristics assume
+            rules[key] = {c: c for c in _column_list(value, key)} if isinstance(value, (list, str)) else value
+            if not isinstance(rules[key], dict):
+                raise ValueError(f"Rule '{key}' must map columns to referenced tables")
+            rules[key] = {str(c): str(t) for c, t in rules[key].items()}
+    if 'constraint_mappings' in spec:
+        constraints = spec['constraint_mappings']
+        if not isinstance(constraints, dict) or not all(isinstance(c, dict) for c in constraints.values()):
+            raise ValueError("Rule 'constraint_mappings' must map columns to {min_value, max_value}")
+        for col, constraint in constraints.items():
+            extra = set(constraint) - CONSTRAINT_KEYS
+            if extra:
+                raise ValueError(f"Unknown constraint keys for {col}: {', '.join(sorted(extra))}")
+            for bound in ('min_value', 'max_value'):
+                if bound in constraint and not isinstance(constraint[bound], (int, float)):
+                    raise ValueError(f"Constraint {bound} for {col} must be a number")
+        rules['constraint_mappings'] = {str(c): dict(v) for c, v in constraints.items()}
+    if 'related_column_groups' in spec:
+        groups = spec['related_column_groups']
+        if not isinstance(groups, list):
+            raise ValueError("Rule 'related_column_groups' must be a list of column lists")
+        rules['related_column_groups'] = [_column_list(group, 'related_column_groups') for group in groups]
+    if 'expected_types' in spec:
+        types = spec['expected_types']
+        if not isinstance(types, dict):
+            raise ValueError("Rule 'expected_types' must map columns to a type")
+        invalid = {c: t for c, t in types.items() if t not in EXPECTED_TYPES}
+        if invalid:
+            raise ValueError(f"Unsupported expected types {invalid}; expected one of {', '.join(EXPECTED_TYPES)}")
+        rules['expected_types'] = {str(c): t for c, t in types.items()}
+    return rules
+
+def compile_rule_plan(rules: Dict, columns: List[str]) -> Dict:
+    """Group every rule by the column it reads, so each column is scanned once for all of its checks."""
+    referenced = set(rules.get('required_columns', [])) | set(rules.get('critical_columns', [])) \
+        | set(rules.get('key_columns', [])) | set(rules.get('foreign_key_mappings', {})) \
+        | set(rules.get('parent_child_mappings', {})) | set(rules.get('constraint_mappings', {})) \
+        | set(rules.get('expected_types', {})) | {c for group in rules.get('related_column_groups', []) for c in group}
+    missing = sorted(referenced - set(columns))
+    if missing:
+        raise ValueError(f"Unknown columns in rules: {', '.join(missing)}")
+
+    checks = {}
+    for col in rules.get('required_columns', []):
+        checks.setdefault(col, []).append(('required', None))
+    for col in rules.get('foreign_key_mappings', {}):
+        checks.setdefault(col, []).append(('foreign_key', None))
+    for col in rules.get('parent_child_mappings', {}):
+        checks.setdefault(col, []).append(('orphan', None))
+    for col, constraint in rules.get('constraint_mappings', {}).items():
+        checks.setdefault(col, []).append(('range', constraint))
+    for col in rules.get('critical_columns', []):
+        checks.setdefault(col, []).append(('critical', None))
+    for col, expected_type in rules.get('expected_types', {}).items():
+        checks.setdefault(col, []).append(('type', expected_type))
+    order = list(CHECK_METHODS)
+    return {
+        'columns': {col: sorted(col_checks, key=lambda check: order.index(check[0]))
+                    for col, col_checks in checks.items()},
+        'key_columns': rules.get('key_columns', []),
+        'related_column_groups': rules.get('related_column_groups', []),
+        'check_count': sum(len(c) for c in checks.values()) + len(rules.get('key_columns', []))
+        + len(rules.get('related_column_groups', [])),
+    }
+
+class ColumnView:
+    """One column's values plus the intermediates its checks share, each computed at most once."""
+
+    def __init__(self, series: pd.Series):
+        self.raw = series.to_numpy()
+        self.missing = series.isna().to_numpy()
+        self.is_numeric_dtype = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+        self._numeric = None
+        self._is_number = None
+
+    @property
+    def numeric(self) -> np.ndarray:
+        if self._numeric is None:
+            self._numeric = np.asarray(pd.to_numeric(self.raw, errors='coerce'), dtype=float)
+        return self._numeric
+
+    @property
+    def is_number(self) -> np.ndarray:
+        # Numeric dtypes hold numbers only; object columns are checked per value like the heuristics do
+        if self._is_number is None:
+            if self.is_numeric_dtype:
+                self._is_number = ~self.missing
+            else:
+                self._is_number = np.array([isinstance(v, (int, float, np.number, np.bool_)) for v in self.raw],
+                                           dtype=bool) & ~self.missing
+        return self._is_number
+
+def _labelled(view: ColumnView, col: str):
+    return lambda kept: [f"{col}: {v}" for v in view.raw[kept]]
+
+def _evaluate_column(col: str, view: ColumnView, checks: List, index: pd.Index, max_examples: int) -> List:
+    events = []
+
+    def emit(check, positions, issue_type, confidence, value, details):
+        if len(positions):
+            events.append((CHECK_METHODS[check], emit_events(positions, index, issue_type, col, confidence,
+                                                             max_examples, value=value, details=details)))
+
+    for check, params in checks:
+        if check == 'required':
+            emit(check, np.flatnonzero(view.missing), 'missing_required_field', 0.9, f"NULL in {col}",
+                 f"Required field '{col}' is missing")
+        elif check == 'foreign_key':
+            numbers, values = view.is_number, view.numeric
+            emit(check, np.flatnonzero(numbers & (values < 0)), 'invalid_foreign_key', 0.8, _labelled(view, col),
+                 f"Negative foreign key value in {col}")
+            emit(check, np.flatnonzero(numbers & (values > MAX_FOREIGN_KEY)), 'invalid_foreign_key', 0.6,
+                 _labelled(view, col), f"Suspiciously large foreign key value in {col}")
+            emit(check, np.flatnonzero(~view.missing & ~numbers), 'invalid_foreign_key', 0.7, _labelled(view, col),
+                 f"Non-numeric foreign key value in {col}")
+        elif check == 'orphan':
+            values = np.where(view.is_number, view.numeric, np.nan)
+            unique_values = ~pd.Series(values).duplicated(keep=False).to_numpy()
+            positions = np.flatnonzero(view.is_number & unique_values & (values > ORPHAN_MIN_VALUE))
+            emit(check, positions, 'potential_orphaned_record', 0.6, _labelled(view, col),
+                 lambda kept: [f"Potential orphaned record - {col} value {v} appears only once" for v in view.raw[kept]])
+        elif check == 'range':
+            values = view.numeric
+            if 'min_value' in params:
+                minimum = params['min_value']
+                emit(check, np.flatnonzero(values < minimum), 'referential_integrity_violation', 0.9,
+                     _labelled(view, col),
+                     lambda kept, minimum=minimum: [f"Value {v} below minimum {minimum} for {col}" for v in view.raw[kept]])
+            if 'max_value' in params:
+                maximum = params['max_value']
+                emit(check, np.flatnonzero(values > maximum), 'referential_integrity_violation', 0.8,
+                     _labelled(view, col),
+                     lambda kept, maximum=maximum: [f"Value {v} above maximum {maximum} for {col}" for v in view.raw[kept]])
+        elif check == 'critical':
+            nulls = np.flatnonzero(view.missing)
+            if len(nulls) > DELETION_RUN_LENGTH:
+                # Longest run of consecutive nulls, from the gaps between null positions
+                breaks = np.flatnonzero(np.diff(nulls) != 1)
+                run_lengths = np.diff(np.concatenate([[0], breaks + 1, [len(nulls)]]))
+                if run_lengths.max() > DELETION_RUN_LENGTH:
+                    emit(check, nulls[:DELETION_EXAMPLES], 'potential_accidental_deletion', 0.7, f"NULL in {col}",
+                         f"Potential accidental deletion detected in {col}")
+        elif check == 'type':
+            present = ~view.missing
+            if params == 'numeric':
+                invalid = present & np.isnan(view.numeric)
+            elif params == 'datetime':
+                invalid = present & pd.isna(pd.to_datetime(view.raw, errors='coerce', **DATETIME_PER_VALUE))
+            else:
+                invalid = np.zeros(len(view.raw), dtype=bool)
+                if not view.is_numeric_dtype:
+                    numbers = np.flatnonzero(view.is_number)
+                    invalid[numbers] = [len(str(v)) > STRING_MAX_LENGTH for v in view.raw[numbers]]
+            emit(check, np.flatnonzero(invalid), 'data_type_violation', 0.9,
+                 lambda kept: [f"{col}: {v} (type: {type(v).__name__})" for v in view.raw[kept]],
+                 lambda kept, expected=params: [f"Expected {expected} but got {type(v).__name__} in {col}"
+                                                for v in view.raw[kept]])
+    return events
+
+def evaluate_rule_plan(plan: Dict, df: pd.DataFrame, max_examples: int = DEFAULT_MAX_EXAMPLES) -> Dict[str, pd.DataFrame]:
+    """Run a compiled plan and return its events grouped by ensemble method."""
+    grouped = {'insertion': [], 'deletion': [], 'update': []}
+    for col, checks in plan['columns'].items():
+        for method, events in _evaluate_column(col, ColumnView(df[col]), checks, df.index, max_examples):
+            grouped[method].append(events)
+    if plan['key_columns']:
+        grouped['update'].append(detect_inconsistent_updates(df, plan['key_columns'], max_examples))
+    if plan['related_column_groups']:
+        grouped['update'].append(detect_partial_updates(df, plan['related_column_groups'], max_examples))
+    return {
+        method: cap_events(pd.concat([e for e in events if not e.empty], ignore_index=True), max_examples)
+        if any(not e.empty for e in events) else pd.DataFrame()
+        for method, events in grouped.items()
+    }
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+
+MAX_STRATA = 50
+STRATA_PROBE_ROWS = 10000
+# Issue types whose detectors compare rows with each other, so their rate in a sample is biased and not just
+# noisier; the confidence intervals only cover sampling variance
+SAMPLE_BIASED_ISSUE_TYPES = ('duplicate_record', 'inconsistent_update', 'rare_category', 'potential_orphaned_record',
+                             'potential_accidental_deletion')
+
+def choose_strata_column(df: pd.DataFrame, max_strata: int = MAX_STRATA) -> str:
+    probe = df.head(STRATA_PROBE_ROWS)
+    for col in probe.select_dtypes(include=['object', 'category', 'bool']).columns:
+        try:
+            n_strata = probe[col].nunique(dropna=False)
+        except TypeError:
+            # Lists and dicts from nested JSON cannot label strata
+            continue
+        if 1 < n_strata <= max_strata:
+            return col
+    return None
+
+def sample_positions(df: pd.DataFrame, sample_size: int, strata_column: str = None,
+                     seed: int = 42) -> Tuple[np.ndarray, np.ndarray, Dict[int, int]]:
+    """Return sampled row positions, the stratum of each sampled row and the population size of every stratum."""
+    rng = np.random.default_rng(seed)
+    n_rows = len(df)
+    codes = pd.factorize(df[strata_column], use_na_sentinel=False)[0] if strata_column is not None else None
+    # Every stratum needs a row, so more strata than sample rows falls back to a simple random sample
+    if codes is None or sample_size >= n_rows or codes.max() + 1 > sample_size:
+        positions = np.arange(n_rows) if sample_size >= n_rows else np.sort(rng.choice(n_rows, sample_size, replace=False))
+        return positions, np.zeros(len(positions), dtype=np.int64), {0: n_rows}
+
+    population_sizes = np.bincount(codes)
+    # Proportional allocation, keeping at least one row from every stratum
+    quotas = population_sizes / n_rows * sample_size
+    allocation = np.maximum(1, np.floor(quotas).astype(np.int64))
+    allocation = np.minimum(allocation, population_sizes)
+    # Flooring leaves rows unassigned; they go to the strata with the largest fractional remainders
+    shortfall = sample_size - int(allocation.sum())
+    if shortfall > 0:
+        allocation[np.argsort(allocation - quotas, kind='stable')[:shortfall]] += 1
+    # The one-row minimum can push the total past sample_size; the excess comes off the largest strata
+    for _ in range(int(allocation.sum()) - sample_size):
+        allocation[np.argmax(allocation)] -= 1
+    order = np.argsort(codes, kind='stable')
+    bounds = np.concatenate([[0], np.cumsum(population_sizes)])
+    picked = []
+    for stratum, take in enumerate(allocation):
+        members = order[bounds[stratum]:bounds[stratum + 1]]
+        picked.append(rng.choice(members, take, replace=False))
+    positions = np.sort(np.concatenate(picked))
+    return positions, codes[positions], dict(enumerate(population_sizes.tolist()))
+
+def _stratified_mean(values: np.ndarray, strata: np.ndarray, population_sizes: Dict[int, int]) -> Tuple[float, float]:
+    total = sum(population_sizes.values())
+    mean, variance = 0.0, 0.0
+    for stratum, size in population_sizes.items():
+        sample = values[strata == stratum]
+        if len(sample) == 0:
+            continue
+        share = size / total
+        mean += share * sample.mean()
+        if len(sample) > 1:
+            fpc = 1 - len(sample) / size
+            variance += share ** 2 * fpc * sample.var(ddof=1) / len(sample)
+    return mean, variance
+
+def _wilson_interval(p: float, n: float, z: float) -> Tuple[float, float]:
+    if n <= 0:
+        return 0.0, 1.0
+    denominator = 1 + z ** 2 / n
+    centre = (p + z ** 2 / (2 * n)) / denominator
+    margin = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+def extrapolate_quality_metrics(row_anomaly_index: pd.DataFrame, strata: np.ndarray, population_sizes: Dict[int, int],
+                                quality_score_mode: str = "events", confidence: float = 0.95,
+                                issue_types=()) -> Dict:
+    """Estimate population anomaly rates from a sample's per-row anomaly index.
+
+    `issue_types` are those found in the sample; the biased ones among them are listed in the result.
+    """
+    from scipy import stats
+    z = stats.norm.ppf(0.5 + confidence / 2)
+    sample_size = len(strata)
+    event_counts = np.zeros(sample_size)
+    if len(row_anomaly_index):
+        positions = row_anomaly_index.index.to_numpy(dtype=np.int64)
+        counts = row_anomaly_index['event_weight'] if 'event_weight' in row_anomaly_index else row_anomaly_index['event_count']
+        event_counts[positions] = counts.to_numpy(dtype=float)
+    flagged = (event_counts > 0).astype(float)
+
+    events_mean, events_var = _stratified_mean(event_counts, strata, population_sizes)
+    events_margin = z * np.sqrt(events_var)
+    events_ci = (max(0.0, events_mean - events_margin) * 100, (events_mean + events_margin) * 100)
+
+    row_rate, row_var = _stratified_mean(flagged, strata, population_sizes)
+    # Wilson interval on the effective sample size so rare anomalies do not produce negative bounds
+    effective_n = row_rate * (1 - row_rate) / row_var if row_var > 0 else sample_size
+    row_low, row_high = _wilson_interval(row_rate, effective_n, z)
+
+    def score_ci(low, high):
+        return [round(max(0, 100 - high), 2), round(max(0, 100 - low), 2)]
+
+    row_percentage = row_rate * 100
+    row_ci = (row_low * 100, row_high * 100)
+    headline, headline_ci = (row_percentage, row_ci) if quality_score_mode == "rows" else (events_mean * 100, events_ci)
+    return {
+        'estimated': True,
+        'confidence_level': confidence,
+        'sample_size': sample_size,
+        'population_rows': int(sum(population_sizes.values())),
+        'strata': len(population_sizes),
+        'quality_score_mode': quality_score_mode,
+        'anomaly_percentage': round(headline, 2),
+        'anomaly_percentage_ci': [round(headline_ci[0], 2), round(headline_ci[1], 2)],
+        'quality_score': round(max(0, 100 - headline), 2),
+        'quality_score_ci': score_ci(*headline_ci),
+        'row_anomaly_percentage': round(row_percentage, 2),
+        'row_anomaly_percentage_ci': [round(row_ci[0], 2), round(row_ci[1], 2)],
+        'row_quality_score': round(max(0, 100 - row_percentage), 2),
+        'row_quality_score_ci': score_ci(*row_ci),
+        # Found in the sample but biased by sampling, so the true rate may lie outside the intervals
+        'biased_issue_types': sorted(set(issue_types) & set(SAMPLE_BIASED_ISSUE_TYPES)),
+    }
@@ -0,0 +1,323 @@
+import importlib.util
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from ml.emission import DEFAULT_MAX_EXAMPLES, FLAGGED_ROWS, emit_events
+from ml.row_fingerprint import compute_row_fingerprints
+from ml.rules import MAX_FOREIGN_KEY, ORPHAN_MIN_VALUE
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+SQL_ENGINES = ['auto', 'pandas', 'duckdb']
+# Below this size the pandas detectors finish before DuckDB has even registered the frame
+SQL_ENGINE_MIN_ROWS = 100000
+FRAME_TABLE = 'frame'
+ROW_COLUMN = '__dqc_row'
+
+def _duckdb_available() -> bool:
+    # DuckDB is only imported once an engine is opened, keeping it out of the API's startup
+    return pa is not None and importlib.util.find_spec('duckdb') is not None
+
+def choose_sql_engine(rows: int, requested: str = "auto") -> str:
+    if requested not in SQL_ENGINES:
+        raise ValueError(f"sql_engine must be one of {', '.join(SQL_ENGINES)}")
+    if requested == "duckdb" and not _duckdb_available():
+        raise ValueError("duckdb and pyarrow are required for sql_engine=duckdb; use sql_engine=pandas")
+    if requested in ("pandas", "duckdb"):
+        return requested
+    return "duckdb" if rows >= SQL_ENGINE_MIN_ROWS and _duckdb_available() else "pandas"
+
+def _quote(name) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _default_key_columns(df: pd.DataFrame) -> List[str]:
+    return [col for col in df.columns if col.endswith('_id') or col.endswith('Id')]
+
+class DuckDBEngine:
+    """Set-based versions of the SQL-mode checks, run by an embedded DuckDB over Arrow-registered frames.
+
+    Each check returns the same event schema as its pandas counterpart in the insertion, deletion and
+    update detectors; the hidden row column maps query results back to frame positions.
+    """
+
+    def __init__(self, threads: int = None):
+        if not _duckdb_available():
+            raise ValueError("duckdb and pyarrow are required for the DuckDB engine")
+        import duckdb
+        self.conn = duckdb.connect()
+        if threads:
+            self.conn.execute(f"SET threads = {int(threads)}")
+        self.frames = {}
+        self.schemas = {}
+
+    def register(self, name: str, df: pd.DataFrame):
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"DuckDB cannot scan table '{name}': {e}")
+        table = table.append_column(ROW_COLUMN, pa.array(np.arange(len(df), dtype=np.int64)))
+        self.conn.register(name, table)
+        self.frames[name] = df
+        self.schemas[name] = table.schema
+
+    def close(self):
+        self.conn.close()
+
+    def _fetch(self, sql: str) -> Dict[str, np.ndarray]:
+        return self.conn.execute(sql).fetchnumpy()
+
+    def _is_numeric(self, table: str, col: str) -> bool:
+        kind = self.schemas[table].field(col).type
+        return pa.types.is_integer(kind) or pa.types.is_floating(kind) or pa.types.is_decimal(kind)
+
+    def _is_boolean(self, table: str, col: str) -> bool:
+        return pa.types.is_boolean(self.schemas[table].field(col).type)
+
+    def _duplicate_positions(self, table: str, columns: List[str]) -> List[np.ndarray]:
+        partition = ', '.join(_quote(c) for c in columns)
+        found = self._fetch(
+            f"SELECT {ROW_COLUMN} AS pos, min({ROW_COLUMN}) OVER w AS first FROM {_quote(table)} "
+            f"WINDOW w AS (PARTITION BY {partition}) QUALIFY count(*) OVER w > 1 ORDER BY first, pos"
+        )
+        positions, first = found['pos'], found['first']
+        if len(positions) == 0:
+            return []
+        starts = np.flatnonzero(np.r_[True, first[1:] != first[:-1]])
+        return np.split(positions, starts[1:])
+
+    def duplicate_records(self, fingerprints: pd.Series = None, table: str = FRAME_TABLE) -> pd.DataFrame:
+        df = self.frames[table]
+        subset = df.columns.tolist()
+        if not subset:
+            return pd.DataFrame()
+        groups = self._duplicate_positions(table, subset)
+        if not groups:
+            return pd.DataFrame()
+        firsts = np.array([members[0] for members in groups])
+        if fingerprints is None:
+            first_fingerprints = compute_row_fingerprints(df.iloc[firsts]).to_numpy()
+        else:
+            first_fingerprints = fingerprints.iloc[firsts].to_numpy()
+        columns_text = ', '.join(subset)
+        return pd.DataFrame([{
+            'row_index': df.index[members[0]],
+            'issue_type': 'duplicate_record',
+            'confidence': 1.0,
+            'value': 'Duplicate data',
+            'details': f"{len(members)} identical rows in columns: {columns_text}",
+            'duplicate_rows': df.index[members].tolist(),
+            'group_size': len(members),
+            'fingerprint': format(int(fingerprint), '016x'),
+            'weight': len(members),
+            FLAGGED_ROWS: df.index[members].to_numpy()
+        } for members, fingerprint in zip(groups, first_fingerprints)])
+
+    def missing_required_fields(self, required_columns: List[str] = None, max_examples: int = DEFAULT_MAX_EXAMPLES,
+                                table: str = FRAME_TABLE) -> pd.DataFrame:
+        df = self.frames[table]
+        if required_columns is None:
+            counts = self.conn.execute(
+                f"SELECT count(*), {', '.join(f'count({_quote(c)})' for c in df.columns)} FROM {_quote(table)}"
+            ).fetchone() if len(df.columns) else (0,)
+            rows = counts[0]
+            required_columns = [c for c, n in zip(df.columns, counts[1:]) if rows and 1 - n / rows < 0.1]
+        required_columns = [c for c in required_columns if c in df.columns]
+        if not required_columns:
+            return pd.DataFrame()
+
+        # One scan flags the nulls of every required column
+        flags = ', '.join(f"{_quote(c)} IS NULL AS f{i}" for i, c in enumerate(required_columns))
+        condition = ' OR '.join(f"{_quote(c)} IS NULL" for c in required_columns)
+        found = self._fetch(f"SELECT {ROW_COLUMN} AS pos, {flags} FROM {_quote(table)} WHERE {condition} ORDER BY pos")
+        results = []
+        for i, col in enumerate(required_columns):
+            positions = found['pos'][found[f'f{i}'].astype(bool)]
+            if len(positions):
+                results.append(emit_events(positions, df.index, 'missing_required_field', col, 0.9, max_examples,
+                                           value=f"NULL in {col}", details=f"Required field '{col}' is missing"))
+        return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+    def _labelled(self, df: pd.DataFrame, col: str, describe=None):
+        # Per-row strings are only formatted for the kept examples
+        raw = df[col].to_numpy()
+        if describe is None:
+            return lambda kept: [f"{col}: {v}" for v in raw[kept]]
+        return lambda kept: [describe(v) for v in raw[kept]]
+
+    def invalid_foreign_keys(self, foreign_key_mappings: Dict[str, str] = None,
+                             max_examples: int = DEFAULT_MAX_EXAMPLES, table: str = FRAME_TABLE) -> pd.DataFrame:
+        df = self.frames[table]
+        if foreign_key_mappings is None:
+            foreign_key_mappings = {fk: fk for fk in _default_key_columns(df)}
+        results = []
+        for fk_col in foreign_key_mappings:
+            if fk_col not in df.columns or self._is_boolean(table, fk_col):
+                continue
+            col = _quote(fk_col)
+            if self._is_numeric(table, fk_col):
+                found = self._fetch(f"SELECT {ROW_COLUMN} AS pos, {col} < 0 AS negative FROM {_quote(table)} "
+                                    f"WHERE {col} < 0 OR {col} > {MAX_FOREIGN_KEY} ORDER BY pos")
+                negative = found['negative'].astype(bool)
+                checks = (
+                    (found['pos'][negative], 0.8, f"Negative foreign key value in {fk_col}"),
+                    (found['pos'][~negative], 0.6, f"Suspiciously large foreign key value in {fk_col}"),
+                )
+            else:
+                found = self._fetch(f"SELECT {ROW_COLUMN} AS pos FROM {_quote(table)} WHERE {col} IS NOT NULL ORDER BY pos")
+                checks = ((found['pos'], 0.7, f"Non-numeric foreign key value in {fk_col}"),)
+            for positions, confidence, details in checks:
+                if len(positions):
+                    results.append(emit_events(positions, df.index, 'invalid_foreign_key', fk_col, confidence,
+                                               max_examples, value=self._labelled(df, fk_col), details=details))
+        return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+    def orphaned_records(self, parent_child_mappings: Dict[str, str] = None, max_examples: int = DEFAULT_MAX_EXAMPLES,
+                         table: str = FRAME_TABLE) -> pd.DataFrame:
+        df = self.frames[table]
+        if parent_child_mappings is None:
+            parent_child_mappings = {fk: fk for fk in _default_key_columns(df)}
+        results = []
+        for child_col in parent_child_mappings:
+            if child_col not in df.columns or not self._is_numeric(table, child_col):
+                continue
+            col = _quote(child_col)
+            found = self._fetch(f"SELECT min({ROW_COLUMN}) AS pos FROM {_quote(table)} "
+                                f"WHERE {col} > {ORPHAN_MIN_VALUE} GROUP BY {col} HAVING count(*) = 1 ORDER BY pos")
+            if len(found['pos']):
+                results.append(emit_events(
+                    found['pos'], df.index, 'potential_orphaned_record', child_col, 0.6, max_examples,
+                    value=self._labelled(df, child_col),
+                    details=self._labelled(df, child_col, lambda v, col=child_col:
+                                           f"Potential orphaned record - {col} value {v} appears only once")))
+        return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+    def referential_integrity_violations(self, constraint_mappings: Dict[str, Dict] = None,
+                                         max_examples: int = DEFAULT_MAX_EXAMPLES,
+                                         table: str = FRAME_TABLE) -> pd.DataFrame:
+        df = self.frames[table]
+        if constraint_mappings is None:
+            constraint_mappings = {col: {'type': 'foreign_key', 'min_value': 1, 'max_value': MAX_FOREIGN_KEY}
+                                   for col in _default_key_columns(df)}
+        results = []
+        for col_name, constraints in constraint_mappings.items():
+            # Range constraints only apply to numeric columns
+            if col_name not in df.columns or not self._is_numeric(table, col_name):
+                continue
+            col = _quote(col_name)
+            checks = []
+            if 'min_value' in constraints:
+                checks.append((f"{col} < {float(constraints['min_value'])!r}", 0.9, 'below minimum',
+                               constraints['min_value']))
+            if 'max_value' in constraints:
+                checks.append((f"{col} > {float(constraints['max_value'])!r}", 0.8, 'above maximum',
+                               constraints['max_value']))
+            if not checks:
+                continue
+            flags = ', '.join(f"{condition} AS f{i}" for i, (condition, _, _, _) in enumerate(checks))
+            found = self._fetch(f"SELECT {ROW_COLUMN} AS pos, {flags} FROM {_quote(table)} "
+                                f"WHERE {' OR '.join(c[0] for c in checks)} ORDER BY pos")
+            for i, (_, confidence, label, bound) in enumerate(checks):
+                positions = found['pos'][found[f'f{i}'].astype(bool)]
+                if len(positions):
+                    results.append(emit_events(
+                        positions, df.index, 'referential_integrity_violation', col_name, confidence, max_examples,
+                        value=self._labelled(df, col_name),
+                        details=self._labelled(df, col_name, lambda v, label=label, bound=bound, col=col_name:
+                                               f"Value {v} {label} {bound} for {col}")))
+        return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+    def inconsistent_updates(self, key_columns: List[str] = None, max_examples: int = DEFAULT_MAX_EXAMPLES,
+                             table: str = FRAME_TABLE) -> pd.DataFrame:
+        df = self.frames[table]
+        if key_columns is None:
+            distinct = self.conn.execute(
+                f"SELECT {', '.join(f'count(DISTINCT {_quote(c)})' for c in df.columns)} FROM {_quote(table)}"
+            ).fetchone() if len(df.columns) else ()
+            key_columns = [col for col, n in zip(df.columns, distinct)
+                           if col.endswith('_id') or col.endswith('Id') or col.endswith('_key')
+                           or (len(df) and n / len(df) > 0.9)][:3]
+        if not key_columns:
+            return pd.DataFrame()
+
+        results = []
+        for key_col in key_columns:
+            if key_col not in df.columns:
+                continue
+            others = [col for col in df.columns if col != key_col]
+            if not others:
+                continue
+            key = _quote(key_col)
+            conflicts = ', '.join(f"count(DISTINCT {_quote(c)}) > 1 AS f{i}" for i, c in enumerate(others))
+            flags = ', '.join(f"g.f{i}" for i in range(len(others)))
+            found = self._fetch(
+                f"WITH g AS (SELECT {key} AS k, {conflicts} FROM {_quote(table)} WHERE {key} IS NOT NULL "
+                f"GROUP BY {key} HAVING count(*) > 1) "
+                f"SELECT t.{ROW_COLUMN} AS pos, {flags} FROM {_quote(table)} t JOIN g ON t.{key} = g.k ORDER BY pos"
+            )
+            if len(found['pos']) == 0:
+                continue
+            keys = df[key_col].to_numpy()
+            for i, col in enumerate(others):
+                positions = found['pos'][found[f'f{i}']]
+                if len(positions) == 0:
+                    continue
+                values = df[col].to_numpy()
+                results.append(emit_events(
+                    positions, df.index, 'inconsistent_update', col, 0.8, max_examples,
+                    value=lambda kept, values=values, col=col, key_col=key_col: [
+                        f"{key_col}={k}, {col}={v}" for k, v in zip(keys[kept], values[kept])],
+                    details=f"Inconsistent {col} values for same {key_col}"
+                ))
+        return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+    def key_duplicate_groups(self, table: str, key: str) -> List[np.ndarray]:
+        index = self.frames[table].index
+        return [index[members].to_numpy() for members in self._duplicate_positions(table, [key])]
+
+    def _comparable(self, left: str, right: str, col: str) -> Tuple[str, str]:
+        if self.schemas[left].field(col).type == self.schemas[right].field(col).type:
+            return f"l.{_quote(col)}", f"r.{_quote(col)}"
+        return f"CAST(l.{_quote(col)} AS VARCHAR)", f"CAST(r.{_quote(col)} AS VARCHAR)"
+
+    def key_differences(self, left: str, right: str, key: str) -> Tuple[int, int]:
+        """Distinct key values of `right` missing from `left`, and of `left` missing from `right`."""
+        def missing(source, target):
+            return self.conn.execute(
+                f"SELECT count(*) FROM (SELECT CAST({_quote(key)} AS VARCHAR) FROM {_quote(source)} "
+                f"WHERE {_quote(key)} IS NOT NULL EXCEPT SELECT CAST({_quote(key)} AS VARCHAR) FROM {_quote(target)} "
+                f"WHERE {_quote(key)} IS NOT NULL)"
+            ).fetchone()[0]
+        return missing(right, left), missing(left, right)
+
+    def conflicting_value_counts(self, left: str, right: str, key: str, columns: List[str]) -> Dict[str, int]:
+        if not columns:
+            return {}
+        left_key, right_key = self._comparable(left, right, key)
+        counts = []
+        for col in columns:
+            l, r = self._comparable(left, right, col)
+            counts.append(f"count(*) FILTER (WHERE {l} IS NOT NULL AND {r} IS NOT NULL AND {l} <> {r})")
+        row = self.conn.execute(
+            f"SELECT {', '.join(counts)} FROM {_quote(left)} l JOIN {_quote(right)} r ON {left_key} = {right_key}"
+        ).fetchone()
+        return dict(zip(columns, row))
+
+def open_sql_engine(requested: str, frames: Dict[str, pd.DataFrame]) -> Optional[DuckDBEngine]:
+    """Return a DuckDB engine with `frames` registered, or None when the pandas checks should run."""
+    rows = max((len(frame) for frame in frames.values()), default=0)
+    if choose_sql_engine(rows, requested) == "pandas":
+        return None
+    engine = DuckDBEngine()
+    try:
+        for name, frame in frames.items():
+            engine.register(name, frame)
+    except ValueError:
+        engine.close()
+        # Mixed-type columns have no Arrow type; auto mode quietly keeps pandas for them
+        if requested == "duckdb":
+            raise
+        return None
+    return engine
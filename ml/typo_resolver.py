@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+
+# Rare categories that are misspellings of common ones ("Calfornia" -> "California"). The common values
+# of a column are indexed by their deletion neighbourhood: the hashes of each value with up to two
+# characters removed. A rare value within d edits of a common one (transpositions included) shares one
+# of these variants with it, so a lookup is a sorted join on a few hashes per value instead of a scan of
+# every common value, and only the candidates it returns are verified with an edit distance vectorized
+# across all pairs.
+
+MIN_TYPO_LENGTH = 4
+MAX_TYPO_LENGTH = 32
+MAX_EDIT_DISTANCE = 2
+# Values seen at least this often can be suggested, and only when they are this many times more
+# frequent than the rare value
+CANONICAL_MIN_COUNT = 3
+DOMINANCE = 5
+# Rare values resolved at once, which bounds the memory of the join and of the distance matrix
+BLOCK_SIZE = 8192
+SUGGESTION_COLUMNS = ['value', 'suggested_value', 'edit_distance']
+
+# Odd multipliers are invertible modulo 2**64, so a deleted character's shift can be undone in place
+_BASE = np.uint64(0x9E3779B97F4A7C15)
+_BASE_INVERSE = np.uint64(pow(0x9E3779B97F4A7C15, -1, 2 ** 64))
+_LENGTH_MIX = np.uint64(0xD6E8FEB86659FD93)
+
+def _normalize(values) -> pd.Series:
+    return pd.Series(values, dtype=object).astype(str).str.strip().str.casefold()
+
+def _max_distance(lengths: np.ndarray) -> np.ndarray:
+    # One edit for short words, two from six characters on
+    return np.where(lengths <= 5, 1, MAX_EDIT_DISTANCE)
+
+def _codepoints(texts: pd.Series, width: int) -> np.ndarray:
+    # One row of code points per string, zero-filled past its end
+    codes = np.zeros((len(texts), width), dtype=np.int64)
+    for i, text in enumerate(texts):
+        codes[i, :len(text)] = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    return codes
+
+def _deletion_variants(codes: np.ndarray, lengths: np.ndarray, budgets: np.ndarray):
+    """(owner, hash) of every string and of its variants with up to `budgets[owner]` characters removed."""
+    n, width = codes.shape
+    with np.errstate(over='ignore'):
+        powers = np.cumprod(np.r_[1, np.full(max(width - 1, 0), _BASE)].astype(np.uint64), dtype=np.uint64)
+        terms = (codes.astype(np.uint64) + np.uint64(1)) * powers
+        terms[np.arange(width)[None, :] >= lengths[:, None]] = 0
+        # prefix[:, k] hashes the first k characters; characters after a deletion move down one power
+        prefix = np.zeros((n, width + 1), dtype=np.uint64)
+        np.cumsum(terms, axis=1, dtype=np.uint64, out=prefix[:, 1:])
+        total = prefix[np.arange(n), lengths]
+
+        def mixed(hashes, variant_lengths):
+            return hashes ^ (variant_lengths.astype(np.uint64) * _LENGTH_MIX)
+
+        owners, hashes = [np.arange(n)], [mixed(total, lengths)]
+        one, two = np.flatnonzero(budgets >= 1), np.flatnonzero(budgets >= 2)
+        for i in range(width):
+            rows = one[lengths[one] > i]
+            owners.append(rows)
+            hashes.append(mixed(prefix[rows, i] + (total[rows] - prefix[rows, i + 1]) * _BASE_INVERSE,
+                                lengths[rows] - 1))
+            for j in range(i + 1, width):
+                rows = two[lengths[two] > j]
+                owners.append(rows)
+                hashes.append(mixed(prefix[rows, i] + (prefix[rows, j] - prefix[rows, i + 1]) * _BASE_INVERSE
+                                    + (total[rows] - prefix[rows, j + 1]) * (_BASE_INVERSE * _BASE_INVERSE),
+                                    lengths[rows] - 2))
+    return np.concatenate(owners), np.concatenate(hashes)
+
+def edit_distances(a: np.ndarray, a_lengths: np.ndarray, b: np.ndarray, b_lengths: np.ndarray) -> np.ndarray:
+    """Edit distances (adjacent transpositions count as one edit) of the code-point rows a[i] and b[i].
+
+    The DP advances one row at a time for all pairs at once.
+    """
+    n, width = len(a), b.shape[1]
+    columns = np.arange(width + 1)
+    before, previous = None, np.broadcast_to(columns, (n, width + 1)).copy()
+    distances = b_lengths.astype(np.int64).copy()
+    for i in range(1, int(a_lengths.max(initial=0)) + 1):
+        substitution = previous[:, :-1] + (a[:, i - 1:i] != b)
+        base = np.empty_like(previous)
+        base[:, 0] = i
+        base[:, 1:] = np.minimum(previous[:, 1:] + 1, substitution)
+        if before is not None and width > 1:
+            swapped = (a[:, i - 1:i] == b[:, :-1]) & (a[:, i - 2:i - 1] == b[:, 1:])
+            base[:, 2:] = np.where(swapped, np.minimum(base[:, 2:], before[:, :-2] + 1), base[:, 2:])
+        # Insertions chain along the row: cur[j] = min over k <= j of base[k] + (j - k)
+        current = np.minimum.accumulate(base - columns, axis=1) + columns
+        done = a_lengths == i
+        distances[done] = current[done, b_lengths[done]]
+        before, previous = previous, current
+    return distances
+
+class TypoIndex:
+    """Deletion-neighbourhood index over the values of one column that are common enough to be suggested."""
+
+    def __init__(self, value_counts: pd.Series, min_count: int = CANONICAL_MIN_COUNT):
+        counts = value_counts[value_counts >= min_count]
+        normalized = _normalize(counts.index)
+        lengths = normalized.str.len().to_numpy()
+        keep = (lengths >= MIN_TYPO_LENGTH - 1) & (lengths <= MAX_TYPO_LENGTH + MAX_EDIT_DISTANCE)
+        # Spellings that only differ in case or spacing collapse to their most frequent form
+        frame = pd.DataFrame({'key': normalized[keep].to_numpy(), 'value': counts.index[keep],
+                              'count': counts.to_numpy()[keep]})
+        frame = frame.sort_values('count', ascending=False, kind='stable').drop_duplicates('key')
+        self.values = frame['value'].to_numpy(dtype=object)
+        self.counts = frame['count'].to_numpy(dtype=np.int64)
+        self.lengths = frame['key'].str.len().to_numpy(dtype=np.int64)
+        self.width = int(self.lengths.max()) if len(self.lengths) else 0
+        self.codes = _codepoints(frame['key'], self.width)
+        # Deep enough for the largest budget of any value that can be within reach of each length
+        owners, hashes = _deletion_variants(self.codes, self.lengths,
+                                            _max_distance(self.lengths + MAX_EDIT_DISTANCE))
+        order = np.argsort(hashes, kind='stable')
+        self.variant_hashes, self.variant_owners = hashes[order], owners[order]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _lookup_block(self, codes: np.ndarray, lengths: np.ndarray, counts: np.ndarray,
+                      values: np.ndarray) -> pd.DataFrame:
+        budget = _max_distance(lengths)
+        owners, hashes = _deletion_variants(codes, lengths, budget)
+        # Sorted probes walk the index in order instead of jumping across it
+        order = np.argsort(hashes)
+        owners, hashes = owners[order], hashes[order]
+        lo = np.searchsorted(self.variant_hashes, hashes, side='left')
+        hi = np.searchsorted(self.variant_hashes, hashes, side='right')
+        sizes = hi - lo
+        query = np.repeat(owners, sizes)
+        candidate = self.variant_owners[np.repeat(lo - (np.cumsum(sizes) - sizes), sizes)
+                                        + np.arange(int(sizes.sum()))]
+
+        close = (np.abs(self.lengths[candidate] - lengths[query]) <= budget[query]) \
+            & (self.counts[candidate] >= DOMINANCE * counts[query]) \
+            & (self.values[candidate] != values[query])
+        pairs = np.unique(query[close] * len(self) + candidate[close])
+        query, candidate = pairs // len(self), pairs % len(self)
+
+        # A shared variant only bounds the distance by twice the budget, so every pair is verified
+        width = max(codes.shape[1], self.width)
+        a = np.zeros((len(pairs), width), dtype=np.int64)
+        b = np.zeros((len(pairs), width), dtype=np.int64)
+        a[:, :codes.shape[1]] = codes[query]
+        b[:, :self.width] = self.codes[candidate]
+        distance = edit_distances(a, lengths[query], b, self.lengths[candidate])
+        within = distance <= budget[query]
+        return pd.DataFrame({'query': query[within], 'candidate': candidate[within],
+                             'distance': distance[within], 'count': self.counts[candidate[within]]})
+
+    def lookup(self, values, counts=None) -> pd.DataFrame:
+        """Closest common value of each rare value within its edit budget, as value/suggested_value/edit_distance."""
+        values = pd.Series(values, dtype=object).drop_duplicates()
+        counts = np.ones(len(values), dtype=np.int64) if counts is None else \
+            pd.Series(counts).reindex(values.to_numpy()).fillna(1).to_numpy(dtype=np.int64)
+        keys = _normalize(values)
+        lengths = keys.str.len().to_numpy(dtype=np.int64)
+        queries = np.flatnonzero((lengths >= MIN_TYPO_LENGTH) & (lengths <= MAX_TYPO_LENGTH))
+        if not len(self) or not len(queries):
+            return pd.DataFrame(columns=SUGGESTION_COLUMNS)
+        keys, lengths, counts = keys.iloc[queries], lengths[queries], counts[queries]
+        values = values.to_numpy()[queries]
+
+        found = []
+        for start in range(0, len(queries), BLOCK_SIZE):
+            block = slice(start, start + BLOCK_SIZE)
+            codes = _codepoints(keys.iloc[block], int(lengths[block].max()))
+            result = self._lookup_block(codes, lengths[block], counts[block], values[block])
+            result['query'] += start
+            found.append(result)
+        found = pd.concat(found, ignore_index=True)
+        best = found.sort_values(['query', 'distance', 'count'], ascending=[True, True, False],
+                                 kind='stable').drop_duplicates('query')
+        return pd.DataFrame({
+            'value': values[best['query'].to_numpy()],
+            'suggested_value': self.values[best['candidate'].to_numpy()],
+            'edit_distance': best['distance'].to_numpy(dtype=np.int64),
+        }, columns=SUGGESTION_COLUMNS)
+
+def suggest_corrections(value_counts: pd.Series, rare_values) -> pd.DataFrame:
+    """Suggested common spelling and edit distance for each rare value of a column that has one."""
+    return TypoIndex(value_counts).lookup(rare_values, value_counts)
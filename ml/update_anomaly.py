@@ -1,8 +1,11 @@
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple
+from ml.emission import DEFAULT_MAX_EXAMPLES, emit_events, cap_events, event_total
+from ml.parallel import map_columns
 
-def detect_inconsistent_updates(df: pd.DataFrame, key_columns: List[str] = None) -> pd.DataFrame:
+def detect_inconsistent_updates(df: pd.DataFrame, key_columns: List[str] = None,
+                                max_examples: int = DEFAULT_MAX_EXAMPLES) -> pd.DataFrame:
     results = []
     if key_columns is None:
         potential_keys = []
@@ -20,25 +23,28 @@ def detect_inconsistent_updates(df: pd.DataFrame, key_columns: List[str] = None)
     for key_col in key_columns:
         if key_col in df.columns:
             grouped = df.groupby(key_col)
-            
-            for key_value, group in grouped:
-                if len(group) > 1:
-                    for col in df.columns:
-                        if col != key_col:
-                            unique_values = group[col].dropna().unique()
-                            if len(unique_values) > 1:
-                                for idx in group.index:
-                                    results.append({
-                                        'row_index': idx,
-                                        'issue_type': 'inconsistent_update',
-                                        'confidence': 0.8,
-                                        'value': f"{key_col}={key_value}, {col}={group.loc[idx, col]}",
-                                        'details': f"Inconsistent {col} values for same {key_col}"
-                                    })
+            shared_key = (grouped[key_col].transform('size') > 1).to_numpy()
+            if not shared_key.any():
+                continue
+            keys = df[key_col].to_numpy()
+            for col in df.columns:
+                if col == key_col:
+                    continue
+                conflicting = shared_key & (grouped[col].transform('nunique') > 1).to_numpy()
+                positions = np.flatnonzero(conflicting)
+                if len(positions) == 0:
+                    continue
+                values = df[col].to_numpy()
+                results.append(emit_events(
+                    positions, df.index, 'inconsistent_update', col, 0.8, max_examples,
+                    value=lambda kept, values=values: [f"{key_col}={k}, {col}={v}" for k, v in zip(keys[kept], values[kept])],
+                    details=f"Inconsistent {col} values for same {key_col}"
+                ))
     
-    return pd.DataFrame(results)
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
 
-def detect_partial_updates(df: pd.DataFrame, related_column_groups: List[List[str]] = None) -> pd.DataFrame:
+def detect_partial_updates(df: pd.DataFrame, related_column_groups: List[List[str]] = None,
+                           max_examples: int = DEFAULT_MAX_EXAMPLES) -> pd.DataFrame:
     results = []
     if related_column_groups is None:
         column_groups = {}
@@ -53,99 +59,115 @@ def detect_partial_updates(df: pd.DataFrame, related_column_groups: List[List[st
         if len(column_group) < 2:
             continue
         
-        for idx in df.index:
-            row = df.loc[idx]
-            
-            non_null_count = sum(1 for col in column_group if pd.notna(row[col]))
-            
-            if 0 < non_null_count < len(column_group):
-                missing_cols = [col for col in column_group if pd.isna(row[col])]
-                present_cols = [col for col in column_group if pd.notna(row[col])]
-                
-                results.append({
-                    'row_index': idx,
-                    'issue_type': 'partial_update',
-                    'confidence': 0.7,
-                    'value': f"Updated: {', '.join(present_cols)}, Missing: {', '.join(missing_cols)}",
-                    'details': f"Partial update detected - some related columns updated, others missing"
-                })
+        present = df[column_group].notna().to_numpy()
+        non_null_count = present.sum(axis=1)
+        positions = np.flatnonzero((non_null_count > 0) & (non_null_count < len(column_group)))
+        if len(positions) == 0:
+            continue
+        columns = np.array(column_group, dtype=object)
+
+        def describe(kept, present=present, columns=columns):
+            return [f"Updated: {', '.join(columns[row])}, Missing: {', '.join(columns[~row])}" for row in present[kept]]
+
+        results.append(emit_events(
+            positions, df.index, 'partial_update', '+'.join(column_group), 0.7, max_examples,
+            value=describe,
+            details="Partial update detected - some related columns updated, others missing"
+        ))
     
-    return pd.DataFrame(results)
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
 
-def detect_data_type_violations(df: pd.DataFrame, expected_types: Dict[str, str] = None) -> pd.DataFrame:
+def _infer_expected_type(column: pd.Series) -> str:
+    sample_values = column.dropna().head(100)
+    if len(sample_values) == 0:
+        return None
+    try:
+        pd.to_numeric(sample_values)
+        return 'numeric'
+    except:
+        try:
+            pd.to_datetime(sample_values)
+            return 'datetime'
+        except:
+            return 'string'
+
+def _type_violations(col, column: pd.Series, expected_type: str) -> List[Dict]:
+    # Every value of a numeric or datetime column converts, so only object columns are scanned
+    if expected_type == 'numeric' and pd.api.types.is_numeric_dtype(column) \
+            and not pd.api.types.is_complex_dtype(column):
+        return []
+    if expected_type == 'datetime' and pd.api.types.is_datetime64_any_dtype(column):
+        return []
     results = []
-    if expected_types is None:
-        expected_types = {}
-        for col in df.columns:
-            sample_values = df[col].dropna().head(100)
-            if len(sample_values) > 0:
+    for idx, value in column.items():
+        if pd.notna(value):
+            violation = False
+
+            if expected_type == 'numeric':
                 try:
-                    pd.to_numeric(sample_values)
-                    expected_types[col] = 'numeric'
-                except:
-                    try:
-                        pd.to_datetime(sample_values)
-                        expected_types[col] = 'datetime'
-                    except:
-                        expected_types[col] = 'string'
-    
-    for col, expected_type in expected_types.items():
-        if col in df.columns:
-            for idx, value in df[col].items():
-                if pd.notna(value):
-                    violation = False
-                    
-                    if expected_type == 'numeric':
-                        try:
-                            float(value)
-                        except (ValueError, TypeError):
-                            violation = True
-                    
-                    elif expected_type == 'datetime':
-                        try:
-                            pd.to_datetime(value)
-                        except (ValueError, TypeError):
-                            violation = True
-                    
-                    elif expected_type == 'string':
-                        if isinstance(value, (int, float)) and len(str(value)) > 1000:
-                            violation = True
-                    
-                    if violation:
-                        results.append({
-                            'row_index': idx,
-                            'issue_type': 'data_type_violation',
-                            'confidence': 0.9,
-                            'value': f"{col}: {value} (type: {type(value).__name__})",
-                            'details': f"Expected {expected_type} but got {type(value).__name__} in {col}"
-                        })
-    
-    return pd.DataFrame(results)
+                    float(value)
+                except (ValueError, TypeError):
+                    violation = True
+
+            elif expected_type == 'datetime':
+                try:
+                    pd.to_datetime(value)
+                except (ValueError, TypeError):
+                    violation = True
+
+            elif expected_type == 'string':
+                if isinstance(value, (int, float)) and len(str(value)) > 1000:
+                    violation = True
+
+            if violation:
+                results.append({
+                    'row_index': idx,
+                    'column': col,
+                    'issue_type': 'data_type_violation',
+                    'confidence': 0.9,
+                    'value': f"{col}: {value} (type: {type(value).__name__})",
+                    'details': f"Expected {expected_type} but got {type(value).__name__} in {col}"
+                })
+    return results
+
+def detect_data_type_violations(df: pd.DataFrame, expected_types: Dict[str, str] = None,
+                                n_jobs: int = None) -> pd.DataFrame:
+    def violations(col, column):
+        expected_type = _infer_expected_type(column) if expected_types is None else expected_types[col]
+        return _type_violations(col, column, expected_type) if expected_type else []
+
+    results = map_columns(violations, df, df.columns if expected_types is None else list(expected_types), n_jobs)
+    return pd.DataFrame([event for events in results for event in events])
 
 def detect_update_anomalies(df: pd.DataFrame, key_columns: List[str] = None,
                           related_column_groups: List[List[str]] = None,
-                          expected_types: Dict[str, str] = None) -> pd.DataFrame:
+                          expected_types: Dict[str, str] = None,
+                          max_examples: int = DEFAULT_MAX_EXAMPLES, sql_engine=None,
+                          n_jobs: int = None) -> pd.DataFrame:
     all_results = []
     try:
-        inconsistent_results = detect_inconsistent_updates(df, key_columns)
+        if sql_engine is not None:
+            inconsistent_results = sql_engine.inconsistent_updates(key_columns, max_examples)
+        else:
+            inconsistent_results = detect_inconsistent_updates(df, key_columns, max_examples)
         all_results.append(inconsistent_results)
-        print(f"✓ Inconsistent updates detected: {len(inconsistent_results)}")
+        print(f"✓ Inconsistent updates detected: {event_total(inconsistent_results)}")
     except Exception as e:
         print(f"✗ Inconsistent update detection failed: {e}")
     try:
-        partial_results = detect_partial_updates(df, related_column_groups)
+        partial_results = detect_partial_updates(df, related_column_groups, max_examples)
         all_results.append(partial_results)
-        print(f"✓ Partial updates detected: {len(partial_results)}")
+        print(f"✓ Partial updates detected: {event_total(partial_results)}")
     except Exception as e:
         print(f"✗ Partial update detection failed: {e}")
     try:
-        type_results = detect_data_type_violations(df, expected_types)
+        type_results = detect_data_type_violations(df, expected_types, n_jobs)
         all_results.append(type_results)
         print(f"✓ Data type violations detected: {len(type_results)}")
     except Exception as e:
         print(f"✗ Data type violation detection failed: {e}")
     if all_results:
         combined_results = pd.concat(all_results, ignore_index=True)
-        return combined_results
+        return cap_events(combined_results, max_examples)
     else:
         return pd.DataFrame() 
\ No newline at end of file